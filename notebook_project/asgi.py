@@ -2,6 +2,10 @@
 ASGI config for notebook_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Under ASGI the hot read paths are served by ``notes.async_views`` (see the
+``ASYNC_VIEWS`` setting), e.g.::
+
+    gunicorn notebook_project.asgi --worker-class asgi
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -12,5 +16,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "notebook_project.settings")
+os.environ.setdefault("ASYNC_VIEWS", "True")
 
 application = get_asgi_application()
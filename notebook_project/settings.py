@@ -14,6 +14,7 @@ from pathlib import Path
 import os
 import dj_database_url
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -52,7 +53,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",  # Whitenoise for static files
+    "notes.static_files.StaticFilesMiddleware",  # Whitenoise for static files (WSGI and ASGI)
+    "notes.instrumentation.PerformanceMiddleware",
+    "notes.routers.ReplicaStickinessMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -65,7 +68,7 @@ ROOT_URLCONF = "notebook_project.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "notes.instrumentation.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -87,10 +90,19 @@ WSGI_APPLICATION = "notebook_project.wsgi.application"
 # استخدام PostgreSQL على Railway أو SQLite محلياً
 DATABASE_URL = config('DATABASE_URL', default='')
 
+# الاتصالات الدائمة: مدة بقاء الاتصال بالثواني (0 لإغلاقه بعد كل طلب، ويُترك 0 في وضع ASGI)
+# وفحص صلاحية الاتصال المحفوظ قبل إعادة استخدامه في طلب جديد
+DATABASE_CONN_MAX_AGE = config('DATABASE_CONN_MAX_AGE', default=0, cast=int)
+DATABASE_CONN_HEALTH_CHECKS = config('DATABASE_CONN_HEALTH_CHECKS', default=False, cast=bool)
+
 if DATABASE_URL:
     # Railway PostgreSQL
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL)
+        'default': dj_database_url.parse(
+            DATABASE_URL,
+            conn_max_age=DATABASE_CONN_MAX_AGE,
+            conn_health_checks=DATABASE_CONN_HEALTH_CHECKS,
+        )
     }
 else:
     # Local development with SQLite
@@ -98,9 +110,130 @@ else:
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
             "NAME": BASE_DIR / "db.sqlite3",
+            "CONN_MAX_AGE": DATABASE_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": DATABASE_CONN_HEALTH_CHECKS,
         }
     }
 
+# نسخة متماثلة للقراءة فقط تخدم صفحات القراءة (انظر notes/routers.py)، مثل
+# postgres://... أو sqlite:///replica.sqlite3 محلياً
+DATABASE_REPLICA_URL = config('DATABASE_REPLICA_URL', default='')
+
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(
+        DATABASE_REPLICA_URL,
+        conn_max_age=DATABASE_CONN_MAX_AGE,
+        conn_health_checks=DATABASE_CONN_HEALTH_CHECKS,
+        # الاختبارات تقرأ من قاعدة الاختبار الرئيسية نفسها
+        test_options={'MIRROR': 'default'},
+    )
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+        # قاعدة SQLite في الذاكرة تُقفل الجداول بين اتصالين، فتُختبر في ملف
+        DATABASES['default'].setdefault('TEST', {})['NAME'] = BASE_DIR / 'test_db.sqlite3'
+
+DATABASE_ROUTERS = ['notes.routers.ReplicaRouter']
+
+# إيقاف القراءة من النسخة مؤقتاً (مثلاً عند تأخرها) دون حذف DATABASE_REPLICA_URL
+DATABASE_REPLICA_READS = config('DATABASE_REPLICA_READS', default=True, cast=bool)
+
+# بعد طلب كتابة تبقى قراءات المتصفح على الرئيسية هذه المدة (أكبر من تأخر النسخة)،
+# ومدة تجنب النسخة بعد فشل الاتصال بها، بالثواني
+DATABASE_REPLICA_STICKY_SECONDS = config('DATABASE_REPLICA_STICKY_SECONDS', default=10, cast=int)
+DATABASE_REPLICA_RETRY_SECONDS = config('DATABASE_REPLICA_RETRY_SECONDS', default=30, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "notebook-default",
+    }
+}
+
+# ذاكرة أجزاء القوالب (بطاقات القائمة ومحتوى صفحة التفاصيل، انظر notes.fragments):
+# locmem أو file أو redis أو memcached (يحتاجان حزمة redis أو pymemcache) أو dummy للتعطيل،
+# والموقع (اسم الذاكرة أو المجلد أو العنوان)، ومدة بقاء الجزء بالثواني، وأقصى عدد أجزاء (locmem و file)
+FRAGMENT_CACHE_BACKEND = config('FRAGMENT_CACHE_BACKEND', default='locmem')
+FRAGMENT_CACHE_LOCATION = config('FRAGMENT_CACHE_LOCATION', default='')
+FRAGMENT_CACHE_TIMEOUT = config('FRAGMENT_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+FRAGMENT_CACHE_MAX_ENTRIES = config('FRAGMENT_CACHE_MAX_ENTRIES', default=10_000, cast=int)
+
+FRAGMENT_CACHE_BACKENDS = {
+    "locmem": ("django.core.cache.backends.locmem.LocMemCache", "notebook-fragments"),
+    "file": ("django.core.cache.backends.filebased.FileBasedCache", str(BASE_DIR / "fragment_cache")),
+    "redis": ("django.core.cache.backends.redis.RedisCache", "redis://127.0.0.1:6379/1"),
+    "memcached": ("django.core.cache.backends.memcached.PyMemcacheCache", "127.0.0.1:11211"),
+    "dummy": ("django.core.cache.backends.dummy.DummyCache", ""),
+}
+if FRAGMENT_CACHE_BACKEND not in FRAGMENT_CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f"FRAGMENT_CACHE_BACKEND must be one of {', '.join(FRAGMENT_CACHE_BACKENDS)}"
+    )
+_fragment_backend, _fragment_location = FRAGMENT_CACHE_BACKENDS[FRAGMENT_CACHE_BACKEND]
+CACHES["fragments"] = {
+    "BACKEND": _fragment_backend,
+    "LOCATION": FRAGMENT_CACHE_LOCATION or _fragment_location,
+    "TIMEOUT": FRAGMENT_CACHE_TIMEOUT,
+}
+if FRAGMENT_CACHE_BACKEND in ("locmem", "file"):
+    CACHES["fragments"]["OPTIONS"] = {"MAX_ENTRIES": FRAGMENT_CACHE_MAX_ENTRIES}
+
+# مدة تخزين إحصاءات الوسوم (يتغير مفتاحها تلقائياً عند تغيير الوسوم)
+TAG_FACETS_CACHE_TIMEOUT = config('TAG_FACETS_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+# عدّاد المشاهدات: مدة التأجيل بالثواني (0 للكتابة المباشرة) وأقصى عدد ملاحظات معلقة
+VIEW_COUNT_FLUSH_INTERVAL = config('VIEW_COUNT_FLUSH_INTERVAL', default=30, cast=int)
+VIEW_COUNT_MAX_PENDING = config('VIEW_COUNT_MAX_PENDING', default=1000, cast=int)
+
+# ذاكرة تحويل Markdown المؤقتة داخل كل عملية (عدد النتائج وحجمها الكلي بالأحرف)
+RENDER_CACHE_MAX_ENTRIES = config('RENDER_CACHE_MAX_ENTRIES', default=512, cast=int)
+RENDER_CACHE_MAX_CHARS = config('RENDER_CACHE_MAX_CHARS', default=32 * 1024 * 1024, cast=int)
+
+# التحويل التدريجي: ذاكرة نتائج الكتل، وأقل عدد كتل لتحويل الملاحظة كتلة كتلة
+RENDER_BLOCK_CACHE_MAX_ENTRIES = config('RENDER_BLOCK_CACHE_MAX_ENTRIES', default=20_000, cast=int)
+RENDER_BLOCK_CACHE_MAX_CHARS = config('RENDER_BLOCK_CACHE_MAX_CHARS', default=32 * 1024 * 1024, cast=int)
+RENDER_INCREMENTAL_MIN_BLOCKS = config('RENDER_INCREMENTAL_MIN_BLOCKS', default=20, cast=int)
+
+# المعاينة من الخادم: مدة بقاء آخر نص معاينة لكل جلسة بالثواني
+PREVIEW_STATE_TIMEOUT = config('PREVIEW_STATE_TIMEOUT', default=3600, cast=int)
+
+# عدد نسخ الملاحظة في كل سلسلة فروقات قبل حفظ إطار مفتاحي كامل
+NOTE_VERSION_KEYFRAME_INTERVAL = config('NOTE_VERSION_KEYFRAME_INTERVAL', default=20, cast=int)
+
+# الحفظ التلقائي: أقل مدة بالثواني بين عمليات تحويل HTML وحفظ النسخ
+AUTOSAVE_RENDER_INTERVAL = config('AUTOSAVE_RENDER_INTERVAL', default=60, cast=int)
+
+# تحويل الملاحظات الكبيرة في عمليات منفصلة خارج دورة الطلب
+RENDER_ASYNC = config('RENDER_ASYNC', default=False, cast=bool)
+RENDER_ASYNC_THRESHOLD = config('RENDER_ASYNC_THRESHOLD', default=50_000, cast=int)
+RENDER_WORKERS = config('RENDER_WORKERS', default=2, cast=int)
+
+# صفحات الملاحظات العامة: مدة بقائها في الذاكرة المؤقتة، ومدة تخزينها في CDN (0 لإلزامه بالتحقق)
+PUBLIC_NOTE_CACHE_TIMEOUT = config('PUBLIC_NOTE_CACHE_TIMEOUT', default=300, cast=int)
+PUBLIC_NOTE_CDN_MAX_AGE = config('PUBLIC_NOTE_CDN_MAX_AGE', default=0, cast=int)
+
+# الاستيراد الجماعي: حجم الدفعة، عدد عمليات التحويل، وأقصى حجم لملف واحد بالبايت
+IMPORT_BATCH_SIZE = config('IMPORT_BATCH_SIZE', default=500, cast=int)
+IMPORT_WORKERS = config('IMPORT_WORKERS', default=os.cpu_count() or 2, cast=int)
+IMPORT_MAX_FILE_SIZE = config('IMPORT_MAX_FILE_SIZE', default=5 * 1024 * 1024, cast=int)
+# استيراد الأرشيف المرفوع في خيط خلفي والرد فوراً (False: داخل الطلب)
+IMPORT_ASYNC = config('IMPORT_ASYNC', default=True, cast=bool)
+
+# واجهة JSON: عدد الملاحظات الافتراضي في الصفحة وأقصى قيمة لـ limit
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=50, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=200, cast=int)
+
+# قياس أداء الطلبات (Server-Timing وسجل notes.performance): حد الطلب البطيء بالملي ثانية
+# ونسبة الطلبات البطيئة التي تُسجَّل مع نصوص SQL
+PERFORMANCE_INSTRUMENTATION = config('PERFORMANCE_INSTRUMENTATION', default=False, cast=bool)
+PERFORMANCE_SLOW_REQUEST_MS = config('PERFORMANCE_SLOW_REQUEST_MS', default=500, cast=int)
+PERFORMANCE_SLOW_SQL_SAMPLE_RATE = config('PERFORMANCE_SLOW_SQL_SAMPLE_RATE', default=1.0, cast=float)
+
+# النسخ غير المتزامنة من المسارات الأكثر طلباً (notes.async_views)، يفعّلها notebook_project.asgi
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -140,12 +273,26 @@ STATIC_URL = "/static/"
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# الملفات الثابتة بأسماء فيها بصمة المحتوى ونسخ gzip و Brotli مضغوطة مسبقاً (collectstatic)،
+# ويرسلها WhiteNoise مع Cache-Control: immutable. مكتبات الواجهة في static/vendor (vendor_assets)
+# ومن CDN إلى أن تُنشأ، والملفات الغائبة عن البصمات تُعرض بدون بصمة بدلاً من خطأ (notes.static_files)
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "notes.static_files.ManifestStaticFilesStorage",
+    },
+}
 
 # Media files (User uploads)
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# تصدير PDF: مجلد الملفات المخزنة وخط TTF اختياري يدعم العربية
+PDF_CACHE_DIR = config('PDF_CACHE_DIR', default=str(MEDIA_ROOT / "pdf_cache"))
+PDF_FONT_PATH = config('PDF_FONT_PATH', default='')
+
 # Authentication
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "notes_list"
@@ -186,5 +333,13 @@ LOGGING = {
         'handlers': ['console'],
         'level': 'INFO',
     },
+    'loggers': {
+        # سطر JSON لكل طلب (INFO) وللطلبات البطيئة مع SQL (WARNING)
+        'notes.performance': {
+            'handlers': ['console'],
+            'level': config('PERFORMANCE_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
 }
 
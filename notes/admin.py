@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Note, NoteVersion
+from .models import ImportJob, Note, NoteVersion, UserStats
 
 
 @admin.register(Note)
@@ -27,7 +27,29 @@ class NoteAdmin(admin.ModelAdmin):
 @admin.register(NoteVersion)
 class NoteVersionAdmin(admin.ModelAdmin):
     """تكوين صفحة الإدارة لنسخ الملاحظات"""
-    list_display = ('note', 'created_at')
-    list_filter = ('created_at',)
-    search_fields = ('note__title', 'content_md')
-    readonly_fields = ('note', 'content_md', 'created_at')
+    list_display = ('note', 'encoding', 'size', 'created_at')
+    list_filter = ('encoding', 'created_at')
+    search_fields = ('note__title', 'summary')
+    fields = ('note', 'encoding', 'size', 'content_hash', 'created_at', 'content')
+    readonly_fields = fields
+    
+    @admin.display(description='المحتوى (Markdown)')
+    def content(self, obj):
+        return obj.get_content()
+
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    """إحصاءات المستخدمين (للعرض فقط، تُصحح بأمر reconcile_user_stats)"""
+    list_display = ('user', 'total_notes', 'favorite_notes', 'public_notes', 'total_views', 'tag_count', 'version_count', 'storage_bytes', 'updated_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('user', *UserStats.STAT_FIELDS, 'updated_at')
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    """عمليات الاستيراد (للعرض فقط)"""
+    list_display = ('user', 'status', 'created_at', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('user__username',)
+    readonly_fields = ('user', 'status', 'stats', 'error', 'created_at', 'updated_at')
@@ -0,0 +1,287 @@
+"""
+واجهة JSON للملاحظات
+
+    GET   /api/notes/           قائمة مرقمة بالمؤشر (تُرسل كتدفق)
+    POST  /api/notes/           إنشاء ملاحظة
+    GET   /api/notes/<id>/      ملاحظة واحدة (مع ETag و If-None-Match)
+    PATCH /api/notes/<id>/      تعديل بعض الحقول (PUT مقبول أيضاً)
+
+``fields=title,tags,updated_at`` يحدد حقول الرد، ويُحمَّل من قاعدة البيانات
+ما تحتاجه هذه الحقول فقط. القائمة بدون المحتوى افتراضياً، والملاحظة الواحدة
+بكل الحقول. معاملات القائمة مثل صفحة الملاحظات: ``search`` و ``tag``
+و ``favorites`` و ``sort`` و ``cursor``، بالإضافة إلى ``limit``.
+
+المصادقة بجلسة الموقع، وطلبات الكتابة تحتاج ترويسة ``X-CSRFToken``. إرسال
+``revision`` مع التعديل يرفضه بـ 409 إذا تغيرت الملاحظة منذ قراءتها.
+"""
+
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_http_methods
+
+from .forms import NoteForm
+from .models import Note
+from .pagination import paginate, resolve_ordering
+from .search import search_notes
+
+
+# أعمدة قاعدة البيانات التي يحتاجها كل حقل في الرد
+FIELDS = {
+    'id': (),
+    'title': ('title',),
+    'content_md': ('content_md',),
+    'content_html': ('content_html', 'content_md', 'title', 'html_stale', 'revision'),
+    'excerpt': ('excerpt',),
+    'word_count': ('word_count',),
+    'reading_time': ('reading_time',),
+    'tags': (),
+    'is_public': ('is_public',),
+    'is_favorite': ('is_favorite',),
+    'public_url': ('is_public', 'public_uuid'),
+    'views': ('views',),
+    'revision': ('revision',),
+    'created_at': ('created_at',),
+    'updated_at': ('updated_at',),
+}
+
+DETAIL_FIELDS = tuple(FIELDS)
+LIST_FIELDS = tuple(field for field in FIELDS if field not in ('content_md', 'content_html'))
+
+# الحقول القابلة للكتابة (``tags`` تُعالج منفصلة) ونوع قيمة كل منها في JSON
+WRITABLE_FIELDS = ('title', 'content_md', 'is_public', 'is_favorite')
+FIELD_TYPES = {'title': str, 'content_md': str, 'is_public': bool, 'is_favorite': bool}
+
+
+class ApiError(Exception):
+    """خطأ يُرد به كـ JSON مع رمز الحالة وأي بيانات إضافية"""
+
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def api_view(view):
+    """رد 401 بدلاً من التحويل لصفحة الدخول، وردود JSON للأخطاء و 404"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'يجب تسجيل الدخول'}, status=401)
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'error': 'الملاحظة غير موجودة'}, status=404)
+        except ApiError as error:
+            return JsonResponse({'error': str(error), **error.extra}, status=error.status)
+    return wrapper
+
+
+def parse_fields(request, default):
+    """الحقول المطلوبة في ``fields=`` بترتيبها، أو الحقول الافتراضية"""
+    value = request.GET.get('fields')
+    if not value:
+        return default
+    fields = []
+    for field in value.split(','):
+        field = field.strip()
+        if field not in FIELDS:
+            raise ApiError(f'حقل غير معروف: {field}')
+        if field not in fields:
+            fields.append(field)
+    return tuple(fields)
+
+
+def note_queryset(user, fields, *extra_columns):
+    """ملاحظات المستخدم مع تحميل الأعمدة اللازمة للحقول فقط"""
+    # ``owner`` يقرؤه ``user.notes`` لربط كل ملاحظة بمالكها
+    columns = {'id', 'owner', *extra_columns}
+    for field in fields:
+        columns.update(FIELDS[field])
+    queryset = user.notes.only(*columns)
+    if 'tags' in fields:
+        queryset = queryset.prefetch_related('tags')
+    return queryset
+
+
+def serialize_note(note, fields, request):
+    """قاموس الحقول المطلوبة من الملاحظة"""
+    if 'content_html' in fields:
+        note.ensure_rendered()
+    data = {}
+    for field in fields:
+        if field == 'tags':
+            value = sorted(tag.name for tag in note.tags.all())
+        elif field == 'public_url':
+            value = (
+                request.build_absolute_uri(reverse('public_note', args=[note.public_uuid]))
+                if note.is_public else None
+            )
+        elif field == 'views':
+            # مع المشاهدات المؤجلة التي لم تُكتب بعد، كما في صفحات الموقع
+            value = note.total_views
+        elif field in ('created_at', 'updated_at'):
+            value = getattr(note, field).isoformat()
+        else:
+            value = getattr(note, field)
+        data[field] = value
+    return data
+
+
+def _parse_tags(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or not all(isinstance(tag, str) for tag in value):
+        raise ApiError('الوسوم يجب أن تكون قائمة نصوص')
+    tags = []
+    for tag in value:
+        tag = tag.strip()
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def _read_payload(request):
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        raise ApiError('صيغة JSON غير صحيحة')
+    if not isinstance(data, dict):
+        raise ApiError('صيغة الطلب غير صحيحة')
+    unknown = set(data) - {*WRITABLE_FIELDS, 'tags', 'revision'}
+    if unknown:
+        raise ApiError(f'حقول غير قابلة للكتابة: {", ".join(sorted(unknown))}')
+    # النموذج يحوّل null إلى نص فارغ والأرقام إلى نصوص: نرفضها هنا
+    for field, kind in FIELD_TYPES.items():
+        if field in data and not isinstance(data[field], kind):
+            raise ApiError(f'قيمة غير صالحة للحقل {field}', errors={field: ['نوع القيمة غير صحيح']})
+    return data
+
+
+def _validated_form(data, note=None):
+    """
+    التحقق من القيم المرسلة بنفس نموذج صفحة التعديل
+
+    الحقول غير المرسلة تأخذ قيمها الحالية، ولا يُربط النموذج بالملاحظة حتى
+    لا تتغير حقولها غير المرسلة.
+    """
+    current = {field: getattr(note, field) for field in WRITABLE_FIELDS} if note else {}
+    form = NoteForm({**current, **{key: data[key] for key in WRITABLE_FIELDS if key in data}})
+    if not form.is_valid():
+        raise ApiError('قيم غير صالحة', errors={field: errors for field, errors in form.errors.items()})
+    return form
+
+
+def _note_response(request, note, status=200):
+    fields = parse_fields(request, DETAIL_FIELDS)
+    note = get_object_or_404(note_queryset(request.user, fields), pk=note.pk)
+    return JsonResponse(serialize_note(note, fields, request), status=status, json_dumps_params={'ensure_ascii': False})
+
+
+# ===== Views =====
+
+@api_view
+@require_http_methods(['GET', 'POST'])
+def notes_view(request):
+    """قائمة الملاحظات أو إنشاء ملاحظة"""
+    if request.method == 'POST':
+        return _create_note(request)
+
+    fields = parse_fields(request, LIST_FIELDS)
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        raise ApiError('limit يجب أن يكون رقماً')
+    limit = max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+    search_query = request.GET.get('search', '')
+    _, ordering = resolve_ordering(request.GET.get('sort'), search_query)
+    notes = note_queryset(request.user, fields, *(field.lstrip('-') for field in ordering if field != '-search_rank'))
+    if search_query:
+        notes = search_notes(notes, search_query)
+    tag = request.GET.get('tag', '')
+    if tag:
+        notes = notes.filter(tags__name__in=[tag])
+    if request.GET.get('favorites'):
+        notes = notes.filter(is_favorite=True)
+
+    page = paginate(notes, ordering, request.GET.get('cursor'), per_page=limit)
+
+    def stream():
+        yield '{"results":['
+        for index, note in enumerate(page):
+            yield (',' if index else '') + _dumps(serialize_note(note, fields, request))
+        yield f'],"next_cursor":{_dumps(page.next_cursor)},"previous_cursor":{_dumps(page.previous_cursor)}}}'
+
+    return StreamingHttpResponse(stream(), content_type='application/json')
+
+
+def _create_note(request):
+    data = _read_payload(request)
+    form = _validated_form(data)
+    tags = _parse_tags(data['tags']) if 'tags' in data else []
+    with transaction.atomic():
+        note = form.save(commit=False)
+        note.owner = request.user
+        note.save()
+        if tags:
+            note.tags.set(tags)
+    response = _note_response(request, note, status=201)
+    response['Location'] = reverse('api_note', args=[note.pk])
+    return response
+
+
+@api_view
+@require_http_methods(['GET', 'PATCH', 'PUT'])
+def note_view(request, pk):
+    """ملاحظة واحدة أو تعديلها"""
+    if request.method != 'GET':
+        return _update_note(request, pk)
+
+    fields = parse_fields(request, DETAIL_FIELDS)
+    note = get_object_or_404(note_queryset(request.user, fields), pk=pk)
+    body = _dumps(serialize_note(note, fields, request))
+    # بصمة الرد نفسه: تتغير مع أي حقل مطلوب بما فيها الوسوم
+    etag = f'"{hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]}"'
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _update_note(request, pk):
+    data = _read_payload(request)
+    with transaction.atomic():
+        note = get_object_or_404(Note.objects.select_for_update(), pk=pk, owner=request.user)
+        if data.get('revision') is not None and data['revision'] != note.revision:
+            raise ApiError('تم تعديل الملاحظة من مكان آخر', status=409, revision=note.revision)
+
+        form = _validated_form(data, note)
+        changed = [
+            field for field in WRITABLE_FIELDS
+            if field in data and form.cleaned_data[field] != getattr(note, field)
+        ]
+        if changed:
+            for field in changed:
+                setattr(note, field, form.cleaned_data[field])
+            # حفظ الحقول المتغيرة فقط: تغيير المفضلة أو المشاركة لا يعيد تحويل المحتوى
+            note.save(update_fields=changed)
+        if 'tags' in data:
+            tags = _parse_tags(data['tags'])
+            if sorted(tags) != sorted(note.tags.names()):
+                note.tags.set(tags)
+    return _note_response(request, note)
@@ -0,0 +1,241 @@
+"""
+تصدير الملاحظات كأرشيف ZIP يُرسل على دفعات، وقراءة أرشيفات Markdown للاستيراد
+
+كل ملاحظة تُكتب كملف Markdown يبدأ بـ YAML front-matter (العنوان، الوسوم،
+التواريخ، المشاركة العامة، المفضلة). الأرشيف يُبنى أثناء الإرسال: تُقرأ
+الملاحظات بـ ``QuerySet.iterator()`` ويُرسل كل ملف فور ضغطه، لذا يبقى
+استهلاك الذاكرة ثابتاً تقريباً مهما كان عدد الملاحظات.
+
+``ArchiveReader`` يقرأ نفس الصيغة (أو أي ملفات ``.md`` مع front-matter اختياري)
+من ملف ZIP أو مجلد، وهو ما يستخدمه ``notes.importer``.
+"""
+
+import io
+import os
+import zipfile
+
+import yaml
+from django.conf import settings
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import versioning
+from .models import Note, NoteVersion
+
+
+ITERATOR_CHUNK_SIZE = 500
+
+# محلل libyaml أسرع بكثير عند توفره
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+_YAML_DUMPER = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+NOTE_EXPORT_FIELDS = (
+    'id', 'title', 'content_md', 'is_public', 'is_favorite', 'created_at', 'updated_at',
+)
+
+
+class _ZipStream(io.RawIOBase):
+    """ملف غير قابل للتنقل يجمع ما يكتبه ``zipfile`` حتى يُسحب"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def front_matter(data):
+    """تحويل قاموس إلى كتلة YAML front-matter"""
+    dumped = yaml.dump(data, Dumper=_YAML_DUMPER, allow_unicode=True, sort_keys=False, default_flow_style=False)
+    return f'---\n{dumped}---\n\n'
+
+
+def note_filename(note):
+    """اسم ملف فريد وقابل للقراءة للملاحظة داخل الأرشيف"""
+    slug = slugify(note.title, allow_unicode=True)[:80]
+    return f'{note.pk}-{slug}.md' if slug else f'{note.pk}.md'
+
+
+def note_to_markdown(note, tags):
+    data = {
+        'id': note.pk,
+        'title': note.title,
+        'tags': sorted(tags),
+        'created': timezone.localtime(note.created_at).isoformat(),
+        'updated': timezone.localtime(note.updated_at).isoformat(),
+        'public': note.is_public,
+        'favorite': note.is_favorite,
+    }
+    return front_matter(data) + note.content_md
+
+
+def version_to_markdown(version, content):
+    data = {
+        'note': version.note_id,
+        'version': version.pk,
+        'created': timezone.localtime(version.created_at).isoformat(),
+    }
+    return front_matter(data) + content
+
+
+def _zip_info(name, modified):
+    info = zipfile.ZipInfo(name, date_time=timezone.localtime(modified).timetuple()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    return info
+
+
+def iter_export(user, include_versions=False):
+    """
+    مولّد أجزاء أرشيف ZIP لكل ملاحظات المستخدم
+
+    الملاحظات في ``notes/`` ونسخها السابقة (اختيارياً) في ``versions/<note_id>/``.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        notes = (
+            Note.objects.filter(owner=user)
+            .only(*NOTE_EXPORT_FIELDS)
+            .prefetch_related('tags')
+            .order_by('pk')
+        )
+        for note in notes.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            tags = [tag.name for tag in note.tags.all()]
+            archive.writestr(
+                _zip_info(f'notes/{note_filename(note)}', note.updated_at),
+                note_to_markdown(note, tags),
+            )
+            yield stream.drain()
+
+        if include_versions:
+            versions = (
+                NoteVersion.objects.filter(note__owner=user)
+                .only('id', 'note_id', 'created_at', 'encoding', 'content_md', 'payload', 'content_hash')
+                .order_by('note_id', 'pk')
+            )
+            for version, content in versioning.iter_contents(versions.iterator(chunk_size=ITERATOR_CHUNK_SIZE)):
+                archive.writestr(
+                    _zip_info(f'versions/{version.note_id}/{version.pk}.md', version.created_at),
+                    version_to_markdown(version, content),
+                )
+                yield stream.drain()
+
+    # الفهرس المركزي يُكتب عند إغلاق الأرشيف
+    yield stream.drain()
+
+
+# ===== Import =====
+
+# سجل النسخ في أرشيف التصدير لا يُستورد كملاحظات
+VERSIONS_DIRECTORY = 'versions'
+
+
+def parse_front_matter(text):
+    """
+    فصل YAML front-matter عن المحتوى وإرجاع ``(meta, body)``
+
+    إذا لم يوجد front-matter صالح يُعاد قاموس فارغ والنص كما هو.
+    """
+    if not text.startswith('---\n'):
+        return {}, text
+    end = text.find('\n---\n', 3)
+    if end == -1:
+        if not text.endswith('\n---'):
+            return {}, text
+        end = len(text) - 4
+    try:
+        meta = yaml.load(text[4:end + 1], Loader=_YAML_LOADER)
+    except yaml.YAMLError:
+        return {}, text
+    if meta is None:
+        meta = {}
+    if not isinstance(meta, dict):
+        return {}, text
+    body = text[end + 5:]
+    # التصدير يضع سطراً فارغاً بعد front-matter
+    if body.startswith('\n'):
+        body = body[1:]
+    return meta, body
+
+
+class ArchiveError(Exception):
+    """أرشيف غير صالح للاستيراد"""
+
+
+class ArchiveReader:
+    """
+    قراءة ملفات Markdown من ملف ZIP (مسار أو ملف مفتوح) أو من مجلد
+
+    ``names`` قائمة مرتبة بالمسارات النسبية، والمحتوى يُقرأ عند الطلب فقط.
+    """
+
+    def __init__(self, source):
+        self._zip = None
+        self._root = None
+        if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+            self._root = os.fspath(source)
+            self.names = sorted(self._walk())
+        else:
+            try:
+                self._zip = zipfile.ZipFile(source)
+            except (zipfile.BadZipFile, OSError) as error:
+                raise ArchiveError(f'تعذر فتح الأرشيف: {error}') from error
+            self.names = sorted(
+                info.filename for info in self._zip.infolist()
+                if not info.is_dir() and self._accepts(info.filename)
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+
+    @staticmethod
+    def _accepts(name):
+        parts = name.replace('\\', '/').split('/')
+        # المجلدات المخفية (.git و.obsidian) وبقايا macOS
+        if parts[0] == VERSIONS_DIRECTORY or any(part.startswith(('.', '__MACOSX')) for part in parts):
+            return False
+        return name.lower().endswith(('.md', '.markdown'))
+
+    def _walk(self):
+        for directory, subdirs, files in os.walk(self._root):
+            for filename in files:
+                name = os.path.relpath(os.path.join(directory, filename), self._root).replace(os.sep, '/')
+                if self._accepts(name):
+                    yield name
+
+    def size(self, name):
+        if self._zip is not None:
+            return self._zip.getinfo(name).file_size
+        return os.path.getsize(os.path.join(self._root, name))
+
+    def read(self, name):
+        """قراءة ملف كنص UTF-8 (مع تجاهل BOM وتوحيد نهايات الأسطر)"""
+        if self.size(name) > settings.IMPORT_MAX_FILE_SIZE:
+            raise ArchiveError(f'الملف {name} أكبر من الحد المسموح')
+        if self._zip is not None:
+            data = self._zip.read(name)
+        else:
+            with open(os.path.join(self._root, name), 'rb') as file:
+                data = file.read()
+        try:
+            text = data.decode('utf-8-sig')
+        except UnicodeDecodeError as error:
+            raise ArchiveError(f'الملف {name} ليس بترميز UTF-8') from error
+        return text.replace('\r\n', '\n')
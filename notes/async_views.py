@@ -0,0 +1,233 @@
+"""
+نسخ غير متزامنة (ASGI) من المسارات الأكثر طلباً
+
+تحل محل نظيراتها في ``views`` عند تفعيل ``ASYNC_VIEWS`` (يفعّله
+``notebook_project.asgi``)، بنفس القوالب والردود. في ASGI لا يُحجز خيط لكل
+اتصال، فالعملاء البطيئون لا يوقفون بقية الطلبات.
+
+استعلامات ORM غير المتزامنة و ``sync_to_async`` تُنفَّذ كلها في خيط الطلب
+المتزامن (``thread_sensitive``)، لذا تُستدعى الدوال التي تجمع عدة استعلامات
+(الترقيم، المقتطفات، الحفظ داخل معاملة) دفعة واحدة بدل استعلام لكل خطوة.
+بناء PDF (reportlab) وحده يعمل في مجموعة الخيوط لأنه لا يستخدم قاعدة البيانات.
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.db import DEFAULT_DB_ALIAS
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, render
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header
+from django.views.decorators.http import require_POST
+
+from . import public_cache
+from .archive import iter_export
+from .facets import get_tag_facets
+from .fragments import attach_body, attach_cards
+from .models import Note
+from .pagination import paginate, resolve_ordering
+from .pdf import open_pdf
+from .routers import read_from_replica
+from .search import attach_snippets, search_notes
+from .static_files import aiter_file
+from .view_counter import view_counter
+from .views import _approximate_total, parse_autosave, save_autosave
+
+
+async def _auser(request):
+    """المستخدم الحالي، مع تثبيته في ``request.user`` للقوالب"""
+    user = request.user = await request.auser()
+    return user
+
+
+def _list_page(notes, ordering, cursor, search_query):
+    page_obj = paginate(notes, ordering, cursor)
+    if search_query:
+        page_obj.object_list = attach_snippets(page_obj.object_list, search_query)
+    page_obj.object_list = attach_cards(page_obj.object_list)
+    return page_obj
+
+
+# ===== Notes =====
+
+@login_required
+@read_from_replica
+async def notes_list_view(request):
+    """قائمة الملاحظات"""
+    user = await _auser(request)
+    notes = user.notes.for_list()
+
+    search_query = request.GET.get('search', '')
+    if search_query:
+        notes = search_notes(notes, search_query)
+
+    tag = request.GET.get('tag', '')
+    if tag:
+        notes = notes.filter(tags__name__in=[tag])
+
+    favorites_only = request.GET.get('favorites', '')
+    if favorites_only:
+        notes = notes.filter(is_favorite=True)
+
+    sort_by, ordering = resolve_ordering(request.GET.get('sort'), search_query)
+    page_obj = await sync_to_async(_list_page)(notes, ordering, request.GET.get('cursor'), search_query)
+
+    page_query = request.GET.copy()
+    page_query.pop('cursor', None)
+
+    context = {
+        'page_obj': page_obj,
+        'page_query': page_query.urlencode(),
+        'approximate_total': await sync_to_async(_approximate_total)(user, search_query, tag, favorites_only),
+        'search_query': search_query,
+        'current_tag': tag,
+        'all_tags': await sync_to_async(get_tag_facets)(user.id),
+        'favorites_only': favorites_only,
+        'sort_by': sort_by,
+    }
+
+    return render(request, 'notes/notes_list.html', context)
+
+
+def _record_view(note):
+    note.increment_views()
+    note.ensure_rendered()
+
+
+def _detail_body(note, request):
+    _record_view(note)
+    attach_body(note, request)
+
+
+@login_required
+@read_from_replica
+async def note_detail_view(request, pk):
+    """عرض تفاصيل الملاحظة"""
+    user = await _auser(request)
+    # الكاتب والوسوم مع الملاحظة: القالب لا يستطيع الاستعلام من حلقة الأحداث
+    note = await aget_object_or_404(
+        Note.objects.select_related('owner').prefetch_related('tags'),
+        pk=pk, owner=user,
+    )
+    await sync_to_async(_detail_body)(note, request)
+
+    versions = [version async for version in note.versions.metadata()[:5]]
+
+    context = {
+        'note': note,
+        'versions': versions,
+    }
+
+    return render(request, 'notes/note_detail.html', context)
+
+
+# ===== AJAX =====
+
+@login_required
+@require_POST
+async def autosave_view(request, pk):
+    """
+    حفظ تلقائي للملاحظة (انظر ``notes.autosave`` لصيغة الطلب)
+    """
+    try:
+        data, response = parse_autosave(request.body)
+        if response is not None:
+            return response
+        user = await request.auser()
+        return await sync_to_async(save_autosave)(user, pk, data)
+    except Http404:
+        raise
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
+# ===== Public Note =====
+
+def _render_public_page(request, note):
+    _record_view(note)
+    content = render_to_string('notes/public_note.html', {'note': note}, request)
+    return public_cache.store_page(note, content)
+
+
+@read_from_replica
+async def public_note_view(request, uuid):
+    """عرض الملاحظة العامة (من ذاكرة الصفحات إن وُجدت، مع دعم الطلبات الشرطية)"""
+    page = await public_cache.aget_page(uuid)
+    if page is None or public_cache.is_changed(page):
+        notes = Note.objects.select_related('owner').prefetch_related('tags')
+        if page is not None:
+            # عُدلت للتو: من القاعدة الرئيسية حتى تصل التعديلات إلى النسخة المتماثلة
+            notes = notes.using(DEFAULT_DB_ALIAS)
+        note = await aget_object_or_404(notes, public_uuid=uuid, is_public=True)
+        page = await sync_to_async(_render_public_page)(request, note)
+    else:
+        await sync_to_async(view_counter.record)(page['note_id'])
+
+    response = get_conditional_response(request, etag=page['etag'], last_modified=page['last_modified'])
+    if response is None:
+        response = HttpResponse(page['content'])
+    return public_cache.patch_page_headers(response, page)
+
+
+# ===== Export =====
+
+@login_required
+@read_from_replica
+async def export_markdown_view(request, pk):
+    """تصدير الملاحظة كـ Markdown"""
+    user = await request.auser()
+    note = await aget_object_or_404(Note.objects.only('id', 'title', 'content_md'), pk=pk, owner=user)
+
+    response = HttpResponse(note.content_md, content_type='text/markdown')
+    response['Content-Disposition'] = content_disposition_header(True, f'{note.title or "note"}.md')
+
+    return response
+
+
+@login_required
+@read_from_replica
+async def export_pdf_view(request, pk):
+    """تصدير الملاحظة كـ PDF (من الذاكرة المؤقتة إن وُجد)"""
+    user = await request.auser()
+    note = await aget_object_or_404(Note.objects.only('id', 'title', 'content_md'), pk=pk, owner=user)
+
+    # بناء PDF (إن لم يكن مخزناً) في مجموعة الخيوط دون حجز خيط الطلب
+    pdf_file = await sync_to_async(open_pdf, thread_sensitive=False)(note)
+    response = FileResponse(pdf_file, as_attachment=True, filename=f'{note.title or "note"}.pdf')
+    # نفس الترويسات، مع قراءة الملف على دفعات خارج حلقة الأحداث
+    response.streaming_content = aiter_file(pdf_file)
+    return response
+
+
+async def _aiter_export(user, include_versions):
+    """
+    ``iter_export`` كمولّد غير متزامن
+
+    كل جزء يُطلب من خيط الطلب (مؤشر قاعدة البيانات مرتبط به)؛ تمرير المولّد
+    المتزامن مباشرة يجعل Django يجمع الأرشيف كاملاً في الذاكرة قبل إرساله.
+    """
+    chunks = iter_export(user, include_versions)
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        await sync_to_async(chunks.close)()
+
+
+@login_required
+@read_from_replica
+async def export_all_view(request):
+    """تصدير كل الملاحظات كأرشيف ZIP (مع سجل النسخ عند طلب ?versions=1)"""
+    user = await request.auser()
+    include_versions = request.GET.get('versions') == '1'
+
+    response = StreamingHttpResponse(_aiter_export(user, include_versions), content_type='application/zip')
+    filename = f'notes-{user.username}-{timezone.localdate():%Y-%m-%d}.zip'
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
@@ -0,0 +1,51 @@
+"""
+بروتوكول الحفظ التلقائي
+
+يرسل المحرر رقم المراجعة التي بدأ منها مع تعديلات نصية صغيرة بدلاً من
+المحتوى كاملاً::
+
+    {
+        "revision": 12,
+        "title": "عنوان اختياري",
+        "patch": [[start, end, "نص بديل"], ...]
+    }
+
+كل تعديل يستبدل المقطع ``[start, end)`` من المحتوى بالنص المعطى، والمواضع
+بوحدات UTF-16 كما في ``String`` في JavaScript، وتُطبَّق التعديلات بالترتيب.
+ما زال إرسال ``content_md`` كاملاً مدعوماً بدلاً من ``patch``، ويمكن حذف
+``revision`` للحفظ دون التحقق من التعارض.
+
+إذا لم يطابق ``revision`` المراجعة المحفوظة يكون الرد 409 مع ``"conflict": true``
+والعنوان والمحتوى ورقم المراجعة الحالية ليدمجها المحرر أو يعرضها. الطلب بدون
+عنوان أو محتوى أو تعديلات يُرد عليه بـ ``"unchanged": true`` دون قاعدة البيانات.
+
+سكربت المحرر (``static/js/editor.js``) ليس ضمن هذا المستودع، ولا يرسل أي عميل
+هذه الصيغة بعد: صفحة التعديل تعرض رقم المراجعة فقط في الحقل المخفي
+``note-revision`` ليبدأ منه المحرر عند انتقاله إليها، وحتى ذلك الحين يعمل
+الحفظ التلقائي بإرسال المحتوى كاملاً بدون ``revision`` كما كان.
+"""
+
+
+class PatchError(ValueError):
+    """تعديل غير صالح لا يمكن تطبيقه على المحتوى الحالي"""
+
+
+def apply_patch(text, ops):
+    """تطبيق قائمة تعديلات ``[start, end, replacement]`` على النص"""
+    if not isinstance(ops, list):
+        raise PatchError('صيغة التعديلات غير صحيحة')
+    units = text.encode('utf-16-le')
+    for op in ops:
+        try:
+            start, end, replacement = op
+        except (TypeError, ValueError):
+            raise PatchError('صيغة التعديل غير صحيحة')
+        if not (isinstance(start, int) and isinstance(end, int) and isinstance(replacement, str)):
+            raise PatchError('صيغة التعديل غير صحيحة')
+        if not 0 <= start <= end <= len(units) // 2:
+            raise PatchError('موضع التعديل خارج حدود المحتوى')
+        units = units[:start * 2] + replacement.encode('utf-16-le') + units[end * 2:]
+    try:
+        return units.decode('utf-16-le')
+    except UnicodeDecodeError:
+        raise PatchError('التعديل يقسم حرفاً إلى نصفين')
@@ -0,0 +1,122 @@
+"""
+تقسيم Markdown إلى كتل مستقلة للتحويل التدريجي
+
+الكتلة مجموعة أسطر بين سطرين فارغين، ويُدمج معها ما يعتمد عليها:
+
+- الكود المحاط بـ ```: تُحدد مواضعه بنفس تعبير markdown2 على النص كاملاً
+  (الإغلاق قد يأتي في منتصف سطر)، فلا يُقسم كود فيه أسطر فارغة
+- الكتلة التالية التي تبدأ بمسافة (فقرة تابعة لعنصر قائمة أو كود بإزاحة)
+- عنصر قائمة بعد كتلة فيها قائمة (قائمة متباعدة)
+
+بعض التراكيب تؤثر في المستند كله فلا يُقسم النص عند وجودها، ويعيد
+``split_blocks`` القيمة None: تعريفات الروابط المرجعية (``[id]: url``)، و HTML
+الخام (قد يمتد عبر الكتل أو يبقى مفتوحاً)، وخط أفقي مع قوائم أو اقتباسات
+متداخلة، وكود بإزاحة بعد اقتباس. معرفات العناوين المكررة بين
+الكتل تُفحص بعد التحويل في ``rendering.render_incremental``.
+
+تحويل كل كتلة وحدها ثم وصلها بـ ``\\n`` يطابق تحويل المستند كاملاً، وهذا ما
+تتحقق منه مجموعة الاختبارات الفرقية في ``notes/tests.py``.
+"""
+
+import re
+
+import markdown2
+
+
+FENCE_RE = markdown2.FencedCodeBlocks.fenced_code_block_re
+CODE_SPAN_RE = markdown2.Markdown._code_span_re
+
+LIST_ITEM_RE = re.compile(r'^[ ]{0,3}(?:[*+-]|\d+\.)[ ]+\S', re.M)
+BLOCKQUOTE_RE = re.compile(r'^[ \t]*>', re.M)
+# أي سطر قد يكون خطاً أفقياً (أوسع من تعبير markdown2)، والقوائم والاقتباسات المتداخلة
+RULE_RE = re.compile(r'^[ ]{0,3}(?:[-*_][ ]*){3,}$', re.M)
+NESTED_RE = re.compile(r'^(?:[ ]+(?:[*+-]|\d+\.)[ ]|[ ]*>[ ]*>)', re.M)
+LINK_DEFINITION_RE = re.compile(r'^[ ]{0,3}\[.+\]:', re.M)
+# وسم HTML خام (الروابط التلقائية مثل <https://...> تُحوَّل لوسم مغلق فلا تمنع التقسيم)
+RAW_HTML_RE = re.compile(r'<(?!(?:https?|ftp|mailto):)[A-Za-z/!?]')
+WHITESPACE_LINE_RE = re.compile(r'^[ \t]+$', re.M)
+
+
+def normalize(content_md):
+    """نفس تطبيع markdown2 قبل التحويل: نهايات الأسطر، الجدولة، والأسطر الفارغة"""
+    text = content_md.replace('\r\n', '\n').replace('\r', '\n')
+    text = '\n'.join(line.expandtabs(4) if '\t' in line else line for line in text.split('\n'))
+    return WHITESPACE_LINE_RE.sub('', text)
+
+
+def _fence_spans(text):
+    return [(match.start(1), match.end()) for match in FENCE_RE.finditer(text + '\n\n')]
+
+
+def _outside_fences(text, spans):
+    parts = []
+    position = 0
+    for start, end in spans:
+        parts.append(text[position:start])
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+def _is_splittable(text, spans):
+    if LINK_DEFINITION_RE.search(text):
+        return False
+    # بعد أول خط أفقي يجمع markdown2 وسوم HTML بتعبير مختلف يغيّر نتيجة
+    # القوائم والاقتباسات المتداخلة في بقية المستند
+    if RULE_RE.search(text) and NESTED_RE.search(text):
+        return False
+    prose = CODE_SPAN_RE.sub('', _outside_fences(text, spans))
+    return RAW_HTML_RE.search(prose) is None
+
+
+def split_blocks(content_md):
+    """
+    قائمة الكتل المستقلة (نصوص مطبَّعة بدون أسطر فارغة في طرفيها)
+
+    يعيد None إذا كان المستند يحتاج تحويلاً كاملاً.
+    """
+    text = normalize(content_md)
+    spans = _fence_spans(text)
+    if not _is_splittable(text, spans):
+        return None
+
+    # الأسطر الفارغة داخل كود محاط ليست حدوداً بين الكتل. كل كتلة مع عدد
+    # الأسطر الفارغة قبلها، ليبقى النص كما هو عند دمج الكتل
+    blocks = []
+    current = []
+    blank_lines = 0
+    offset = 0
+    span_index = 0
+    for line in text.split('\n'):
+        while span_index < len(spans) and spans[span_index][1] <= offset:
+            span_index += 1
+        in_fence = span_index < len(spans) and spans[span_index][0] <= offset
+        if line or in_fence:
+            if not current:
+                blocks.append((blank_lines, current))
+            current.append(line)
+            blank_lines = 0
+        else:
+            current = []
+            blank_lines += 1
+        offset += len(line) + 1
+
+    groups = []
+    for blank_lines, block in blocks:
+        if groups and _continues(groups[-1], block):
+            # كود بإزاحة بعد اقتباس يلحقه markdown2 بالاقتباس مع ما بعده
+            if block[0].startswith(' ') and any(BLOCKQUOTE_RE.match(line) for line in groups[-1]):
+                return None
+            groups[-1].extend([''] * blank_lines)
+            groups[-1].extend(block)
+        else:
+            groups.append(list(block))
+    return ['\n'.join(group) for group in groups]
+
+
+def _continues(previous, block):
+    """هل تكمل الكتلة ما قبلها (فقرة بإزاحة، أو عنصر في نفس القائمة)؟"""
+    first = block[0]
+    if first.startswith(' '):
+        return True
+    return bool(LIST_ITEM_RE.match(first)) and any(LIST_ITEM_RE.match(line) for line in previous)
@@ -0,0 +1,52 @@
+"""
+إحصاءات الوسوم لكل مستخدم (الاسم وعدد الملاحظات) مع تخزين مؤقت
+
+تُبنى من استعلام تجميعي واحد على ``TaggedItem``. مفتاح الذاكرة المؤقتة يتضمن
+``UserStats.updated_at`` الذي يتغير في قاعدة البيانات عند تغيير وسوم أي ملاحظة
+للمستخدم أو حذفها (انظر ``notes.signals``)، فلا تبقى نسخة قديمة في أي عامل
+حتى مع ذاكرة مؤقتة خاصة بكل عملية.
+"""
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Count
+from taggit.models import TaggedItem
+
+
+def _cache_key(user_id, stamp):
+    return f'notes:tag-facets:{user_id}:{stamp.timestamp()}'
+
+
+def build_tag_facets(user_id):
+    """حساب الوسوم وعدد ملاحظات كل وسم مرتبة حسب الشيوع"""
+    from .models import Note
+
+    content_type = ContentType.objects.get_for_model(Note)
+    rows = (
+        TaggedItem.objects
+        .filter(
+            content_type=content_type,
+            object_id__in=Note.objects.filter(owner_id=user_id).values('id'),
+        )
+        .values('tag__name')
+        .annotate(count=Count('id'))
+        .order_by('-count', 'tag__name')
+    )
+    return [{'name': row['tag__name'], 'count': row['count']} for row in rows]
+
+
+def get_tag_facets(user_id):
+    """الوسوم المخزنة مؤقتاً للمستخدم، أو حسابها إن لم تكن موجودة"""
+    from .models import UserStats
+
+    stamp = UserStats.objects.filter(user_id=user_id).values_list('updated_at', flat=True).first()
+    if stamp is None:
+        # لا سجل إحصاءات يتغير مع الوسوم، فلا تخزين
+        return build_tag_facets(user_id)
+    key = _cache_key(user_id, stamp)
+    facets = cache.get(key)
+    if facets is None:
+        facets = build_tag_facets(user_id)
+        cache.set(key, facets, settings.TAG_FACETS_CACHE_TIMEOUT)
+    return facets
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
+from django.core.validators import FileExtensionValidator
 from .models import Note
 
 
@@ -146,3 +147,15 @@ class NoteForm(forms.ModelForm):
                     'id': 'tags-input'
                 })
             )
+
+
+class ImportForm(forms.Form):
+    """نموذج رفع أرشيف ملاحظات للاستيراد"""
+    archive = forms.FileField(
+        label='أرشيف ZIP',
+        validators=[FileExtensionValidator(['zip'])],
+        widget=forms.ClearableFileInput(attrs={
+            'class': 'form-control',
+            'accept': '.zip'
+        })
+    )
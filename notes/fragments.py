@@ -0,0 +1,167 @@
+"""
+ذاكرة مؤقتة لأجزاء القوالب: بطاقات قائمة الملاحظات ومحتوى صفحة التفاصيل
+
+لكل ملاحظة مفتاح واحد لكل جزء (``notes:fragment:<kind>:<id>``) يُحفظ فيه HTML
+مع نسخة الجزء: ``updated_at``، و ``rendered_at`` (التحويل في الخلفية لا يغيّر
+``updated_at``)، ونسخة الوسوم (أسماؤها كما يعرضها الجزء)، وباقي ما يعرضه الجزء
+(المفضلة والمشاهدات في البطاقة، ورابط المشاركة في التفاصيل). اختلاف النسخة
+يعني أن الجزء قديم فيُبنى من جديد، فلا يظهر جزء قديم حتى لو فات الإبطال
+(``QuerySet.update`` أو قراءة من نسخة قاعدة بيانات متأخرة). الحفظ وتغيير
+الوسوم والحذف تحذف مفاتيح الملاحظة مباشرة (انظر ``notes.signals``).
+
+الأجزاء في ``CACHES['fragments']`` (``FRAGMENT_CACHE_BACKEND``: ذاكرة العملية أو
+ملفات أو Redis أو Memcached)، وتُقرأ بطاقات الصفحة كلها في طلب واحد
+(``get_many``). نسب الإصابة لكل جزء في ``/metrics/`` (لهذه العملية).
+"""
+
+import threading
+from collections import defaultdict
+
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from .instrumentation import span
+
+
+FRAGMENT_CACHE_ALIAS = 'fragments'
+
+# يُرفع عند تغيير قوالب الأجزاء لإبطال المخزن منها
+FRAGMENT_VERSION = 1
+
+CARD = 'card'
+BODY = 'body'
+KINDS = (CARD, BODY)
+
+
+def _cache_key(kind, note_id):
+    return f'notes:fragment:{kind}:{note_id}'
+
+
+def _timestamp(value):
+    return value.isoformat() if value else ''
+
+
+def tags_version(note):
+    """أسماء وسوم الملاحظة بترتيب عرضها (من الوسوم المجلوبة مسبقاً)"""
+    return '\x1f'.join(tag.name for tag in note.tags.all())
+
+
+def card_version(note):
+    return (
+        FRAGMENT_VERSION, _timestamp(note.updated_at), _timestamp(note.rendered_at),
+        tags_version(note), note.is_favorite, note.is_public, note.total_views,
+    )
+
+
+def body_version(note, public_url):
+    return (
+        FRAGMENT_VERSION, _timestamp(note.updated_at), _timestamp(note.rendered_at),
+        tags_version(note), note.html_stale, public_url,
+    )
+
+
+class FragmentCache:
+    """أجزاء HTML لكل ملاحظة في ``CACHES[alias]`` مع عدّادات الإصابة لكل نوع"""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+        self.invalidations = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def render_many(self, kind, notes, version, render):
+        """
+        HTML الجزء لكل ملاحظة بنفس الترتيب
+
+        ``version(note)`` نسخة الجزء و ``render(note)`` بناؤه؛ يُبنى الناقص
+        والقديم فقط ويُحفظ في طلب واحد.
+        """
+        versions = {_cache_key(kind, note.pk): version(note) for note in notes}
+        with span('fragment_cache'):
+            cached = self.cache.get_many(list(versions))
+
+        fragments, missing = [], {}
+        for note in notes:
+            key = _cache_key(kind, note.pk)
+            entry = cached.get(key)
+            if entry is not None and entry[0] == versions[key]:
+                fragments.append(mark_safe(entry[1]))
+            else:
+                html = render(note)
+                missing[key] = (versions[key], str(html))
+                fragments.append(html)
+
+        if missing:
+            with span('fragment_cache'):
+                self.cache.set_many(missing)
+        with self._lock:
+            self._hits[kind] += len(notes) - len(missing)
+            self._misses[kind] += len(missing)
+        return fragments
+
+    def invalidate(self, note_id):
+        """حذف أجزاء الملاحظة المخزنة"""
+        self.cache.delete_many([_cache_key(kind, note_id) for kind in KINDS])
+        with self._lock:
+            self.invalidations += 1
+
+    def clear(self):
+        self.cache.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = {'backend': type(self.cache).__name__, 'invalidations': self.invalidations}
+            for kind in KINDS:
+                hits, misses = self._hits[kind], self._misses[kind]
+                lookups = hits + misses
+                stats[kind] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': hits / lookups if lookups else 0.0,
+                }
+            return stats
+
+
+fragment_cache = FragmentCache(FRAGMENT_CACHE_ALIAS)
+
+
+def attach_cards(notes):
+    """
+    إضافة ``card_html`` لكل ملاحظة في الصفحة الحالية
+
+    بطاقات نتائج البحث تحمل مقتطفاً خاصاً بالاستعلام فتُبنى دائماً بدون الذاكرة.
+    """
+    notes = list(notes)
+    template = get_template('notes/note_card.html')
+
+    def render(note):
+        return template.render({'note': note})
+
+    cacheable = [note for note in notes if not getattr(note, 'search_snippet', '')]
+    for note, html in zip(cacheable, fragment_cache.render_many(CARD, cacheable, card_version, render)):
+        note.card_html = html
+    for note in notes:
+        if getattr(note, 'search_snippet', ''):
+            note.card_html = render(note)
+    return notes
+
+
+def attach_body(note, request):
+    """إضافة ``body_html`` (الوسوم، رابط المشاركة، المحتوى، التصدير) لصفحة التفاصيل"""
+    public_url = ''
+    if note.is_public:
+        public_url = request.build_absolute_uri(reverse('public_note', args=[note.public_uuid]))
+    template = get_template('notes/note_body.html')
+    [note.body_html] = fragment_cache.render_many(
+        BODY, [note],
+        lambda item: body_version(item, public_url),
+        lambda item: template.render({'note': item, 'public_url': public_url}),
+    )
+    return note
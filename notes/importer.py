@@ -0,0 +1,332 @@
+"""
+استيراد جماعي لملفات Markdown (ملف ZIP أو مجلد) كملاحظات
+
+الملفات تُعالج على دفعات بحجم ``IMPORT_BATCH_SIZE``، ولكل دفعة:
+
+1. قراءة الملفات وفصل front-matter (العنوان، الوسوم، التواريخ، المشاركة، المفضلة)
+2. تحويل Markdown إلى HTML بـ ``render_many`` في مجموعة عمليات (``IMPORT_WORKERS``)
+3. كتابة الملاحظات بـ ``bulk_create`` ثم الوسوم بـ ``bulk_create`` داخل معاملة واحدة
+
+وفي النهاية تُعاد حساب إحصاءات المستخدم مرة واحدة (لا إشارات مع ``bulk_create``).
+
+كل ملاحظة مستوردة تحمل بصمة ملفها المصدر (``import_key``)، لذا فإن إعادة
+تشغيل استيراد توقف في منتصفه تتخطى الدفعات المكتملة وتكمل الباقي.
+
+الاستيراد من الموقع يعمل في خيط خلفي (``start_import``) ويُحفظ تقدمه في
+``ImportJob`` فيُتابع من ``/notes/import/status/`` على أي عامل، ولا ينتظر الطلب
+انتهاء الأرشيف كله.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, datetime
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from taggit.models import Tag, TaggedItem
+
+from .archive import ArchiveError, ArchiveReader, parse_front_matter
+from .models import ImportJob, Note, UserStats
+from .rendering import render_many
+from .search import build_search_document, index_notes
+
+
+logger = logging.getLogger(__name__)
+
+# أقل عدد ملفات يستحق تشغيل مجموعة العمليات (تشغيلها يستغرق قرابة ثانية)
+PARALLEL_THRESHOLD = 200
+
+TITLE_MAX_LENGTH = Note._meta.get_field('title').max_length
+TAG_MAX_LENGTH = Tag._meta.get_field('name').max_length
+
+
+def import_key(name, text):
+    """بصمة الملف المصدر: المسار مع المحتوى"""
+    digest = hashlib.sha256(name.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _parse_datetime(value):
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, date):
+        parsed = datetime(value.year, value.month, value.day)
+    elif isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            day = parse_date(value)
+            parsed = datetime(day.year, day.month, day.day) if day else None
+    else:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _parse_tags(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, (list, tuple)):
+        return []
+    tags = []
+    for tag in value:
+        tag = str(tag).strip()[:TAG_MAX_LENGTH]
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def parse_document(name, text):
+    """تحويل ملف Markdown إلى قيم الملاحظة"""
+    meta, body = parse_front_matter(text)
+    try:
+        title = str(meta.get('title') or '').strip()
+        created = _parse_datetime(meta.get('created') or meta.get('date'))
+        updated = _parse_datetime(meta.get('updated'))
+    except ValueError:
+        title, created, updated = '', None, None
+    if not title:
+        title = os.path.splitext(os.path.basename(name))[0]
+    return {
+        'title': title[:TITLE_MAX_LENGTH],
+        'content_md': body,
+        'tags': _parse_tags(meta.get('tags')),
+        'created_at': created,
+        'updated_at': updated or created,
+        'is_public': meta.get('public') is True,
+        'is_favorite': meta.get('favorite') is True,
+    }
+
+
+class NoteImporter:
+    """
+    استيراد ملفات أرشيف لمستخدم واحد
+
+    ``progress`` (اختياري) يُستدعى بعد كل دفعة بقاموس الإحصاءات الحالية.
+    """
+
+    def __init__(self, user, batch_size=None, workers=None, progress=None):
+        self.user = user
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.workers = workers or settings.IMPORT_WORKERS
+        self.progress = progress
+        self.stats = {'total': 0, 'processed': 0, 'imported': 0, 'skipped': 0, 'failed': 0}
+        self.errors = []
+        self._seen = set()
+        self._executor = None
+        self._content_type = ContentType.objects.get_for_model(Note)
+
+    def run(self, source):
+        """استيراد كل ملفات المصدر وإرجاع الإحصاءات"""
+        with ArchiveReader(source) as reader:
+            names = reader.names
+            self.stats['total'] = len(names)
+            if self.workers > 1 and len(names) >= PARALLEL_THRESHOLD:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            try:
+                for start in range(0, len(names), self.batch_size):
+                    batch = names[start:start + self.batch_size]
+                    self._import_batch(reader, batch)
+                    self.stats['processed'] += len(batch)
+                    if self.progress:
+                        self.progress(dict(self.stats))
+            finally:
+                if self._executor is not None:
+                    self._executor.shutdown(cancel_futures=True)
+                    self._executor = None
+                if self.stats['imported']:
+                    UserStats.objects.refresh(self.user.pk)
+        return self.stats
+
+    def _read_batch(self, reader, names):
+        documents = []
+        for name in names:
+            try:
+                text = reader.read(name)
+            except ArchiveError as error:
+                self.stats['failed'] += 1
+                self.errors.append(str(error))
+                continue
+            documents.append((name, import_key(name, text), text))
+
+        existing = set(
+            Note.objects.filter(owner=self.user, import_key__in=[key for _, key, _ in documents])
+            .values_list('import_key', flat=True)
+        )
+        new_documents = []
+        for name, key, text in documents:
+            if key in existing or key in self._seen:
+                self.stats['skipped'] += 1
+                continue
+            self._seen.add(key)
+            new_documents.append((key, parse_document(name, text)))
+        return new_documents
+
+    def _render(self, contents):
+        if self._executor is None:
+            return render_many(contents)
+        size = max(1, len(contents) // (self.workers * 4))
+        chunks = [contents[start:start + size] for start in range(0, len(contents), size)]
+        return [rendered for chunk in self._executor.map(render_many, chunks) for rendered in chunk]
+
+    def _import_batch(self, reader, names):
+        documents = self._read_batch(reader, names)
+        if not documents:
+            return
+
+        rendered = self._render([values['content_md'] for _, values in documents])
+        now = timezone.now()
+        notes = []
+        for (key, values), (html, excerpt, word_count, reading_time) in zip(documents, rendered):
+            notes.append(Note(
+                owner=self.user,
+                title=values['title'],
+                content_md=values['content_md'],
+                content_html=html,
+                search_document=build_search_document(values['title'], values['content_md']),
+                excerpt=excerpt,
+                word_count=word_count,
+                reading_time=reading_time,
+                is_public=values['is_public'],
+                is_favorite=values['is_favorite'],
+                revision=1,
+                rendered_at=now,
+                import_key=key,
+            ))
+
+        with transaction.atomic():
+            Note.objects.bulk_create(notes)
+            self._restore_dates(notes, [values for _, values in documents])
+            self._attach_tags(notes, [values['tags'] for _, values in documents])
+            index_notes(notes)
+
+        self.stats['imported'] += len(notes)
+
+    def _restore_dates(self, notes, documents):
+        """
+        إعادة تواريخ الملفات الأصلية، لأن ``bulk_create`` يضع الوقت الحالي في
+        حقلي ``auto_now``. استعلام واحد بدلاً من ``bulk_update`` (CASE لكل صف).
+        """
+        created_field = Note._meta.get_field('created_at')
+        updated_field = Note._meta.get_field('updated_at')
+        rows = []
+        for note, values in zip(notes, documents):
+            if values['created_at']:
+                note.created_at = values['created_at']
+                note.updated_at = values['updated_at']
+                rows.append([
+                    created_field.get_db_prep_value(note.created_at, connection),
+                    updated_field.get_db_prep_value(note.updated_at, connection),
+                    note.pk,
+                ])
+        if rows:
+            table = connection.ops.quote_name(Note._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'UPDATE {table} SET created_at = %s, updated_at = %s WHERE id = %s', rows
+                )
+
+    def _get_or_create_tags(self, names):
+        tags = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+        missing = names - tags.keys()
+        if missing:
+            Tag.objects.bulk_create(
+                [Tag(name=name, slug=Tag().slugify(name)) for name in missing],
+                ignore_conflicts=True,
+            )
+            tags.update((tag.name, tag) for tag in Tag.objects.filter(name__in=missing))
+            # اسم جديد يطابق slug وسم موجود: الحفظ العادي يضيف لاحقة للـ slug
+            for name in missing - tags.keys():
+                tags[name] = Tag.objects.create(name=name)
+        return tags
+
+    def _attach_tags(self, notes, tag_lists):
+        names = {name for tag_names in tag_lists for name in tag_names}
+        if not names:
+            return
+        tags = self._get_or_create_tags(names)
+        TaggedItem.objects.bulk_create([
+            TaggedItem(content_type=self._content_type, object_id=note.pk, tag=tags[name])
+            for note, tag_names in zip(notes, tag_lists)
+            for name in tag_names
+        ])
+
+
+# ===== Background imports =====
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _import_executor():
+    # خيط واحد لكل عملية: الاستيرادات تُنفذ بالترتيب، وكل منها يستخدم
+    # مجموعة عمليات التحويل الخاصة به للأرشيفات الكبيرة
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='notes-import')
+        return _executor
+
+
+def start_import(user, upload):
+    """
+    بدء استيراد ملف مرفوع في الخلفية وإرجاع ``ImportJob`` الخاص به
+
+    الملف المرفوع يُغلق بانتهاء الطلب فيُنسخ أولاً إلى ملف مؤقت، ويُتحقق من
+    أنه أرشيف ZIP صالح قبل الرد (``ArchiveError``).
+    """
+    with tempfile.NamedTemporaryFile(suffix='.zip', delete=False) as archive:
+        for chunk in upload.chunks():
+            archive.write(chunk)
+    try:
+        with ArchiveReader(archive.name) as reader:
+            total = len(reader.names)
+    except ArchiveError:
+        os.remove(archive.name)
+        raise
+
+    job = ImportJob.objects.create(
+        user=user, stats={'total': total, 'processed': 0, 'imported': 0, 'skipped': 0, 'failed': 0},
+    )
+    _import_executor().submit(_run_import, job, archive.name)
+    return job
+
+
+def run_import(job, source):
+    """استيراد المصدر مع حفظ التقدم في ``job`` بعد كل دفعة وإرجاع الإحصاءات"""
+    importer = NoteImporter(job.user, progress=lambda stats: job.record(ImportJob.RUNNING, stats))
+    try:
+        stats = importer.run(source)
+    except Exception as error:
+        if not isinstance(error, ArchiveError):
+            logger.exception('فشل استيراد ملاحظات المستخدم #%s', job.user_id)
+            error = 'تعذر إكمال الاستيراد'
+        job.record(ImportJob.FAILED, importer.stats, str(error))
+        raise
+    job.record(ImportJob.DONE, stats, '\n'.join(importer.errors[:20]))
+    return stats
+
+
+def _run_import(job, path):
+    try:
+        run_import(job, path)
+    except Exception:
+        # الخطأ محفوظ في العملية (ومسجل في السجل إن لم يكن خطأ في الأرشيف)
+        pass
+    finally:
+        os.remove(path)
+        # اتصالات هذا الخيط لا يغلقها request_finished
+        connections.close_all()
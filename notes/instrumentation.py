@@ -0,0 +1,194 @@
+"""
+قياس أداء كل طلب: عدد الاستعلامات وزمنها ومقاطع زمنية مسماة
+
+عند تفعيل ``PERFORMANCE_INSTRUMENTATION`` يجمع ``PerformanceMiddleware`` لكل طلب:
+
+- عدد الاستعلامات وزمنها الكلي (لكل اتصالات قاعدة البيانات)
+- مقاطع ``span()``: ``markdown`` و ``bleach`` (تحويل المحتوى)، ``template``
+  (عرض القوالب)، و ``pdf`` (بناء PDF بـ reportlab)
+
+وتُرسل في ترويسة ``Server-Timing`` وفي سطر سجل JSON عبر المسجِّل
+``notes.performance``. الطلبات الأبطأ من ``PERFORMANCE_SLOW_REQUEST_MS``
+تُسجَّل كتحذير، ونسبة ``PERFORMANCE_SLOW_SQL_SAMPLE_RATE`` منها مع نصوص SQL.
+
+عند التعطيل لا يُحمَّل الوسيط أصلاً، و ``span()`` تكتفي بقراءة متغير سياق.
+زمن إرسال الردود المتدفقة (التصدير) لا يدخل في القياس.
+
+في وضع ASGI تُنفَّذ الاستعلامات في خيط الطلب المتزامن (``sync_to_async``)
+لا في حلقة الأحداث، لذا يُركَّب غلاف القياس على اتصالات ذلك الخيط.
+"""
+
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+
+
+logger = logging.getLogger('notes.performance')
+
+# أقصى عدد استعلامات تُحفظ نصوصها في الطلب الواحد
+MAX_SAMPLED_QUERIES = 100
+
+_current = ContextVar('notes_request_timings', default=None)
+
+
+class RequestTimings:
+    """أزمنة طلب واحد"""
+
+    def __init__(self, keep_sql):
+        self.started = time.perf_counter()
+        self.keep_sql = keep_sql
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.queries = []
+        self.spans = {}
+
+    def add_span(self, name, seconds):
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + seconds, count + 1)
+
+    def __call__(self, execute, sql, params, many, context):
+        """غلاف ``execute_wrapper`` لقياس كل استعلام"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.query_count += 1
+            self.db_seconds += elapsed
+            if self.keep_sql and len(self.queries) < MAX_SAMPLED_QUERIES:
+                self.queries.append({
+                    'alias': context['connection'].alias,
+                    'sql': sql,
+                    'ms': round(elapsed * 1000, 3),
+                })
+
+    def server_timing(self, total_seconds):
+        entries = [f'db;dur={self.db_seconds * 1000:.1f};desc="{self.query_count} queries"']
+        for name, (seconds, count) in self.spans.items():
+            entries.append(f'{name};dur={seconds * 1000:.1f}' + (f';desc="x{count}"' if count > 1 else ''))
+        entries.append(f'total;dur={total_seconds * 1000:.1f}')
+        return ', '.join(entries)
+
+
+@contextmanager
+def span(name):
+    """قياس مقطع مسمى داخل الطلب الحالي (لا شيء خارج طلب مُقاس)"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add_span(name, time.perf_counter() - start)
+
+
+class PerformanceMiddleware:
+    """قياس كل طلب وإرسال النتائج في ``Server-Timing`` والسجل"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def start():
+        # نصوص SQL تُحفظ فقط للطلبات المختارة في العينة (إن كانت بطيئة)
+        return RequestTimings(keep_sql=random.random() < settings.PERFORMANCE_SLOW_SQL_SAMPLE_RATE)
+
+    @staticmethod
+    def wrap_connections(stack, timings):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timings))
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings = self.start()
+        token = _current.set(timings)
+        try:
+            with ExitStack() as stack:
+                self.wrap_connections(stack, timings)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = self.start()
+        token = _current.set(timings)
+        stack = ExitStack()
+        try:
+            await sync_to_async(self.wrap_connections)(stack, timings)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = timings.server_timing(total)
+        self.log(request, response, timings, total)
+        return response
+
+    def log(self, request, response, timings, total):
+        slow = total * 1000 >= settings.PERFORMANCE_SLOW_REQUEST_MS
+        level = logging.WARNING if slow else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+        match = getattr(request, 'resolver_match', None)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 3),
+            'db_ms': round(timings.db_seconds * 1000, 3),
+            'queries': timings.query_count,
+            'spans': {
+                name: {'ms': round(seconds * 1000, 3), 'count': count}
+                for name, (seconds, count) in timings.spans.items()
+            },
+            'slow': slow,
+        }
+        if slow and timings.keep_sql:
+            record['sql'] = timings.queries
+        # نص JSON في الرسالة لأي معالج، ونفس القيم في ``record.performance`` للمنسقات المخصصة
+        logger.log(level, json.dumps(record, ensure_ascii=False), extra={'performance': record})
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with span('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """محرك قوالب Django مع قياس زمن عرض كل قالب رئيسي (``template``)"""
+
+    def from_string(self, template_code):
+        template = super().from_string(template_code)
+        return TimedTemplate(template.template, self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
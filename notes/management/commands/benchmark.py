@@ -0,0 +1,487 @@
+import io
+import json
+import platform
+import random
+import statistics
+import tempfile
+import time
+import zipfile
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from taggit.models import Tag, TaggedItem
+
+from notes import public_cache, urls
+from notes.fragments import fragment_cache
+from notes.models import Note, UserStats
+from notes.pagination import paginate
+from notes.preview import BLOCK_ID_LENGTH
+from notes.rendering import block_cache, preview_blocks, render_cache, render_document
+from notes.search import build_search_document, index_notes
+from notes.view_counter import view_counter
+
+
+ARABIC_SENTENCES = [
+    'تساعد الملاحظات المنظمة على تذكر الأفكار المهمة ومراجعتها لاحقاً.',
+    'يمكن كتابة المحتوى بصيغة Markdown مع العناوين والقوائم والجداول.',
+    'البحث في الملاحظات يعتمد على فهرس نصي كامل يدعم اللغة العربية.',
+    'قبل النشر يجب قياس زمن الاستجابة وعدد الاستعلامات لكل صفحة.',
+    'الكتابة اليومية عادة بسيطة لكنها تترك أثراً كبيراً مع الوقت.',
+    'مُلاحظةٌ مُشَكَّلةٌ بالحركات لاختبار التطبيع في البحث والفهرسة.',
+]
+
+ENGLISH_SENTENCES = [
+    'Benchmarks should run against realistic data, not empty tables.',
+    'The quick brown fox jumps over the lazy dog near the river bank.',
+    'Mixed-direction text like Django و Python is common in these notes.',
+    'Query counts catch N+1 regressions that latency alone can hide.',
+]
+
+CODE_SAMPLES = [
+    ('python', 'def fibonacci(n):\n    a, b = 0, 1\n    for _ in range(n):\n        a, b = b, a + b\n    return a\n'),
+    ('javascript', 'const total = items\n  .filter(item => item.active)\n  .reduce((sum, item) => sum + item.price, 0);\n'),
+    ('sql', 'SELECT owner_id, COUNT(*)\nFROM notes_note\nGROUP BY owner_id\nORDER BY 2 DESC;\n'),
+]
+
+TAG_WORDS = ['عمل', 'دراسة', 'أفكار', 'قراءة', 'برمجة', 'python', 'django', 'سفر', 'مشاريع', 'اجتماعات']
+
+
+def make_markdown(rng, blocks):
+    """نص Markdown عشوائي (بذرة ثابتة) بعناوين وفقرات عربية وإنجليزية وكود وجداول وقوائم"""
+    parts = []
+    for index in range(blocks):
+        kind = rng.choice(('heading', 'arabic', 'arabic', 'english', 'code', 'table', 'list', 'quote'))
+        if kind == 'heading':
+            parts.append(f'{"#" * rng.randint(1, 3)} {rng.choice(ARABIC_SENTENCES)[:30]} {index}')
+        elif kind == 'arabic':
+            parts.append(' '.join(rng.choices(ARABIC_SENTENCES, k=rng.randint(2, 6))))
+        elif kind == 'english':
+            parts.append(' '.join(rng.choices(ENGLISH_SENTENCES, k=rng.randint(2, 5))))
+        elif kind == 'code':
+            language, code = rng.choice(CODE_SAMPLES)
+            parts.append(f'```{language}\n{code}```')
+        elif kind == 'table':
+            rows = ['| البند | القيمة | ملاحظات |', '|---|---:|---|']
+            rows += [f'| بند {row} | {rng.randint(1, 1000)} | **{rng.choice(TAG_WORDS)}** |' for row in range(rng.randint(2, 8))]
+            parts.append('\n'.join(rows))
+        elif kind == 'list':
+            parts.append('\n'.join(f'- {rng.choice(ARABIC_SENTENCES)}' for _ in range(rng.randint(2, 6))))
+        else:
+            parts.append(f'> {rng.choice(ARABIC_SENTENCES)} [رابط](https://example.com/{index})')
+    return '\n\n'.join(parts) + '\n'
+
+
+def summarize_timings(samples):
+    """إحصاءات الزمن بالملي ثانية"""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        'min_ms': round(ordered[0] * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'قياس زمن كل صفحات notes.urls ومسار Note.save على بيانات تجريبية في قاعدة '
+        'بيانات اختبار مؤقتة، وإخراج النتائج بصيغة JSON (مع مقارنة اختيارية بنتيجة سابقة)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=3, help='عدد المستخدمين')
+        parser.add_argument('--notes', type=int, default=200, help='عدد الملاحظات لكل مستخدم')
+        parser.add_argument('--tags', type=int, default=40, help='عدد الوسوم المختلفة')
+        parser.add_argument('--versioned-notes', type=int, default=20,
+                            help='عدد الملاحظات التي تُعدَّل لإنشاء سجل نسخ')
+        parser.add_argument('--versions', type=int, default=5, help='عدد النسخ لكل ملاحظة معدلة')
+        parser.add_argument('--repeat', type=int, default=10, help='عدد مرات قياس كل حالة')
+        parser.add_argument('--warmup', type=int, default=2, help='مرات تشغيل غير محسوبة قبل القياس')
+        parser.add_argument('--seed', type=int, default=0, help='بذرة البيانات العشوائية')
+        parser.add_argument('--route', action='append', dest='routes',
+                            help='قياس مسار محدد فقط بالاسم (يمكن تكراره)')
+        parser.add_argument('--output', help='حفظ JSON في ملف بدلاً من الطباعة')
+        parser.add_argument('--compare', help='ملف JSON من تشغيل سابق للمقارنة به')
+        parser.add_argument('--threshold', type=float, default=1.25,
+                            help='نسبة زيادة الوسيط التي تُعد تراجعاً عند المقارنة')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory() as pdf_dir, override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                CACHES={
+                    'default': {
+                        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                        'LOCATION': 'notes-benchmark',
+                    },
+                    'fragments': {
+                        **settings.CACHES['fragments'],
+                        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                        'LOCATION': 'notes-benchmark-fragments',
+                    },
+                },
+                PDF_CACHE_DIR=pdf_dir,
+                # قاعدة القياس على default فقط: لا قراءة من النسخة المتماثلة الحقيقية
+                DATABASE_REPLICA_READS=False,
+                # الاستيراد داخل الطلب ليُقاس عمله كاملاً ولا يكتب بعد حذف قاعدة القياس
+                IMPORT_ASYNC=False,
+                # بدون الحاجة إلى collectstatic قبل القياس
+                STORAGES={
+                    **settings.STORAGES,
+                    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+                },
+            ):
+                render_cache.clear()
+                block_cache.clear()
+                seed_start = time.perf_counter()
+                self.seed()
+                seed_seconds = time.perf_counter() - seed_start
+                results = {
+                    'meta': self.meta(seed_seconds),
+                    'routes': self.run_cases(self.route_cases()),
+                    'render': self.run_cases(self.render_cases()),
+                }
+                view_counter.flush()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        results['meta']['uncovered_routes'] = sorted(
+            {pattern.name for pattern in urls.urlpatterns} - {case['route'] for case in results['routes']}
+        )
+        if results['meta']['uncovered_routes'] and not options['routes']:
+            self.stderr.write(f'مسارات بدون حالة قياس: {", ".join(results["meta"]["uncovered_routes"])}')
+
+        output = json.dumps(results, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                output_file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def meta(self, seed_seconds):
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'seed': self.options['seed'],
+            'users': self.options['users'],
+            'notes_per_user': self.options['notes'],
+            'tags': self.options['tags'],
+            'versioned_notes': self.options['versioned_notes'],
+            'versions': self.options['versions'],
+            'repeat': self.options['repeat'],
+            'warmup': self.options['warmup'],
+            'seed_seconds': round(seed_seconds, 3),
+        }
+
+    # ===== Synthetic data =====
+
+    def seed(self):
+        rng = self.rng
+        tag_names = [f'{rng.choice(TAG_WORDS)}-{index}' for index in range(self.options['tags'])]
+        Tag.objects.bulk_create([Tag(name=name, slug=Tag().slugify(name)) for name in tag_names])
+        tags = list(Tag.objects.filter(name__in=tag_names))
+        content_type = ContentType.objects.get_for_model(Note)
+
+        self.users = [User.objects.create_user(f'bench{index}') for index in range(self.options['users'])]
+        self.staff = User.objects.create_user('bench-staff', is_staff=True)
+        now = timezone.now()
+        for user in self.users:
+            notes = []
+            for index in range(self.options['notes']):
+                # ملاحظة كبيرة من كل 50 (جداول وكود كثير)
+                blocks = 150 if index % 50 == 49 else rng.randint(3, 25)
+                title = f'{rng.choice(ARABIC_SENTENCES)[:40]} {index}'
+                content = make_markdown(rng, blocks)
+                html, excerpt, word_count, reading_time = render_document(content)
+                notes.append(Note(
+                    owner=user,
+                    title=title,
+                    content_md=content,
+                    content_html=html,
+                    search_document=build_search_document(title, content),
+                    excerpt=excerpt,
+                    word_count=word_count,
+                    reading_time=reading_time,
+                    views=rng.randint(0, 500),
+                    is_favorite=rng.random() < 0.15,
+                    is_public=rng.random() < 0.1,
+                    revision=1,
+                    rendered_at=now,
+                ))
+            Note.objects.bulk_create(notes, batch_size=500)
+            index_notes(notes)
+            TaggedItem.objects.bulk_create([
+                TaggedItem(content_type=content_type, object_id=note.pk, tag=tag)
+                for note in notes
+                for tag in rng.sample(tags, k=min(len(tags), rng.randint(0, 4)))
+            ])
+
+        # سجل النسخ عبر مسار الحفظ الحقيقي
+        for user in self.users:
+            for note in user.notes.order_by('pk')[:self.options['versioned_notes']]:
+                for _ in range(self.options['versions']):
+                    note.content_md += f'\n\n{rng.choice(ARABIC_SENTENCES)}\n'
+                    note.save()
+
+        for user in self.users:
+            UserStats.objects.refresh(user.pk)
+
+    # ===== Cases =====
+
+    def clients(self):
+        owner = Client()
+        owner.force_login(self.users[0])
+        staff = Client()
+        staff.force_login(self.staff)
+        return {'owner': owner, 'staff': staff, 'anonymous': Client()}
+
+    def route_cases(self):
+        """حالات القياس: (المفتاح، اسم المسار، العميل، دالة تعيد الطلب لكل تكرار)"""
+        user = self.users[0]
+        notes = list(user.notes.order_by('pk'))
+        note = next(item for item in notes if not item.is_public)
+        large_note = max(notes, key=lambda item: len(item.content_md))
+        public_note = next((item for item in notes if item.is_public), None)
+        if public_note is None:
+            public_note = next(item for item in notes if item != note)
+            public_note.is_public = True
+            public_note.save(update_fields=['is_public'])
+        tag = next(iter(note.tags.names()), '')
+        search_word = 'البحث'
+        next_cursor = paginate(user.notes.for_list(), ('-updated_at',)).next_cursor
+
+        def get(path, **extra):
+            return lambda i: ('get', path, {}, extra)
+
+        def post(path, data=None, **extra):
+            return lambda i: ('post', path, data(i) if callable(data) else (data or {}), extra)
+
+        def json_request(method, path, data):
+            return lambda i: (method, path, json.dumps(data(i)), {'content_type': 'application/json'})
+
+        def throwaway_note(i):
+            return Note.objects.create(owner=user, title=f'حذف {i}', content_md=make_markdown(self.rng, 5)).pk
+
+        def archive(i):
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, 'w') as archive_file:
+                for index in range(5):
+                    archive_file.writestr(f'import-{i}-{index}.md', f'---\ntitle: استيراد {i} {index}\ntags: [bench]\n---\n{make_markdown(self.rng, 5)}')
+            return {'archive': SimpleUploadedFile(f'bench-{i}.zip', buffer.getvalue(), 'application/zip')}
+
+        def public_cold(i):
+            public_cache.invalidate_page(public_note.public_uuid)
+            return ('get', reverse('public_note', args=[public_note.public_uuid]), {}, {})
+
+        list_url = reverse('notes_list')
+
+        def list_cold(i):
+            fragment_cache.clear()
+            return ('get', list_url, {}, {})
+
+        public_url = reverse('public_note', args=[public_note.public_uuid])
+        etag = Client().get(public_url, secure=True)['ETag']
+
+        def edit_data(i):
+            return {
+                'title': note.title,
+                'content_md': f'{note.content_md}\n\nتعديل {i}\n',
+                'is_favorite': 'on' if note.is_favorite else '',
+                'tags_field': tag,
+            }
+
+        # المعاينة بتعديلات: ``seq`` يستمر من طلبات المعاينة الكاملة قبلها في نفس الجلسة
+        preview_runs = self.options['warmup'] + self.options['repeat']
+        preview_have = [key[:BLOCK_ID_LENGTH] for key, _ in preview_blocks(large_note.content_md)]
+
+        api_note_url = reverse('api_note', args=[note.pk])
+        cases = [
+            ('home', 'home', 'anonymous', get(reverse('home'))),
+            ('register', 'register', 'anonymous', get(reverse('register'))),
+            ('login', 'login', 'anonymous', get(reverse('login'))),
+            ('logout', 'logout', 'logout', get(reverse('logout'))),
+            ('profile', 'profile', 'owner', get(reverse('profile'))),
+            ('markdown_docs', 'markdown_docs', 'anonymous', get(reverse('markdown_docs'))),
+            ('notes_list', 'notes_list', 'owner', get(list_url)),
+            ('notes_list:cold-fragments', 'notes_list', 'owner', list_cold),
+            ('notes_list:sort-title', 'notes_list', 'owner', get(f'{list_url}?sort=title')),
+            ('notes_list:next-page', 'notes_list', 'owner', get(f'{list_url}?cursor={next_cursor or ""}')),
+            ('notes_list:favorites', 'notes_list', 'owner', get(f'{list_url}?favorites=1')),
+            ('notes_list:tag', 'notes_list', 'owner', get(f'{list_url}?tag={tag}')),
+            ('notes_list:search', 'notes_list', 'owner', get(f'{list_url}?search={search_word}')),
+            ('note_detail', 'note_detail', 'owner', get(reverse('note_detail', args=[note.pk]))),
+            ('note_detail:large', 'note_detail', 'owner', get(reverse('note_detail', args=[large_note.pk]))),
+            ('note_create', 'note_create', 'owner', get(reverse('note_create'))),
+            ('note_create:post', 'note_create', 'owner', post(reverse('note_create'), lambda i: {
+                'title': f'ملاحظة جديدة {i}', 'content_md': make_markdown(self.rng, 10), 'tags_field': 'bench',
+            })),
+            ('note_edit', 'note_edit', 'owner', get(reverse('note_edit', args=[note.pk]))),
+            ('note_edit:post', 'note_edit', 'owner', post(reverse('note_edit', args=[note.pk]), edit_data)),
+            ('note_delete', 'note_delete', 'owner', get(reverse('note_delete', args=[note.pk]))),
+            ('note_delete:post', 'note_delete', 'owner',
+             lambda i: ('post', reverse('note_delete', args=[throwaway_note(i)]), {}, {})),
+            ('toggle_favorite', 'toggle_favorite', 'owner', post(reverse('toggle_favorite', args=[note.pk]))),
+            ('autosave:full', 'autosave', 'owner', json_request('post', reverse('autosave', args=[note.pk]), lambda i: {
+                'title': note.title, 'content_md': f'{note.content_md}\n\nحفظ تلقائي {i}\n',
+            })),
+            ('autosave:patch', 'autosave', 'owner', json_request('post', reverse('autosave', args=[note.pk]), lambda i: {
+                'patch': [[0, 0, f'{i} ']],
+            })),
+            ('note_preview:full', 'note_preview', 'owner', json_request('post', reverse('note_preview'), lambda i: {
+                'note': large_note.pk, 'content_md': large_note.content_md,
+            })),
+            ('note_preview:patch', 'note_preview', 'owner', json_request('post', reverse('note_preview'), lambda i: {
+                'note': large_note.pk, 'seq': preview_runs + i, 'patch': [[0, 0, 'x']], 'have': preview_have,
+            })),
+            ('metrics', 'metrics', 'staff', get(reverse('metrics'))),
+            ('public_note:cold', 'public_note', 'anonymous', public_cold),
+            ('public_note:cached', 'public_note', 'anonymous', get(public_url)),
+            ('public_note:not-modified', 'public_note', 'anonymous', get(public_url, HTTP_IF_NONE_MATCH=etag)),
+            ('export_markdown', 'export_markdown', 'owner', get(reverse('export_markdown', args=[note.pk]))),
+            ('export_pdf', 'export_pdf', 'owner', get(reverse('export_pdf', args=[large_note.pk]))),
+            ('export_all', 'export_all', 'owner', get(reverse('export_all'))),
+            ('import_notes', 'import_notes', 'owner', post(reverse('import_notes'), archive)),
+            ('import_status', 'import_status', 'owner', get(reverse('import_status'))),
+            ('api_notes', 'api_notes', 'owner', get(reverse('api_notes'))),
+            ('api_notes:sparse', 'api_notes', 'owner', get(f'{reverse("api_notes")}?fields=id,title&limit=200')),
+            ('api_notes:post', 'api_notes', 'owner', json_request('post', reverse('api_notes'), lambda i: {
+                'title': f'API {i}', 'content_md': make_markdown(self.rng, 10), 'tags': ['bench'],
+            })),
+            ('api_note', 'api_note', 'owner', get(api_note_url)),
+            ('api_note:patch', 'api_note', 'owner', json_request('patch', api_note_url, lambda i: {
+                'content_md': f'{note.content_md}\n\nAPI {i}\n',
+            })),
+        ]
+        if self.options['routes']:
+            cases = [case for case in cases if case[1] in self.options['routes']]
+        return cases
+
+    def render_cases(self):
+        """مسار ``Note.save``: إنشاء وتعديل بأحجام مختلفة (محتوى جديد في كل مرة)"""
+        if self.options['routes']:
+            return []
+        user = self.users[0]
+        sizes = {'small': 5, 'medium': 40, 'large': 300}
+        contents = {name: make_markdown(self.rng, blocks) for name, blocks in sizes.items()}
+        edited = {name: Note.objects.create(owner=user, title=name, content_md=contents[name]) for name in sizes}
+
+        def create(name):
+            def run(i):
+                # ملاحظة جديدة بالكامل: بدون كتل محوّلة سابقاً
+                block_cache.clear()
+                Note.objects.create(owner=user, title=f'{name} {i}', content_md=f'{contents[name]}\n{i}\n')
+            return run
+
+        def edit(name):
+            def run(i):
+                note = edited[name]
+                note.content_md = f'{contents[name]}\nتعديل {i}\n'
+                note.save()
+            return run
+
+        def retitle(i):
+            # نفس المحتوى: التحويل من الذاكرة المؤقتة
+            note = edited['medium']
+            note.title = f'medium {i}'
+            note.save()
+
+        cases = []
+        for name in sizes:
+            cases.append((f'save:create-{name}', 'Note.save', None, create(name)))
+            cases.append((f'save:edit-{name}', 'Note.save', None, edit(name)))
+        cases.append(('save:edit-cached-render', 'Note.save', None, retitle))
+        return cases
+
+    def run_cases(self, cases):
+        clients = self.clients()
+        results = []
+        for key, route, client_name, make_request in cases:
+            timings, query_counts, statuses, sizes = [], [], set(), []
+            for i in range(self.options['warmup'] + self.options['repeat']):
+                if client_name == 'logout':
+                    client = Client()
+                    client.force_login(self.users[0])
+                else:
+                    client = clients.get(client_name)
+                request = make_request(i) if client is not None else None
+
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    if request is None:
+                        make_request(i)
+                    else:
+                        method, path, data, extra = request
+                        response = getattr(client, method)(path, data, secure=True, **extra)
+                        body = b''.join(response.streaming_content) if response.streaming else response.content
+                    elapsed = time.perf_counter() - start
+
+                if i < self.options['warmup']:
+                    continue
+                timings.append(elapsed)
+                query_counts.append(len(queries.captured_queries))
+                if request is not None:
+                    statuses.add(response.status_code)
+                    sizes.append(len(body))
+
+            result = {
+                'key': key,
+                'route': route,
+                **summarize_timings(timings),
+                'queries_median': statistics.median(query_counts),
+                'queries_max': max(query_counts),
+            }
+            if statuses:
+                result['status'] = sorted(statuses)
+                result['response_bytes'] = int(statistics.median(sizes))
+                if any(status >= 400 for status in statuses):
+                    self.stderr.write(f'{key}: رمز حالة غير متوقع {sorted(statuses)}')
+            results.append(result)
+        return results
+
+    # ===== Comparison =====
+
+    def compare(self, results, baseline_path, threshold):
+        """مقارنة الوسيط وعدد الاستعلامات بتشغيل سابق، مع خطأ عند وجود تراجع"""
+        try:
+            with open(baseline_path, encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'تعذر قراءة ملف المقارنة: {error}')
+
+        previous = {case['key']: case for section in ('routes', 'render') for case in baseline.get(section, [])}
+        regressions = []
+        for case in results['routes'] + results['render']:
+            old = previous.get(case['key'])
+            if old is None:
+                continue
+            # فرق أقل من 1ms يُعد ضوضاء في الحالات السريعة
+            slower = (case['median_ms'] > old['median_ms'] * threshold
+                      and case['median_ms'] - old['median_ms'] > 1)
+            if slower or case['queries_max'] > old['queries_max']:
+                regressions.append(
+                    f'{case["key"]}: {old["median_ms"]}ms -> {case["median_ms"]}ms, '
+                    f'{old["queries_max"]} -> {case["queries_max"]} استعلام'
+                )
+
+        if regressions:
+            raise CommandError('تراجع في الأداء:\n' + '\n'.join(regressions))
+        self.stderr.write('لا تراجع مقارنة بالتشغيل السابق')
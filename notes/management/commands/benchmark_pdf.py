@@ -0,0 +1,77 @@
+import json
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from notes.models import Note
+from notes.pdf import build_pdf, open_pdf
+
+
+SAMPLE_LINE = 'سطر تجريبي للملاحظة مع نص English مختلط و **تنسيق** بسيط رقم {}'
+
+
+def make_content(size):
+    """نص Markdown بالحجم المطلوب تقريباً (بالبايت)"""
+    lines = []
+    total = 0
+    i = 0
+    while total < size:
+        line = SAMPLE_LINE.format(i)
+        lines.append(line)
+        total += len(line.encode('utf-8')) + 1
+        i += 1
+    return '\n'.join(lines)
+
+
+class Command(BaseCommand):
+    help = 'قياس زمن تصدير PDF لملاحظات بأحجام 1KB و100KB و1MB (بناء أول ثم قراءة من الذاكرة المؤقتة)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1024,102400,1048576',
+                            help='أحجام الملاحظات بالبايت مفصولة بفاصلة')
+        parser.add_argument('--json', action='store_true', help='إخراج النتائج بصيغة JSON')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        results = []
+
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(PDF_CACHE_DIR=cache_dir):
+            for index, size in enumerate(sizes, start=1):
+                note = Note(pk=index, title=f'Benchmark {size}', content_md=make_content(size))
+
+                # الطريقة القديمة: بناء كامل في الذاكرة لكل طلب
+                start = time.perf_counter()
+                with tempfile.TemporaryFile() as buffer:
+                    build_pdf(note.title, note.content_md, buffer)
+                uncached = time.perf_counter() - start
+
+                start = time.perf_counter()
+                with open_pdf(note) as pdf_file:
+                    pdf_size = len(pdf_file.read())
+                cold = time.perf_counter() - start
+
+                start = time.perf_counter()
+                with open_pdf(note) as pdf_file:
+                    pdf_file.read()
+                warm = time.perf_counter() - start
+
+                results.append({
+                    'note_bytes': size,
+                    'pdf_bytes': pdf_size,
+                    'build_seconds': round(uncached, 4),
+                    'cold_cache_seconds': round(cold, 4),
+                    'warm_cache_seconds': round(warm, 6),
+                })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f'{"note":>10} {"pdf":>10} {"build":>10} {"cold":>10} {"warm":>10}')
+        for row in results:
+            self.stdout.write(
+                f'{row["note_bytes"]:>10} {row["pdf_bytes"]:>10} {row["build_seconds"]:>10} '
+                f'{row["cold_cache_seconds"]:>10} {row["warm_cache_seconds"]:>10}'
+            )
@@ -0,0 +1,70 @@
+import json
+import random
+import time
+
+import bleach
+import markdown2
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.management.commands.benchmark import make_markdown
+from notes.rendering import ALLOWED_ATTRIBUTES, ALLOWED_TAGS, MARKDOWN_EXTRAS, engine, render_many
+
+
+def render_per_call(content_md):
+    """الطريقة السابقة: محوّل ومعقِّم جديدان في كل استدعاء"""
+    html = markdown2.markdown(content_md, extras=MARKDOWN_EXTRAS)
+    return bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+
+
+def measure(function, argument, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(argument)
+    return (time.perf_counter() - start) / iterations
+
+
+class Command(BaseCommand):
+    help = 'مقارنة زمن تحويل Markdown لكل استدعاء قبل محرك التحويل المشترك وبعده (مستند صغير وكبير)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blocks', default='5,400',
+                            help='عدد كتل المستندات المختبرة مفصولة بفاصلة (صغير وكبير)')
+        parser.add_argument('--seconds', type=float, default=2.0,
+                            help='الزمن التقريبي لقياس كل طريقة مع كل مستند')
+        parser.add_argument('--json', action='store_true', help='إخراج النتائج بصيغة JSON')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        results = []
+        for blocks in (int(value) for value in options['blocks'].split(',')):
+            content = make_markdown(rng, blocks)
+            if render_per_call(content) != engine.render(content):
+                raise CommandError(f'نتيجة المحرك تختلف عن الطريقة السابقة ({blocks} كتلة)')
+
+            # عدد التكرارات من زمن استدعاء واحد
+            iterations = max(1, int(options['seconds'] / 2 / max(measure(render_per_call, content, 1), 1e-6)))
+            before = measure(render_per_call, content, iterations)
+            after = measure(engine.render, content, iterations)
+            batch = measure(render_many, [content] * iterations, 1) / iterations
+            results.append({
+                'blocks': blocks,
+                'chars': len(content),
+                'iterations': iterations,
+                'per_call_ms': round(before * 1000, 3),
+                'engine_ms': round(after * 1000, 3),
+                'render_many_ms': round(batch * 1000, 3),
+                'per_call_per_second': round(1 / before, 1),
+                'engine_per_second': round(1 / after, 1),
+                'speedup': round(before / after, 2),
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f'{"chars":>8} {"per call":>10} {"engine":>10} {"many":>10} {"speedup":>8}')
+        for row in results:
+            self.stdout.write(
+                f'{row["chars"]:>8} {row["per_call_ms"]:>10} {row["engine_ms"]:>10} '
+                f'{row["render_many_ms"]:>10} {row["speedup"]:>8}'
+            )
@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from notes.models import NoteVersion
+from notes import versioning
+
+
+class Command(BaseCommand):
+    help = 'إعادة ترميز سجل النسخ كسلاسل من الإطارات المفتاحية والفروقات المضغوطة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--note', type=int, action='append', dest='notes',
+                            help='معرّف ملاحظة محددة (يمكن تكراره)')
+
+    def handle(self, *args, **options):
+        note_ids = NoteVersion.objects.values_list('note_id', flat=True).distinct().order_by('note_id')
+        if options['notes']:
+            note_ids = note_ids.filter(note_id__in=options['notes'])
+
+        before = after = 0
+        for note_id in list(note_ids):
+            note_before, note_after = self.compact_note(note_id)
+            before += note_before
+            after += note_after
+
+        self.stdout.write(self.style.SUCCESS(
+            f'الحجم قبل الضغط: {before} بايت، بعد الضغط: {after} بايت'
+        ))
+
+    @transaction.atomic
+    def compact_note(self, note_id):
+        """إعادة ترميز نسخ ملاحظة واحدة مع الحفاظ على معرّفاتها وتواريخها"""
+        versions = list(
+            NoteVersion.objects.select_for_update().filter(note_id=note_id).order_by('pk')
+        )
+        before = sum(len(v.content_md.encode('utf-8')) + len(v.payload or b'') for v in versions)
+
+        # نفك السلسلة القديمة كاملة أولاً ثم نعيد ترميزها
+        contents = []
+        chain = []
+        for version in versions:
+            if version.encoding in versioning.KEYFRAME_ENCODINGS:
+                chain = [version]
+            else:
+                chain.append(version)
+            contents.append(versioning.decode_chain(chain))
+
+        after = 0
+        base = None
+        chain_length = 0
+        for version, content in zip(versions, contents):
+            if chain_length >= settings.NOTE_VERSION_KEYFRAME_INTERVAL:
+                base = None
+            version.encoding, version.payload = versioning.encode(content, base)
+            version.content_md = ''
+            for field, value in NoteVersion.metadata_for(content).items():
+                setattr(version, field, value)
+
+            chain_length = 1 if version.encoding == versioning.ENCODING_FULL else chain_length + 1
+            base = content
+            after += len(version.payload)
+
+        NoteVersion.objects.bulk_update(
+            versions, ['encoding', 'payload', 'content_md', 'size', 'content_hash', 'summary']
+        )
+        return before, after
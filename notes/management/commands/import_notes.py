@@ -0,0 +1,44 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.archive import ArchiveError
+from notes.importer import NoteImporter
+
+
+class Command(BaseCommand):
+    help = 'استيراد ملفات Markdown (ملف ZIP أو مجلد) كملاحظات لمستخدم، مع تخطي ما استُورد سابقاً'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='اسم المستخدم المالك للملاحظات')
+        parser.add_argument('source', help='مسار ملف ZIP أو مجلد يحتوي ملفات .md')
+        parser.add_argument('--batch-size', type=int, help='عدد الملفات في كل دفعة')
+        parser.add_argument('--workers', type=int, help='عدد عمليات تحويل Markdown')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'المستخدم {options["username"]} غير موجود')
+
+        def progress(stats):
+            self.stdout.write(
+                f'{stats["processed"]}/{stats["total"]}: '
+                f'{stats["imported"]} مستوردة، {stats["skipped"]} متخطاة، {stats["failed"]} فاشلة'
+            )
+
+        importer = NoteImporter(
+            user,
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            progress=progress,
+        )
+        try:
+            stats = importer.run(options['source'])
+        except ArchiveError as error:
+            raise CommandError(str(error))
+
+        for error in importer.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'تم استيراد {stats["imported"]} ملاحظة من {stats["total"]} ملف'
+        ))
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import statistics
+import time
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = (
+        'اختبار حمل على خادم يعمل (WSGI أو ASGI): عملاء سريعون يقيسون زمن الرد '
+        'بينما يحجز عملاء بطيئون اتصالات يرسلون طلباتهم ببطء'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='عنوان الخادم، مثل http://127.0.0.1:8000')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='مسار يُطلب (يتكرر، ويُستبدل {note} برقم ملاحظة للمستخدم)')
+        parser.add_argument('--user', help='اسم مستخدم تُنشأ له جلسة في قاعدة البيانات المحلية')
+        parser.add_argument('--concurrency', type=int, default=20, help='عدد العملاء السريعين')
+        parser.add_argument('--slow-clients', type=int, default=0, help='عدد العملاء البطيئين')
+        parser.add_argument('--slow-delay', type=float, default=5.0,
+                            help='ثوانٍ يتوقفها العميل البطيء في منتصف إرسال طلبه')
+        parser.add_argument('--duration', type=float, default=10.0, help='مدة الاختبار بالثواني')
+        parser.add_argument('--timeout', type=float, default=30.0, help='مهلة الطلب الواحد بالثواني')
+        parser.add_argument('--header', action='append', default=[], help='ترويسة إضافية "Name: value"')
+        parser.add_argument('--json', action='store_true', help='إخراج النتائج بصيغة JSON')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('يدعم الاختبار عناوين http:// فقط')
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = options['timeout']
+        self.headers = [f'Host: {url.netloc}', *options['header'], 'Connection: close']
+
+        paths = options['paths'] or ['/notes/']
+        if options['user']:
+            user, cookie = self.login(options['user'])
+            self.headers.append(f'Cookie: {cookie}')
+            note = user.notes.order_by('-updated_at').values_list('pk', flat=True).first()
+            paths = [path.replace('{note}', str(note)) for path in paths]
+        self.requests = [self.build_request(path) for path in paths]
+
+        result = asyncio.run(self.run(options))
+        result.update(url=options['url'], paths=paths)
+        if options['json']:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        self.stdout.write(
+            f'{result["requests"]} طلب ({result["requests_per_second"]}/ث)، '
+            f'أخطاء {result["errors"]}، حالات {result["statuses"]}'
+        )
+        self.stdout.write(
+            f'زمن الرد (ms): p50 {result["p50_ms"]}  p95 {result["p95_ms"]}  '
+            f'p99 {result["p99_ms"]}  max {result["max_ms"]}'
+        )
+        if options['slow_clients']:
+            self.stdout.write(f'طلبات العملاء البطيئين المكتملة: {result["slow_requests"]}')
+
+    def login(self, username):
+        """جلسة مسجلة الدخول كما ينشئها ``django.contrib.auth.login``"""
+        try:
+            user = get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'المستخدم {username} غير موجود')
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return user, f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def build_request(self, path):
+        head = '\r\n'.join([f'GET {path} HTTP/1.1', *self.headers]) + '\r\n\r\n'
+        return head.encode('latin-1')
+
+    async def fetch(self, request, delay=0.0):
+        """طلب واحد على اتصال جديد، ويعيد رمز الحالة"""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            if delay:
+                # نصف الطلب ثم توقف: العامل المتزامن يبقى محجوزاً بانتظار البقية
+                middle = len(request) // 2
+                writer.write(request[:middle])
+                await writer.drain()
+                await asyncio.sleep(delay)
+                request = request[middle:]
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+        finally:
+            writer.close()
+        try:
+            return int(status_line.split()[1])
+        except (IndexError, ValueError):
+            raise ConnectionError('رد غير صالح')
+
+    async def client(self, index, deadline, delay, latencies, statuses, errors):
+        position = index
+        while time.monotonic() < deadline:
+            request = self.requests[position % len(self.requests)]
+            position += 1
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(self.fetch(request, delay), self.timeout + delay)
+            except (OSError, asyncio.TimeoutError):
+                errors.append(1)
+                continue
+            statuses[status] = statuses.get(status, 0) + 1
+            latencies.append(time.perf_counter() - start)
+
+    async def run(self, options):
+        deadline = time.monotonic() + options['duration']
+        latencies, statuses, errors = [], {}, []
+        slow_latencies, slow_statuses, slow_errors = [], {}, []
+        slow = [
+            self.client(i, deadline, options['slow_delay'], slow_latencies, slow_statuses, slow_errors)
+            for i in range(options['slow_clients'])
+        ]
+        fast = [
+            self.client(i, deadline, 0.0, latencies, statuses, errors)
+            for i in range(options['concurrency'])
+        ]
+        start = time.perf_counter()
+        await asyncio.gather(*slow, *fast)
+        elapsed = time.perf_counter() - start
+
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            'concurrency': options['concurrency'],
+            'slow_clients': options['slow_clients'],
+            'slow_delay': options['slow_delay'],
+            'duration': round(elapsed, 2),
+            'requests': len(latencies),
+            'requests_per_second': round(len(latencies) / elapsed, 1),
+            'errors': len(errors),
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'p50_ms': ms(statistics.median(latencies) if latencies else None),
+            'p95_ms': ms(percentile(latencies, 0.95)),
+            'p99_ms': ms(percentile(latencies, 0.99)),
+            'max_ms': ms(max(latencies) if latencies else None),
+            'slow_requests': len(slow_latencies),
+            'slow_errors': len(slow_errors),
+        }
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from notes.models import Note
+from notes.search import build_search_document, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'إعادة حساب نص البحث المُطبَّع لكل الملاحظات وإعادة بناء الفهرس'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        notes = Note.objects.only('id', 'title', 'content_md', 'search_document')
+        batch = []
+        updated = 0
+        for note in notes.iterator(chunk_size=batch_size):
+            document = build_search_document(note.title, note.content_md)
+            if document != note.search_document:
+                note.search_document = document
+                batch.append(note)
+            if len(batch) >= batch_size:
+                updated += Note.objects.bulk_update(batch, ['search_document'])
+                batch = []
+        if batch:
+            updated += Note.objects.bulk_update(batch, ['search_document'])
+
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'تم تحديث {updated} ملاحظة وإعادة بناء فهرس البحث'))
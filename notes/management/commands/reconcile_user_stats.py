@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from notes.models import UserStats
+
+
+class Command(BaseCommand):
+    help = 'إعادة حساب إحصاءات المستخدمين من الجداول وتصحيح أي اختلاف في السجلات المحفوظة'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='usernames',
+                            help='اسم مستخدم محدد (يمكن تكراره)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        checked = fixed = 0
+        batch = []
+        for row in UserStats.objects.computed(users).iterator(chunk_size=options['batch_size']):
+            batch.append(row)
+            if len(batch) >= options['batch_size']:
+                fixed += self.reconcile(batch)
+                checked += len(batch)
+                batch = []
+        if batch:
+            fixed += self.reconcile(batch)
+            checked += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'تم فحص {checked} مستخدم وتصحيح {fixed} سجل'))
+
+    def reconcile(self, rows):
+        """حفظ الصفوف التي تختلف عن السجلات المحفوظة فقط"""
+        stored = {
+            stats['user_id']: stats
+            for stats in UserStats.objects.filter(user_id__in=[row['pk'] for row in rows])
+            .values('user_id', *UserStats.STAT_FIELDS)
+        }
+        drifted = []
+        for row in rows:
+            current = stored.get(row['pk'])
+            if current is None or any(current[field] != row[field] for field in UserStats.STAT_FIELDS):
+                drifted.append(row)
+        if drifted:
+            UserStats.objects.store(drifted)
+        return len(drifted)
@@ -0,0 +1,86 @@
+import re
+import shutil
+from pathlib import Path, PurePosixPath
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.vendor import BUNDLES
+
+
+# خطوط Google ترسل woff2 للمتصفحات الحديثة فقط
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+
+CSS_URL_RE = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+CHARSET_RE = re.compile(r'@charset\s+"[^"]*";\s*', re.I)
+# خرائط المصدر غير موجودة محلياً، و ManifestStaticFilesStorage يرفض الإشارات المفقودة
+SOURCE_MAP_RE = re.compile(r'/\*# sourceMappingURL=[^*]*\*/|^//# sourceMappingURL=.*$', re.M)
+
+
+class Command(BaseCommand):
+    help = 'تنزيل مكتبات الواجهة ودمجها في حزم محلية داخل static/vendor (لتُضغط وتُبصَم مع collectstatic)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(Path(settings.STATICFILES_DIRS[0]) / 'vendor'),
+                            help='مجلد الحزم (يُستبدل بالكامل)')
+        parser.add_argument('--timeout', type=float, default=30, help='مهلة كل تنزيل بالثواني')
+
+    def handle(self, *args, **options):
+        self.timeout = options['timeout']
+        output = Path(options['output'])
+        # التنزيل كاملاً قبل الكتابة حتى لا يبقى المجلد نصف مكتمل عند فشل الشبكة
+        self.files = {}
+        self.assets = {}
+        bundles = {name: self.build(name, sources) for name, sources in BUNDLES.items()}
+
+        if output.exists():
+            shutil.rmtree(output)
+        for relative_path, content in {**bundles, **self.files}.items():
+            path = output / relative_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(content)
+            self.stdout.write(f'{relative_path:<40} {len(content) / 1024:>8.1f} KB')
+        self.stdout.write(self.style.SUCCESS(f'تم إنشاء {len(bundles)} حزم في {output}'))
+
+    def fetch(self, url):
+        try:
+            with urlopen(Request(url, headers={'User-Agent': USER_AGENT}), timeout=self.timeout) as response:
+                return response.read()
+        except OSError as error:
+            raise CommandError(f'تعذر تنزيل {url}: {error}')
+
+    def build(self, name, sources):
+        is_css = name.endswith('.css')
+        parts = []
+        for url in sources:
+            text = SOURCE_MAP_RE.sub('', self.fetch(url).decode('utf-8')).strip()
+            if is_css:
+                text = self.localize_css(CHARSET_RE.sub('', text), url)
+            parts.append(f'/* {url} */\n{text}')
+        if is_css:
+            return ('@charset "UTF-8";\n' + '\n'.join(parts) + '\n').encode('utf-8')
+        # الفاصلة المنقوطة تمنع دمج تعبيرين من ملفين مختلفين
+        return ('\n;\n'.join(parts) + '\n').encode('utf-8')
+
+    def localize_css(self, text, css_url):
+        """تنزيل الخطوط والصور المشار إليها وتحويل روابطها إلى ``fonts/`` بجانب الحزمة"""
+        def replace(match):
+            reference = match.group(2).strip()
+            if reference.startswith('data:'):
+                return match.group(0)
+            absolute = urljoin(css_url, reference)
+            asset_url = absolute.split('#')[0]
+            relative_path = self.assets.get(asset_url)
+            if relative_path is None:
+                path = PurePosixPath(urlsplit(absolute).path)
+                relative_path = f'fonts/{path.name}'
+                if relative_path in self.files:
+                    relative_path = f'fonts/{path.stem}-{len(self.files)}{path.suffix}'
+                self.files[relative_path] = self.fetch(asset_url)
+                self.assets[asset_url] = relative_path
+            # بدون معامل الإصدار: البصمة في اسم الملف تكفي
+            return f'url("{relative_path}")'
+
+        return CSS_URL_RE.sub(replace, text)
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:05
+
+import re
+
+from django.db import migrations, models
+
+# نسخة ثابتة من notes.search كما كانت عند إنشاء هذا الترحيل، حتى لا يتغير
+# الترحيل بتغير الكود الحالي
+FTS_TABLE = "notes_note_fts"
+SEARCH_CONFIG = "simple"
+GIN_INDEX_NAME = "notes_note_search_gin"
+
+_ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_ARABIC_LETTERS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي",
+    "ة": "ه",
+})
+
+
+def build_search_document(title, content_md):
+    text = f"{title or ''}\n{content_md or ''}"
+    return _ARABIC_MARKS.sub("", text).translate(_ARABIC_LETTERS).casefold()
+
+
+def _gin_index():
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return GinIndex(
+        SearchVector("search_document", config=SEARCH_CONFIG), name=GIN_INDEX_NAME
+    )
+
+
+def populate_search_document(apps, schema_editor):
+    Note = apps.get_model("notes", "Note")
+    notes = Note.objects.only("id", "title", "content_md")
+    for note in notes.iterator(chunk_size=500):
+        Note.objects.filter(pk=note.pk).update(
+            search_document=build_search_document(note.title, note.content_md)
+        )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.add_index(apps.get_model("notes", "Note"), _gin_index())
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"search_document, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, search_document) "
+            f"SELECT id, search_document FROM notes_note"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.remove_index(apps.get_model("notes", "Note"), _gin_index())
+    elif vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0002_activationcode"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="note",
+            name="search_document",
+            field=models.TextField(
+                blank=True, editable=False, verbose_name="نص البحث"
+            ),
+        ),
+        migrations.RunPython(populate_search_document, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
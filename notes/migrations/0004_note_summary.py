@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:06
+
+import html
+import math
+import re
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# نسخة ثابتة من notes.summary كما كانت عند إنشاء هذا الترحيل
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def summarize(content_html):
+    text = _WHITESPACE.sub(" ", html.unescape(strip_tags(content_html or ""))).strip()
+    word_count = len(text.split())
+    reading_time = math.ceil(word_count / WORDS_PER_MINUTE)
+    return Truncator(text).chars(EXCERPT_LENGTH), word_count, reading_time
+
+
+def populate_summary(apps, schema_editor):
+    Note = apps.get_model("notes", "Note")
+    batch = []
+    for note in Note.objects.only("id", "content_html").iterator(chunk_size=500):
+        note.excerpt, note.word_count, note.reading_time = summarize(note.content_html)
+        batch.append(note)
+        if len(batch) >= 500:
+            Note.objects.bulk_update(batch, ["excerpt", "word_count", "reading_time"])
+            batch = []
+    if batch:
+        Note.objects.bulk_update(batch, ["excerpt", "word_count", "reading_time"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0003_note_search_document"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="note",
+            name="excerpt",
+            field=models.CharField(
+                blank=True, editable=False, max_length=200, verbose_name="مقتطف"
+            ),
+        ),
+        migrations.AddField(
+            model_name="note",
+            name="reading_time",
+            field=models.PositiveSmallIntegerField(
+                default=0, editable=False, verbose_name="مدة القراءة (دقائق)"
+            ),
+        ),
+        migrations.AddField(
+            model_name="note",
+            name="word_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="عدد الكلمات"
+            ),
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
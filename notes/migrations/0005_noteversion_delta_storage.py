@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:20
+
+import hashlib
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def content_hash(text):
+    # نفس بصمة notes.versioning عند إنشاء هذا الترحيل (SHA-256 لنص UTF-8)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def populate_metadata(apps, schema_editor):
+    NoteVersion = apps.get_model("notes", "NoteVersion")
+    batch = []
+    for version in NoteVersion.objects.only("id", "content_md").iterator(chunk_size=500):
+        version.size = len(version.content_md)
+        version.content_hash = content_hash(version.content_md)
+        version.summary = Truncator(version.content_md).chars(100)
+        batch.append(version)
+        if len(batch) >= 500:
+            NoteVersion.objects.bulk_update(batch, ["size", "content_hash", "summary"])
+            batch = []
+    if batch:
+        NoteVersion.objects.bulk_update(batch, ["size", "content_hash", "summary"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0004_note_summary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="noteversion",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, max_length=64, verbose_name="بصمة المحتوى"
+            ),
+        ),
+        migrations.AddField(
+            model_name="noteversion",
+            name="encoding",
+            field=models.CharField(
+                choices=[
+                    ("raw", "نص كامل"),
+                    ("full", "إطار مفتاحي مضغوط"),
+                    ("delta", "فرق مضغوط"),
+                ],
+                default="raw",
+                max_length=5,
+                verbose_name="الترميز",
+            ),
+        ),
+        migrations.AddField(
+            model_name="noteversion",
+            name="payload",
+            field=models.BinaryField(
+                blank=True, null=True, verbose_name="المحتوى المضغوط"
+            ),
+        ),
+        migrations.AddField(
+            model_name="noteversion",
+            name="size",
+            field=models.PositiveIntegerField(default=0, verbose_name="الحجم (حرف)"),
+        ),
+        migrations.AddField(
+            model_name="noteversion",
+            name="summary",
+            field=models.CharField(blank=True, max_length=100, verbose_name="ملخص"),
+        ),
+        migrations.AlterField(
+            model_name="noteversion",
+            name="content_md",
+            field=models.TextField(blank=True, verbose_name="المحتوى (Markdown)"),
+        ),
+        migrations.RunPython(populate_metadata, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0005_noteversion_delta_storage"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="note",
+            name="html_stale",
+            field=models.BooleanField(
+                default=False, editable=False, verbose_name="HTML بحاجة لتحديث"
+            ),
+        ),
+        migrations.AddField(
+            model_name="note",
+            name="rendered_at",
+            field=models.DateTimeField(
+                blank=True, editable=False, null=True, verbose_name="آخر تحويل"
+            ),
+        ),
+        migrations.AddField(
+            model_name="note",
+            name="revision",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="رقم المراجعة"
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0006_note_revision"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="note",
+            name="import_key",
+            field=models.CharField(
+                blank=True, editable=False, max_length=64, verbose_name="مفتاح الاستيراد"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["owner", "import_key"], name="notes_note_import_key_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0007_note_import_key"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserStats",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="note_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="المستخدم",
+                    ),
+                ),
+                (
+                    "total_notes",
+                    models.IntegerField(default=0, verbose_name="إجمالي الملاحظات"),
+                ),
+                (
+                    "favorite_notes",
+                    models.IntegerField(default=0, verbose_name="الملاحظات المفضلة"),
+                ),
+                (
+                    "public_notes",
+                    models.IntegerField(default=0, verbose_name="الملاحظات العامة"),
+                ),
+                (
+                    "total_views",
+                    models.BigIntegerField(default=0, verbose_name="إجمالي المشاهدات"),
+                ),
+                ("tag_count", models.IntegerField(default=0, verbose_name="عدد الوسوم")),
+                (
+                    "storage_bytes",
+                    models.BigIntegerField(
+                        default=0, verbose_name="حجم المحتوى (بايت)"
+                    ),
+                ),
+                (
+                    "version_count",
+                    models.IntegerField(default=0, verbose_name="عدد النسخ"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="آخر تحديث"),
+                ),
+            ],
+            options={
+                "verbose_name": "إحصاءات مستخدم",
+                "verbose_name_plural": "إحصاءات المستخدمين",
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0008_userstats"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["owner", "updated_at", "id"],
+                name="notes_note_owner_updated_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["owner", "created_at", "id"],
+                name="notes_note_owner_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["owner", "title", "id"], name="notes_note_owner_title_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["owner", "views", "id"], name="notes_note_owner_views_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                condition=models.Q(("is_favorite", True)),
+                fields=["owner", "updated_at", "id"],
+                name="notes_note_favorite_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                condition=models.Q(("is_public", True)),
+                fields=["owner", "updated_at", "id"],
+                name="notes_note_public_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="noteversion",
+            index=models.Index(
+                fields=["note", "-created_at"], name="notes_version_note_created_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0009_note_indexes"),
+    ]
+
+    # لا يوجد استعلام يرتب ملاحظات المالك العامة وحدها، والصفحة العامة تُقرأ
+    # بـ public_uuid (فريد ومفهرس)
+    operations = [
+        migrations.RemoveIndex(
+            model_name="note",
+            name="notes_note_public_idx",
+        ),
+    ]
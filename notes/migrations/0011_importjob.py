@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0010_remove_note_public_idx"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImportJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "في الانتظار"),
+                            ("running", "جارٍ"),
+                            ("done", "اكتمل"),
+                            ("failed", "فشل"),
+                        ],
+                        default="queued",
+                        max_length=7,
+                        verbose_name="الحالة",
+                    ),
+                ),
+                ("stats", models.JSONField(default=dict, verbose_name="الإحصاءات")),
+                ("error", models.TextField(blank=True, verbose_name="الخطأ")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="تاريخ البدء"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="آخر تحديث"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="import_jobs",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="المستخدم",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "عملية استيراد",
+                "verbose_name_plural": "عمليات الاستيراد",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["user", "-created_at"],
+                        name="notes_import_user_created_idx",
+                    )
+                ],
+            },
+        ),
+    ]
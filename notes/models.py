@@ -1,10 +1,33 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
+from django.utils.text import Truncator
 from taggit.managers import TaggableManager
-import markdown2
-import bleach
+from taggit.models import TaggedItem
 import uuid
+from collections import defaultdict
+from functools import partial
+
+from .rendering import content_key, render_cache, render_markdown
+from .render_queue import render_queue
+from .fragments import fragment_cache
+from .public_cache import invalidate_page
+from .search import build_search_document, index_note
+from .summary import summarize, EXCERPT_LENGTH
+from .view_counter import view_counter
+from . import versioning
+
+
+class NoteQuerySet(models.QuerySet):
+    """استعلامات مخصصة للملاحظات"""
+
+    def for_list(self):
+        """استعلام خفيف لعرض القوائم: بدون المحتوى الكامل ومع جلب الوسوم مسبقاً"""
+        return self.defer('content_md', 'content_html', 'search_document').prefetch_related('tags')
 
 
 class Note(models.Model):
@@ -24,96 +47,503 @@ class Note(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
     views = models.IntegerField(default=0, verbose_name='عدد المشاهدات')
     is_favorite = models.BooleanField(default=False, verbose_name='مفضلة')
+    search_document = models.TextField(blank=True, editable=False, verbose_name='نص البحث')
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False, verbose_name='مقتطف')
+    word_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='عدد الكلمات')
+    reading_time = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='مدة القراءة (دقائق)')
+    revision = models.PositiveIntegerField(default=0, editable=False, verbose_name='رقم المراجعة')
+    html_stale = models.BooleanField(default=False, editable=False, verbose_name='HTML بحاجة لتحديث')
+    rendered_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name='آخر تحويل')
+    # بصمة الملف المصدر للملاحظات المستوردة (لتخطي ما استُورد عند إعادة التشغيل)
+    import_key = models.CharField(max_length=64, blank=True, editable=False, verbose_name='مفتاح الاستيراد')
+    
+    objects = NoteQuerySet.as_manager()
     
     class Meta:
         ordering = ['-updated_at']
         verbose_name = 'ملاحظة'
         verbose_name_plural = 'الملاحظات'
+        indexes = [
+            # قائمة الملاحظات: مالك + حقل الترتيب + المعرّف (كسر التعادل في ترقيم المؤشر)
+            models.Index(fields=['owner', 'updated_at', 'id'], name='notes_note_owner_updated_idx'),
+            models.Index(fields=['owner', 'created_at', 'id'], name='notes_note_owner_created_idx'),
+            models.Index(fields=['owner', 'title', 'id'], name='notes_note_owner_title_idx'),
+            models.Index(fields=['owner', 'views', 'id'], name='notes_note_owner_views_idx'),
+            # فهرس جزئي: المفضلة نسبة صغيرة من الجدول
+            models.Index(
+                fields=['owner', 'updated_at', 'id'],
+                condition=models.Q(is_favorite=True),
+                name='notes_note_favorite_idx',
+            ),
+            models.Index(fields=['owner', 'import_key'], name='notes_note_import_key_idx'),
+        ]
     
     def __str__(self):
         return self.title or f'ملاحظة #{self.id}'
     
+    # الحقول المشتقة من المحتوى والتي تُحدَّث عند تحويل Markdown
+    RENDERED_FIELDS = (
+        'content_html', 'search_document', 'excerpt', 'word_count',
+        'reading_time', 'html_stale', 'rendered_at',
+    )
+    
+    # حقول الملاحظة التي تؤثر في إحصاءات المستخدم، وحقل الإحصاء المقابل لكل منها
+    STATS_FIELDS = {
+        'is_favorite': 'favorite_notes',
+        'is_public': 'public_notes',
+        'views': 'total_views',
+        'content_md': 'storage_bytes',
+    }
+    
     def save(self, *args, **kwargs):
         """
         تحويل Markdown إلى HTML مع تعقيم للحماية من XSS
         """
-        # تحويل Markdown إلى HTML
-        if self.content_md:
-            html = markdown2.markdown(
-                self.content_md,
-                extras=[
-                    'fenced-code-blocks',
-                    'tables',
-                    'break-on-newline',
-                    'code-friendly',
-                    'cuddled-lists',
-                    'header-ids',
-                    'nofollow',
-                    'task_list'
-                ]
-            )
-            
-            # تعقيم HTML للحماية من XSS
-            allowed_tags = [
-                'p', 'br', 'strong', 'em', 'u', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
-                'blockquote', 'code', 'pre', 'hr', 'div', 'span',
-                'ul', 'ol', 'li', 'a', 'img',
-                'table', 'thead', 'tbody', 'tr', 'th', 'td',
-                'del', 'ins', 'sup', 'sub'
-            ]
+        update_fields = kwargs.get('update_fields')
+        content_changed = update_fields is None or bool({'title', 'content_md'} & set(update_fields))
+        if content_changed:
+            deferred = self.render_content(allow_deferred=True)
+        
+        with transaction.atomic():
+            # الصف يبقى مقفلاً من قراءته حتى إنشاء النسخة والحفظ
+            old_content = self._read_saved(content_changed, update_fields)
             
-            allowed_attributes = {
-                '*': ['class', 'id', 'dir'],
-                'a': ['href', 'title', 'rel'],
-                'img': ['src', 'alt', 'title', 'width', 'height'],
-                'code': ['class'],
-                'pre': ['class'],
-            }
+            if content_changed:
+                self.revision += 1
+                if update_fields is not None:
+                    # ``auto_now`` لا يُكتب إلا إذا كان ضمن الحقول المحفوظة
+                    kwargs['update_fields'] = {*update_fields, *self.RENDERED_FIELDS, 'revision', 'updated_at'}
+                
+                # إنشاء نسخة قبل الحفظ (إذا كانت الملاحظة موجودة مسبقاً)
+                if old_content is not None and old_content != self.content_md:
+                    NoteVersion.objects.create_snapshot(self, old_content, locked=True)
             
-            self.content_html = bleach.clean(
-                html,
-                tags=allowed_tags,
-                attributes=allowed_attributes,
-                strip=True
-            )
-        else:
-            self.content_html = ''
+            super().save(*args, **kwargs)
         
-        # إنشاء نسخة قبل الحفظ (إذا كانت الملاحظة موجودة مسبقاً)
-        if self.pk:
-            try:
-                old_note = Note.objects.get(pk=self.pk)
-                if old_note.content_md != self.content_md:
-                    NoteVersion.objects.create(
-                        note=self,
-                        content_md=old_note.content_md
-                    )
-            except Note.DoesNotExist:
-                pass
+        if content_changed:
+            index_note(self)
+            if deferred:
+                transaction.on_commit(partial(
+                    render_queue.submit, self.pk, self.revision, self.content_md
+                ))
+    
+    def _read_saved(self, content_changed, update_fields):
+        """
+        قراءة الصف المحفوظ مرة واحدة قبل التعديل
+
+        تحفظ قيم الإحصاءات السابقة في ``_stats_before`` (لحساب الفرق في
+        ``notes.signals``) وتعيد المحتوى السابق إذا تغير المحتوى (للنسخة)،
+        مع قفل الصف في هذه الحالة (``select_for_update``).
+        """
+        self._stats_before = None
+        if not self.pk or self._state.adding:
+            return None
+        if not content_changed and not self.STATS_FIELDS.keys() & set(update_fields):
+            return None
+        columns = ['is_favorite', 'is_public', 'views', OctetLength('content_md')]
+        if content_changed:
+            columns.append('content_md')
+        queryset = Note.objects.select_for_update() if content_changed else Note.objects.all()
+        row = queryset.filter(pk=self.pk).values_list(*columns).first()
+        if row is None:
+            return None
+        self._stats_before = dict(zip(self.STATS_FIELDS, map(int, row[:4])))
+        return row[4] if content_changed else None
+    
+    def render_content(self, allow_deferred=False):
+        """
+        تحويل Markdown إلى HTML معقم وتحديث نص البحث والملخص
+
+        مع ``allow_deferred`` يُترك HTML السابق كما هو للملاحظات الكبيرة
+        ويُعلَّم كقديم ليُحوَّل في الخلفية. يعيد True في هذه الحالة.
+        """
+        self.search_document = build_search_document(self.title, self.content_md)
+        self.rendered_at = timezone.now()
+        
+        if (allow_deferred and render_queue.should_defer(self.content_md)
+                and content_key(self.content_md) not in render_cache):
+            self.html_stale = True
+            return True
+        
+        # تحويل Markdown إلى HTML معقم (مع ذاكرة مؤقتة حسب المحتوى)
+        self.content_html = render_markdown(self.content_md)
         
-        super().save(*args, **kwargs)
+        # تحديث الملخص المعروض في القوائم
+        self.excerpt, self.word_count, self.reading_time = summarize(self.content_html)
+        self.html_stale = False
+        return False
+    
+    def ensure_rendered(self):
+        """
+        تحويل المحتوى إذا كان HTML قديماً، أو عرض آخر HTML سليم إذا كان
+        التحويل جارياً في الخلفية
+        """
+        if not self.html_stale:
+            return
+        if render_queue.is_pending(self.pk) and self.content_html:
+            return
+        self.render_content()
+        # لا نكتب إذا تغيرت الملاحظة منذ قراءتها
+        Note.objects.filter(pk=self.pk, revision=self.revision).update(
+            **{field: getattr(self, field) for field in self.RENDERED_FIELDS}
+        )
+    
+    def autosave(self, title, content_md):
+        """
+        حفظ تلقائي للعنوان والمحتوى
+
+        يُجرى حفظ كامل (تحويل HTML ونسخة) مرة واحدة على الأكثر كل
+        ``AUTOSAVE_RENDER_INTERVAL`` ثانية، وبينها يُحدَّث الصف فقط مع تعليم
+        HTML كقديم. يعيد True إذا أُجري الحفظ الكامل.
+        """
+        old_content = self.content_md
+        self.title = title
+        self.content_md = content_md
+        
+        now = timezone.now()
+        interval = settings.AUTOSAVE_RENDER_INTERVAL
+        if self.rendered_at is None or (now - self.rendered_at).total_seconds() >= interval:
+            self.save()
+            return True
+        
+        # أول حفظ سريع بعد الحفظ الكامل يحتفظ بالمحتوى السابق كنسخة
+        if not self.html_stale and old_content != content_md:
+            NoteVersion.objects.create_snapshot(self, old_content)
+        
+        self.search_document = build_search_document(title, content_md)
+        self.html_stale = True
+        self.revision += 1
+        self.updated_at = now
+        Note.objects.filter(pk=self.pk).update(
+            title=title,
+            content_md=content_md,
+            search_document=self.search_document,
+            html_stale=True,
+            revision=self.revision,
+            updated_at=now,
+        )
+        index_note(self)
+        invalidate_page(self.public_uuid)
+        fragment_cache.invalidate(self.pk)
+        UserStats.objects.apply_delta(
+            self.owner_id, storage_bytes=content_bytes(content_md) - content_bytes(old_content)
+        )
+        return False
     
     def increment_views(self):
-        """زيادة عدد المشاهدات"""
-        self.views += 1
-        self.save(update_fields=['views'])
+        """تسجيل مشاهدة في العداد المؤجل (تُكتب لاحقاً دفعة واحدة)"""
+        if not view_counter.record(self.pk):
+            self.views += 1
+    
+    @property
+    def total_views(self):
+        """عدد المشاهدات المخزن مضافاً إليه المشاهدات المعلقة"""
+        return self.views + view_counter.pending(self.pk)
+
+
+class NoteVersionQuerySet(models.QuerySet):
+    """استعلامات مخصصة لنسخ الملاحظات"""
+
+    def metadata(self):
+        """بيانات النسخ فقط بدون المحتوى المضغوط"""
+        return self.only('id', 'note_id', 'created_at', 'encoding', 'size', 'summary')
+
+    def chain_for(self, version):
+        """سلسلة النسخ من أقرب إطار مفتاحي حتى النسخة المطلوبة (تصاعدياً)"""
+        history = self.filter(note_id=version.note_id, pk__lte=version.pk)
+        keyframe_id = (
+            history.filter(encoding__in=versioning.KEYFRAME_ENCODINGS)
+            .order_by('-pk').values_list('pk', flat=True).first()
+        )
+        if keyframe_id is None:
+            raise ValueError(f'لا يوجد إطار مفتاحي للنسخة #{version.pk}')
+        return history.filter(pk__gte=keyframe_id).order_by('pk')
+
+    def create_snapshot(self, note, content_md, locked=False):
+        """
+        حفظ نسخة جديدة كفرق مضغوط عن النسخة السابقة، أو كإطار مفتاحي كل
+        ``NOTE_VERSION_KEYFRAME_INTERVAL`` نسخة أو عندما لا يكون الفرق أصغر
+
+        يُقفل صف الملاحظة قبل قراءة السلسلة حتى لا يبني حفظان متزامنان فرقاً
+        على نفس النسخة السابقة، إلا مع ``locked`` (القفل مأخوذ في المعاملة الحالية).
+        """
+        with transaction.atomic():
+            if not locked:
+                list(Note.objects.select_for_update().filter(pk=note.pk).values_list('pk', flat=True))
+            base = None
+            previous = self.filter(note=note).order_by('-pk').only('pk', 'note_id').first()
+            if previous is not None:
+                chain = list(self.chain_for(previous))
+                if len(chain) < settings.NOTE_VERSION_KEYFRAME_INTERVAL:
+                    base = versioning.decode_chain(chain)
+
+            encoding, payload = versioning.encode(content_md, base)
+            return self.create(
+                note=note,
+                encoding=encoding,
+                payload=payload,
+                **NoteVersion.metadata_for(content_md),
+            )
 
 
 class NoteVersion(models.Model):
     """
     نموذج نسخ الملاحظات - للاحتفاظ بالنسخ السابقة
+
+    المحتوى يُخزَّن مضغوطاً كإطار مفتاحي أو كفرق عن النسخة السابقة
+    (انظر ``notes.versioning``)، ويُستعاد عند الطلب عبر ``get_content``.
     """
+    SUMMARY_LENGTH = 100
+    ENCODING_CHOICES = [
+        (versioning.ENCODING_RAW, 'نص كامل'),
+        (versioning.ENCODING_FULL, 'إطار مفتاحي مضغوط'),
+        (versioning.ENCODING_DELTA, 'فرق مضغوط'),
+    ]
+    
     note = models.ForeignKey(Note, on_delete=models.CASCADE, related_name='versions', verbose_name='الملاحظة')
-    content_md = models.TextField(verbose_name='المحتوى (Markdown)')
+    content_md = models.TextField(verbose_name='المحتوى (Markdown)', blank=True)
+    encoding = models.CharField(max_length=5, choices=ENCODING_CHOICES, default=versioning.ENCODING_RAW, verbose_name='الترميز')
+    payload = models.BinaryField(blank=True, null=True, editable=False, verbose_name='المحتوى المضغوط')
+    size = models.PositiveIntegerField(default=0, verbose_name='الحجم (حرف)')
+    content_hash = models.CharField(max_length=64, blank=True, verbose_name='بصمة المحتوى')
+    summary = models.CharField(max_length=SUMMARY_LENGTH, blank=True, verbose_name='ملخص')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')
     
+    objects = NoteVersionQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'نسخة ملاحظة'
         verbose_name_plural = 'نسخ الملاحظات'
+        indexes = [
+            models.Index(fields=['note', '-created_at'], name='notes_version_note_created_idx'),
+        ]
     
     def __str__(self):
         return f'{self.note.title} - {self.created_at.strftime("%Y-%m-%d %H:%M")}'
+    
+    @classmethod
+    def metadata_for(cls, content_md):
+        """الحقول الوصفية المحسوبة من نص النسخة"""
+        return {
+            'size': len(content_md),
+            'content_hash': versioning.content_hash(content_md),
+            'summary': Truncator(content_md).chars(cls.SUMMARY_LENGTH),
+        }
+    
+    def get_content(self):
+        """استعادة النص الكامل لهذه النسخة"""
+        if self.encoding == versioning.ENCODING_RAW:
+            return self.content_md
+        if self.encoding == versioning.ENCODING_FULL:
+            return versioning.decompress_text(self.payload)
+        return versioning.decode_chain(NoteVersion.objects.chain_for(self))
+
+
+
+class OctetLength(models.Func):
+    """طول النص بالبايت (UTF-8)"""
+    function = 'OCTET_LENGTH'
+    output_field = models.BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='LENGTH(CAST(%(expressions)s AS BLOB))', **extra_context)
+
+
+def content_bytes(content_md):
+    """حجم نص الملاحظة بالبايت كما يحسبه ``OctetLength``"""
+    return len((content_md or '').encode('utf-8'))
+
+
+def _per_user(queryset, owner_lookup, expression, outer_ref=None):
+    """استعلام فرعي يحسب قيمة تجميعية لكل مستخدم (0 إذا لم توجد صفوف)"""
+    subquery = (
+        queryset.filter(**{owner_lookup: outer_ref or models.OuterRef('pk')})
+        .order_by().values(owner_lookup)
+        .annotate(value=expression).values('value')
+    )
+    return Coalesce(models.Subquery(subquery), 0)
+
+
+def _tag_count(outer_ref):
+    """عدد الوسوم المختلفة المستخدمة في ملاحظات المستخدم"""
+    tagged = TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Note),
+        object_id__in=Note.objects.filter(owner=outer_ref).values('id'),
+    )
+    return Coalesce(models.Subquery(
+        tagged.order_by().values('content_type').annotate(value=Count('tag', distinct=True)).values('value')
+    ), 0)
+
+
+class UserStatsQuerySet(models.QuerySet):
+    """حساب إحصاءات المستخدمين وتحديثها"""
+
+    def computed(self, users=None):
+        """
+        الإحصاءات محسوبة من الجداول مباشرة: قاموس لكل مستخدم في استعلام واحد
+
+        تُستخدم عند غياب السجل وفي أمر ``reconcile_user_stats``.
+        """
+        users = User.objects.all() if users is None else users
+        notes = Note.objects.all()
+        return users.order_by('pk').values(
+            'pk',
+            total_notes=_per_user(notes, 'owner', Count('pk')),
+            favorite_notes=_per_user(notes, 'owner', Count('pk', filter=models.Q(is_favorite=True))),
+            public_notes=_per_user(notes, 'owner', Count('pk', filter=models.Q(is_public=True))),
+            total_views=_per_user(notes, 'owner', Sum('views')),
+            storage_bytes=_per_user(notes, 'owner', Sum(OctetLength('content_md'))),
+            version_count=_per_user(NoteVersion.objects.all(), 'note__owner', Count('pk')),
+            # ملاحظات المستخدم في استعلام فرعي داخل استعلام TaggedItem الفرعي
+            tag_count=_tag_count(models.OuterRef(models.OuterRef('pk'))),
+        )
+
+    def store(self, rows):
+        """حفظ نتائج ``computed`` (إنشاء أو تحديث)"""
+        stats = [
+            UserStats(user_id=row['pk'], **{field: row[field] for field in UserStats.STAT_FIELDS})
+            for row in rows
+        ]
+        self.bulk_create(
+            stats,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[*UserStats.STAT_FIELDS, 'updated_at'],
+        )
+        return stats
+
+    def refresh(self, user_id):
+        """إعادة حساب إحصاءات مستخدم بالكامل"""
+        return self.store(self.computed(User.objects.filter(pk=user_id)))[0]
+
+    def for_user(self, user):
+        """سجل إحصاءات المستخدم، مع حسابه إن لم يوجد بعد"""
+        try:
+            return self.get(user=user)
+        except UserStats.DoesNotExist:
+            return self.refresh(user.pk)
+
+    def apply_delta(self, user_id, **deltas):
+        """إضافة فروقات إلى إحصاءات مستخدم بتحديث ذري واحد"""
+        deltas = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        if not self.filter(user_id=user_id).update(**deltas, updated_at=timezone.now()):
+            self.refresh(user_id)
+
+    def remove_note(self, user_id, **values):
+        """
+        طرح قيم ملاحظة محذوفة من إحصاءات مالكها، مع إعادة عدّ النسخ والوسوم
+        فقط (حُذفت معها) في نفس التحديث
+        """
+        updates = {field: F(field) - value for field, value in values.items() if value}
+        updated = self.filter(user_id=user_id).update(
+            **updates,
+            version_count=_per_user(NoteVersion.objects.all(), 'note__owner', Count('pk'), user_id),
+            tag_count=_tag_count(user_id),
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            self.refresh(user_id)
+
+    def refresh_tag_count(self, user_id):
+        """إعادة حساب عدد الوسوم فقط في استعلام UPDATE واحد"""
+        self.filter(user_id=user_id).update(tag_count=_tag_count(user_id), updated_at=timezone.now())
+
+    def add_views(self, counts):
+        """إضافة مشاهدات ``{note_id: count}`` إلى إحصاءات مالكي الملاحظات"""
+        by_owner = defaultdict(int)
+        for note_id, owner_id in Note.objects.filter(pk__in=counts).values_list('pk', 'owner_id'):
+            by_owner[owner_id] += counts[note_id]
+        by_increment = defaultdict(list)
+        for owner_id, count in by_owner.items():
+            by_increment[count].append(owner_id)
+        for count, owner_ids in by_increment.items():
+            self.filter(user_id__in=owner_ids).update(total_views=F('total_views') + count)
+
+
+class UserStats(models.Model):
+    """
+    إحصاءات المستخدم المحفوظة لصفحة الملف الشخصي
+
+    تُحدَّث تدريجياً من الإشارات (``notes.signals``) ومن عداد المشاهدات، ويمكن
+    إعادة حسابها بالكامل بـ ``UserStats.objects.refresh`` أو أمر
+    ``reconcile_user_stats``.
+    """
+    STAT_FIELDS = (
+        'total_notes', 'favorite_notes', 'public_notes', 'total_views',
+        'tag_count', 'storage_bytes', 'version_count',
+    )
+    
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='note_stats', verbose_name='المستخدم')
+    total_notes = models.IntegerField(default=0, verbose_name='إجمالي الملاحظات')
+    favorite_notes = models.IntegerField(default=0, verbose_name='الملاحظات المفضلة')
+    public_notes = models.IntegerField(default=0, verbose_name='الملاحظات العامة')
+    total_views = models.BigIntegerField(default=0, verbose_name='إجمالي المشاهدات')
+    tag_count = models.IntegerField(default=0, verbose_name='عدد الوسوم')
+    storage_bytes = models.BigIntegerField(default=0, verbose_name='حجم المحتوى (بايت)')
+    version_count = models.IntegerField(default=0, verbose_name='عدد النسخ')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')
+    
+    objects = UserStatsQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'إحصاءات مستخدم'
+        verbose_name_plural = 'إحصاءات المستخدمين'
+    
+    def __str__(self):
+        return f'{self.user} - {self.total_notes}'
+
+
+class ImportJob(models.Model):
+    """
+    حالة استيراد أرشيف للمستخدم
+
+    تُحفظ في قاعدة البيانات لأن الاستيراد يعمل في خيط خلفي لعامل واحد بينما
+    قد يصل طلب متابعة الحالة (``import_status``) إلى أي عامل آخر.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'في الانتظار'),
+        (RUNNING, 'جارٍ'),
+        (DONE, 'اكتمل'),
+        (FAILED, 'فشل'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs', verbose_name='المستخدم')
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default=QUEUED, verbose_name='الحالة')
+    stats = models.JSONField(default=dict, verbose_name='الإحصاءات')
+    error = models.TextField(blank=True, verbose_name='الخطأ')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاريخ البدء')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='آخر تحديث')
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'عملية استيراد'
+        verbose_name_plural = 'عمليات الاستيراد'
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notes_import_user_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.user} - {self.get_status_display()}'
+    
+    def record(self, status, stats, error=''):
+        """حفظ التقدم (بعد كل دفعة) بتحديث واحد"""
+        self.status, self.stats, self.error = status, dict(stats), error
+        ImportJob.objects.filter(pk=self.pk).update(
+            status=status, stats=self.stats, error=error, updated_at=timezone.now(),
+        )
+    
+    def as_json(self):
+        data = {'id': self.pk, **self.stats, 'status': self.status}
+        if self.error:
+            data['error'] = self.error
+        return data
 
 
 from datetime import timedelta
@@ -0,0 +1,188 @@
+"""
+ترقيم الصفحات بالمؤشر (keyset) لقوائم الملاحظات
+
+بدلاً من ``COUNT(*)`` و ``OFFSET`` تُجلب الصفحة التالية بشرط على قيمة
+حقل الترتيب ومعرّف آخر ملاحظة في الصفحة الحالية، لذا فإن تكلفة أي صفحة
+مثل تكلفة الأولى. المؤشرات نصوص معتمة (JSON بترميز base64) تحمل الترتيب
+والاتجاه وآخر قيمة.
+
+الترتيب حسب الصلة في البحث (``search_rank``) قيمة عشرية محسوبة لكل استعلام،
+لذا يُرقم بالإزاحة داخل نفس صيغة المؤشر.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import DateTimeField, Q
+
+
+PAGE_SIZE = 12
+
+# الحقول التي يُرقم عليها بالمؤشر (مع المعرّف لكسر التعادل)
+KEYSET_FIELDS = ('updated_at', 'created_at', 'title', 'views')
+
+# قيم ``sort`` المقبولة في القوائم
+SORTS = ('-updated_at', 'updated_at', '-created_at', 'created_at', 'title', '-title', '-views', 'views')
+
+DIRECTION_NEXT = 'n'
+DIRECTION_PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    """مؤشر تالف أو لا يخص الترتيب الحالي"""
+
+
+def encode_cursor(data):
+    encoded = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(encoded).rstrip(b'=').decode('ascii')
+
+
+def decode_cursor(cursor, ordering):
+    """فك المؤشر والتحقق من أنه صادر لنفس الترتيب"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeError) as error:
+        raise InvalidCursor(str(error)) from error
+    if not isinstance(data, dict) or data.get('o') != list(ordering):
+        raise InvalidCursor('المؤشر لا يخص هذا الترتيب')
+    return data
+
+
+class CursorPage:
+    """صفحة من النتائج مع مؤشري الصفحتين التالية والسابقة"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def resolve_ordering(sort_by, search_query=''):
+    """
+    قيمة ``sort`` الصالحة وترتيب الاستعلام المقابل لها
+
+    الترتيب حسب الصلة (``rank``) متاح فقط مع البحث، والقيم الأخرى غير
+    المعروفة تعود للترتيب الافتراضي.
+    """
+    if not sort_by:
+        sort_by = 'rank' if search_query else '-updated_at'
+    if sort_by == 'rank' and search_query:
+        return sort_by, ('-search_rank', '-updated_at')
+    if sort_by not in SORTS:
+        sort_by = '-updated_at'
+    return sort_by, (sort_by,)
+
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _deserialize(queryset, field, value):
+    if isinstance(queryset.model._meta.get_field(field), DateTimeField):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError) as error:
+            raise InvalidCursor(str(error)) from error
+    return value
+
+
+def paginate(queryset, ordering, cursor=None, per_page=PAGE_SIZE):
+    """
+    صفحة من ``queryset`` مرتبة حسب ``ordering`` (مثل ``('-updated_at',)``)
+
+    المؤشر غير الصالح يُعامل كطلب للصفحة الأولى.
+    """
+    ordering = tuple(ordering)
+    data = None
+    if cursor:
+        try:
+            data = decode_cursor(cursor, ordering)
+        except InvalidCursor:
+            data = None
+
+    field = ordering[0].lstrip('-')
+    if len(ordering) == 1 and field in KEYSET_FIELDS:
+        try:
+            return _paginate_keyset(queryset, ordering, data, per_page)
+        except InvalidCursor:
+            return _paginate_keyset(queryset, ordering, None, per_page)
+    return _paginate_offset(queryset, ordering, data, per_page)
+
+
+def _paginate_keyset(queryset, ordering, data, per_page):
+    field = ordering[0].lstrip('-')
+    descending = ordering[0].startswith('-')
+    backwards = data is not None and data.get('d') == DIRECTION_PREVIOUS
+
+    # الاتجاه الأمامي في الترتيب التنازلي يعني قيماً أصغر
+    lookup = 'lt' if descending != backwards else 'gt'
+    order = [f'-{field}', '-pk'] if descending != backwards else [field, 'pk']
+
+    if data is not None:
+        try:
+            value, pk = data['k']
+        except (KeyError, TypeError, ValueError) as error:
+            raise InvalidCursor(str(error)) from error
+        value = _deserialize(queryset, field, value)
+        queryset = queryset.filter(
+            Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'pk__{lookup}': pk})
+        )
+
+    rows = list(queryset.order_by(*order)[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, data is not None
+
+    def cursor_for(note, direction):
+        return encode_cursor({
+            'o': list(ordering),
+            'd': direction,
+            'k': [_serialize(getattr(note, field)), note.pk],
+        })
+
+    return CursorPage(
+        rows,
+        next_cursor=cursor_for(rows[-1], DIRECTION_NEXT) if rows and has_next else None,
+        previous_cursor=cursor_for(rows[0], DIRECTION_PREVIOUS) if rows and has_previous else None,
+    )
+
+
+def _paginate_offset(queryset, ordering, data, per_page):
+    offset = data.get('i', 0) if data is not None else 0
+    if not isinstance(offset, int) or offset < 0:
+        offset = 0
+
+    rows = list(queryset.order_by(*ordering, 'pk')[offset:offset + per_page + 1])
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    def cursor_for(index):
+        return encode_cursor({'o': list(ordering), 'i': index})
+
+    return CursorPage(
+        rows,
+        next_cursor=cursor_for(offset + per_page) if has_next else None,
+        previous_cursor=cursor_for(max(offset - per_page, 0)) if offset else None,
+    )
@@ -0,0 +1,140 @@
+"""
+تصدير الملاحظات كـ PDF مع ذاكرة مؤقتة على القرص
+
+الأنماط والخطوط تُجهَّز مرة واحدة لكل عملية، وكل ملف PDF يُحفظ في
+``PDF_CACHE_DIR/<note_id>/<hash>.pdf`` حيث البصمة مأخوذة من العنوان والمحتوى
+وإعدادات التخطيط، لذا فإن التنزيل المتكرر مجرد قراءة ملف.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from reportlab.lib.enums import TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+from .instrumentation import span
+
+
+# يُرفع عند تغيير التخطيط أو الأنماط لإبطال الملفات المخزنة
+PDF_LAYOUT_VERSION = 1
+
+FONT_NAME = 'NoteFont'
+
+
+@lru_cache(maxsize=None)
+def _font_name():
+    """تسجيل الخط المخصص مرة واحدة (إن وُجد) وإرجاع اسمه"""
+    font_path = settings.PDF_FONT_PATH
+    if not font_path:
+        return None
+    pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+    return FONT_NAME
+
+
+@lru_cache(maxsize=None)
+def get_styles():
+    """أنماط العنوان والمحتوى (RTL)، تُبنى مرة واحدة لكل عملية"""
+    styles = getSampleStyleSheet()
+    font = _font_name()
+    font_kwargs = {'fontName': font} if font else {}
+
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        alignment=TA_RIGHT,
+        fontSize=18,
+        spaceAfter=30,
+        **font_kwargs,
+    )
+
+    content_style = ParagraphStyle(
+        'CustomContent',
+        parent=styles['BodyText'],
+        alignment=TA_RIGHT,
+        fontSize=12,
+        leading=20,
+        **font_kwargs,
+    )
+    return title_style, content_style
+
+
+def build_story(title, content_md):
+    """عناصر المستند: العنوان ثم سطر لكل فقرة من النص الأصلي"""
+    title_style, content_style = get_styles()
+    story = [
+        Paragraph(escape(title or 'ملاحظة بدون عنوان'), title_style),
+        Spacer(1, 12),
+    ]
+    # ملاحظة: reportlab لا يدعم HTML المعقد، لذا نستخدم النص الأصلي
+    for line in content_md.split('\n'):
+        if line.strip():
+            story.append(Paragraph(escape(line), content_style))
+            story.append(Spacer(1, 6))
+    return story
+
+
+def build_pdf(title, content_md, target):
+    """بناء PDF وكتابته إلى ``target`` (مسار أو ملف)"""
+    with span('pdf'):
+        doc = SimpleDocTemplate(target, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+        doc.build(build_story(title, content_md))
+
+
+def content_hash(title, content_md):
+    digest = hashlib.sha256(f'{PDF_LAYOUT_VERSION}:{settings.PDF_FONT_PATH}\n'.encode('utf-8'))
+    digest.update((title or '').encode('utf-8'))
+    digest.update(b'\0')
+    digest.update((content_md or '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _note_dir(note_id):
+    return os.path.join(settings.PDF_CACHE_DIR, str(note_id))
+
+
+def open_pdf(note):
+    """
+    فتح ملف PDF المخزن للملاحظة للقراءة، مع بنائه إن لم يكن موجوداً
+
+    يُعاد الملف مفتوحاً حتى لا يتأثر بحذف النسخ القديمة من طلب آخر.
+    """
+    directory = _note_dir(note.pk)
+    path = os.path.join(directory, f'{content_hash(note.title, note.content_md)}.pdf')
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            build_pdf(note.title, note.content_md, tmp_file)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    pdf_file = open(path, 'rb')
+
+    # حذف النسخ القديمة لنفس الملاحظة
+    for name in os.listdir(directory):
+        if name.endswith('.pdf') and os.path.join(directory, name) != path:
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return pdf_file
+
+
+def remove_cached_pdfs(note_id):
+    """حذف كل ملفات PDF المخزنة لملاحظة محذوفة"""
+    shutil.rmtree(_note_dir(note_id), ignore_errors=True)
@@ -0,0 +1,86 @@
+"""
+بروتوكول المعاينة من الخادم
+
+المعاينة تستخدم نفس تحويل ``Note.save`` (markdown2 ثم التعقيم)، فيرى الكاتب
+ما سيُحفظ فعلاً. يرسل المحرر المحتوى كاملاً أول مرة، ثم تعديلات بصيغة الحفظ
+التلقائي (``notes.autosave``) على آخر نص أرسله مع رقمه ``seq``، ومعرفات
+الكتل الموجودة لديه::
+
+    {
+        "note": 12,
+        "seq": 3,
+        "patch": [[start, end, "نص بديل"], ...],
+        "have": ["9f2c41d07a5be310", ...]
+    }
+
+الرد ترتيب كتل المستند، و HTML المعقم للكتل غير الموجودة في ``have`` فقط::
+
+    {
+        "success": true,
+        "seq": 4,
+        "blocks": ["9f2c41d07a5be310", "07aa3e19c2d4f5b6"],
+        "html": {"07aa3e19c2d4f5b6": "<p>...</p>"}
+    }
+
+المعاينة هي HTML الكتل بالترتيب موصولة بـ ``\\n``. إذا لم يطابق ``seq`` آخر
+نص محفوظ لهذه الجلسة (انتهت صلاحيته، أو محرر آخر في نفس الجلسة) يكون الرد
+409 مع ``"resync": true`` ويعيد المحرر إرسال المحتوى كاملاً. ``note`` يفصل
+معاينات الملاحظات المختلفة في نفس الجلسة، ويُحذف للملاحظة الجديدة.
+
+آخر نص لكل جلسة في ذاكرة Django المؤقتة لمدة ``PREVIEW_STATE_TIMEOUT``،
+ونتائج الكتل في ذاكرة الكتل (``rendering.block_cache``) حسب محتواها.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .autosave import apply_patch
+from .rendering import preview_blocks
+
+
+# طول معرف الكتلة المرسل (بداية بصمة الكتلة في ذاكرة الكتل)
+BLOCK_ID_LENGTH = 16
+
+
+class PreviewOutOfSync(Exception):
+    """الخادم لا يملك النص الذي بُنيت عليه التعديلات"""
+
+
+def _state_key(session_key, note_id):
+    return f'notes:preview:{session_key}:{note_id or "new"}'
+
+
+def build_preview(session_key, data):
+    """تطبيق الطلب على نص الجلسة وإرجاع ``(seq, blocks, html)``"""
+    note_id = data.get('note')
+    if note_id is not None and not isinstance(note_id, int):
+        raise ValueError('رقم الملاحظة غير صحيح')
+    have = data.get('have') or []
+    if not isinstance(have, list) or not all(isinstance(block_id, str) for block_id in have):
+        raise ValueError('صيغة have غير صحيحة')
+
+    key = _state_key(session_key, note_id)
+    state = cache.get(key)
+    if 'content_md' in data:
+        content_md = data['content_md']
+        if not isinstance(content_md, str):
+            raise ValueError('صيغة المحتوى غير صحيحة')
+    elif 'patch' in data:
+        if state is None or state['seq'] != data.get('seq'):
+            raise PreviewOutOfSync
+        content_md = apply_patch(state['text'], data['patch'])
+    else:
+        raise ValueError('يجب إرسال content_md أو patch')
+
+    seq = state['seq'] + 1 if state else 1
+    cache.set(key, {'seq': seq, 'text': content_md}, settings.PREVIEW_STATE_TIMEOUT)
+
+    have = set(have)
+    blocks = []
+    html = {}
+    for block_key, block_html in preview_blocks(content_md):
+        block_id = block_key[:BLOCK_ID_LENGTH]
+        blocks.append(block_id)
+        if block_id not in have:
+            html[block_id] = block_html
+    return seq, blocks, html
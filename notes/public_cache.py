@@ -0,0 +1,117 @@
+"""
+ذاكرة مؤقتة لصفحات الملاحظات العامة مع دعم الطلبات الشرطية
+
+الصفحة المعروضة تُحفظ في ذاكرة Django المؤقتة مع ETag و Last-Modified
+المحسوبة من ``revision`` و ``updated_at`` و ``rendered_at``، فيُرد على الطلبات
+التالية (أو بـ 304) بدون قالب. ``Note.save`` والحذف وتغيير الوسوم والحفظ
+التلقائي تحذف الصفحة المخزنة.
+
+الحذف يصل فقط لذاكرة العملية التي عدّلت الملاحظة إذا كانت الذاكرة محلية
+(locmem مع أكثر من عامل)، لذا تُطابق كل صفحة مخزنة قبل عرضها مع الملاحظة في
+القاعدة باستعلام واحد على ``public_uuid`` (فهرس فريد): الملاحظة المحذوفة أو
+التي أُلغيت مشاركتها لا تُعرض من الذاكرة، والمراجعة المختلفة تعيد بناء الصفحة. مع نسخة قاعدة بيانات متماثلة يبقى
+مكانها علامة ``changed`` لمدة ``DATABASE_REPLICA_STICKY_SECONDS``، فتُبنى الصفحة
+من القاعدة الرئيسية ولا تُحفظ من نسخة لم تصلها التعديلات بعد.
+
+عدد المشاهدات يُسجَّل في كل طلب يصل إلى الخادم حتى من الذاكرة، أما الرقم
+المعروض في الصفحة فيُحدَّث عند انتهاء صلاحيتها (``PUBLIC_NOTE_CACHE_TIMEOUT``).
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
+
+from .routers import replica_enabled
+
+
+# يُرفع عند تغيير قالب الصفحة العامة لإبطال الصفحات المخزنة
+PAGE_VERSION = 3
+
+
+def _cache_key(public_uuid):
+    return f'notes:public-page:{public_uuid}'
+
+
+def page_validators(note):
+    """ETag (ضعيف، لأن عدد المشاهدات جزء من الصفحة) ووقت آخر تعديل"""
+    last_modified = max(filter(None, [note.updated_at, note.rendered_at]))
+    digest = hashlib.sha256(
+        f'{PAGE_VERSION}:{note.pk}:{note.revision}:{note.updated_at.isoformat()}:'
+        f'{note.rendered_at.isoformat() if note.rendered_at else ""}'.encode('ascii')
+    )
+    return f'W/"{digest.hexdigest()[:32]}"', int(last_modified.timestamp())
+
+
+def _current_revision(public_uuid):
+    from .models import Note
+
+    return Note.objects.filter(public_uuid=public_uuid, is_public=True).values_list('revision', flat=True)
+
+
+def get_page(public_uuid):
+    """الصفحة المخزنة إذا كانت الملاحظة ما زالت عامة وبنفس المراجعة"""
+    key = _cache_key(public_uuid)
+    page = cache.get(key)
+    if page is not None and not is_changed(page):
+        if page.get('revision') != _current_revision(public_uuid).first():
+            cache.delete(key)
+            return None
+    return page
+
+
+async def aget_page(public_uuid):
+    key = _cache_key(public_uuid)
+    page = await cache.aget(key)
+    if page is not None and not is_changed(page):
+        if page.get('revision') != await _current_revision(public_uuid).afirst():
+            await cache.adelete(key)
+            return None
+    return page
+
+
+def store_page(note, content):
+    """
+    حفظ الصفحة المعروضة وإرجاع بياناتها
+
+    لا تُحفظ إذا كان HTML قديماً (تحويل جارٍ في الخلفية).
+    """
+    etag, last_modified = page_validators(note)
+    page = {
+        'note_id': note.pk,
+        'revision': note.revision,
+        'etag': etag,
+        'last_modified': last_modified,
+        'content': content,
+    }
+    if not note.html_stale:
+        cache.set(_cache_key(note.public_uuid), page, settings.PUBLIC_NOTE_CACHE_TIMEOUT)
+    return page
+
+
+def invalidate_page(public_uuid):
+    sticky_seconds = settings.DATABASE_REPLICA_STICKY_SECONDS
+    if replica_enabled() and sticky_seconds > 0:
+        cache.set(_cache_key(public_uuid), {'changed': True}, sticky_seconds)
+    else:
+        cache.delete(_cache_key(public_uuid))
+
+
+def is_changed(page):
+    """هل الصفحة علامة تعديل حديث (تُبنى من القاعدة الرئيسية)؟"""
+    return page is not None and page.get('changed', False)
+
+
+def patch_page_headers(response, page):
+    """إضافة ETag و Last-Modified و Cache-Control لاستجابة الصفحة (أو 304)"""
+    response['ETag'] = page['etag']
+    response['Last-Modified'] = http_date(page['last_modified'])
+    cdn_max_age = settings.PUBLIC_NOTE_CDN_MAX_AGE
+    if cdn_max_age > 0:
+        # الطلبات التي يخدمها الـ CDN من ذاكرته لا تصل للخادم ولا تُحسب كمشاهدات
+        patch_cache_control(response, public=True, max_age=0, s_maxage=cdn_max_age)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
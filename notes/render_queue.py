@@ -0,0 +1,126 @@
+"""
+تحويل Markdown خارج دورة الطلب للملاحظات الكبيرة
+
+عند تفعيل ``RENDER_ASYNC`` تُرسل الملاحظات التي يتجاوز حجمها
+``RENDER_ASYNC_THRESHOLD`` حرفاً إلى مجموعة عمليات منفصلة تنفذ
+``rendering.render_incremental`` فقط (بدون قاعدة بيانات أو شبكة)، ثم تُكتب
+النتيجة بشرط ألا تكون الملاحظة قد تغيرت منذ إرسالها.
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .rendering import content_key, render_cache, render_incremental
+from .summary import summarize
+
+
+logger = logging.getLogger(__name__)
+
+
+class RenderQueue:
+    """قائمة انتظار التحويل مع مؤشرات زمن التحويل وعمق القائمة"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = {}
+        self._in_flight = 0
+        self._latencies = deque(maxlen=200)
+        self.completed = 0
+        self.failed = 0
+
+    def should_defer(self, content_md):
+        """هل يجب تحويل هذا المحتوى في الخلفية؟"""
+        return settings.RENDER_ASYNC and len(content_md) >= settings.RENDER_ASYNC_THRESHOLD
+
+    def is_pending(self, note_id):
+        with self._lock:
+            return note_id in self._pending
+
+    def submit(self, note_id, revision, content_md):
+        """إرسال محتوى ملاحظة للتحويل في عملية منفصلة"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.RENDER_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            self._pending[note_id] = revision
+            self._in_flight += 1
+            executor = self._executor
+        future = executor.submit(render_incremental, content_md)
+        future.add_done_callback(
+            partial(self._on_done, note_id, revision, content_md, time.monotonic())
+        )
+
+    def _on_done(self, note_id, revision, content_md, submitted_at, future):
+        from .models import Note
+
+        latency = time.monotonic() - submitted_at
+        with self._lock:
+            self._in_flight -= 1
+            if self._pending.get(note_id) == revision:
+                del self._pending[note_id]
+
+        try:
+            html = future.result()
+        except Exception as error:
+            with self._lock:
+                self.failed += 1
+                # مجموعة العمليات المعطلة لا تقبل مهام جديدة، تُنشأ غيرها عند الإرسال التالي
+                if isinstance(error, BrokenProcessPool) and self._executor is not None:
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = None
+            logger.exception('فشل تحويل الملاحظة #%s في الخلفية', note_id)
+            return
+
+        render_cache.set(content_key(content_md), html)
+        excerpt, word_count, reading_time = summarize(html)
+        close_old_connections()
+        try:
+            Note.objects.filter(pk=note_id, revision=revision).update(
+                content_html=html,
+                excerpt=excerpt,
+                word_count=word_count,
+                reading_time=reading_time,
+                html_stale=False,
+                rendered_at=timezone.now(),
+            )
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            logger.exception('تعذر حفظ نتيجة تحويل الملاحظة #%s', note_id)
+            return
+        finally:
+            # الاستدعاء يعمل في خيط داخلي للمنفذ وليس في خيط طلب
+            connection.close()
+
+        with self._lock:
+            self.completed += 1
+            self._latencies.append(latency)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                'enabled': settings.RENDER_ASYNC,
+                'queue_depth': self._in_flight,
+                'completed': self.completed,
+                'failed': self.failed,
+                'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+                'latency_p95': latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+                'latency_max': latencies[-1] if latencies else 0.0,
+            }
+
+
+render_queue = RenderQueue()
@@ -0,0 +1,273 @@
+"""
+تحويل Markdown إلى HTML معقم مع ذاكرة مؤقتة حسب المحتوى
+
+كل التحويلات (الحفظ، الاستيراد، التحويل في الخلفية) تمر عبر ``engine`` بإعدادات
+``RENDER_CONFIG`` الثابتة. مفتاح الذاكرة هو بصمة SHA-256 لنص Markdown مع هذه
+الإعدادات، لذا فإن أي تغيير فيها (أو في ``RENDER_CONFIG_VERSION`` أو في إصدار
+المكتبات) يُبطل النتائج القديمة تلقائياً.
+
+الملاحظات الطويلة تُحوَّل تدريجياً (``render_incremental``): يُقسم النص إلى كتل
+مستقلة (``blocks.split_blocks``) ولكل كتلة نتيجتها المعقمة في ``block_cache``،
+فتعديل فقرة واحدة يعيد تحويل تلك الفقرة فقط والنتيجة مطابقة للتحويل الكامل.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+import bleach
+import markdown2
+from django.conf import settings
+
+from .blocks import split_blocks
+from .instrumentation import span
+from .summary import summarize
+
+
+MARKDOWN_EXTRAS = [
+    'fenced-code-blocks',
+    'tables',
+    'break-on-newline',
+    'code-friendly',
+    'cuddled-lists',
+    'header-ids',
+    'nofollow',
+    'task_list',
+]
+
+ALLOWED_TAGS = [
+    'p', 'br', 'strong', 'em', 'u', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'blockquote', 'code', 'pre', 'hr', 'div', 'span',
+    'ul', 'ol', 'li', 'a', 'img',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td',
+    'del', 'ins', 'sup', 'sub',
+]
+
+ALLOWED_ATTRIBUTES = {
+    '*': ['class', 'id', 'dir'],
+    'a': ['href', 'title', 'rel'],
+    'img': ['src', 'alt', 'title', 'width', 'height'],
+    'code': ['class'],
+    'pre': ['class'],
+}
+
+
+# يُرفع عند أي تغيير في طريقة التحويل لا تظهر في القوائم أعلاه
+RENDER_CONFIG_VERSION = 1
+
+RENDER_CONFIG = {
+    'version': RENDER_CONFIG_VERSION,
+    'extras': MARKDOWN_EXTRAS,
+    'tags': ALLOWED_TAGS,
+    'attributes': ALLOWED_ATTRIBUTES,
+    'strip': True,
+    'markdown2': markdown2.__version__,
+    'bleach': bleach.__version__,
+}
+
+
+def _config_fingerprint():
+    encoded = json.dumps(RENDER_CONFIG, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+CONFIG_FINGERPRINT = _config_fingerprint()
+
+
+class RenderEngine:
+    """
+    محوّل Markdown ومعقِّم جاهزان بالإعدادات الثابتة
+
+    ``markdown2.Markdown`` و ``bleach.Cleaner`` ليسا آمنين بين الخيوط، لذا
+    يُنشأ زوج لكل خيط عند أول استخدام ثم يُعاد استخدامه (بدلاً من بناء محوّل
+    ومحلل HTML جديدين في كل استدعاء لـ ``markdown2.markdown`` و ``bleach.clean``).
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._local = threading.local()
+
+    def _tools(self):
+        tools = getattr(self._local, 'tools', None)
+        if tools is None:
+            tools = self._local.tools = (
+                markdown2.Markdown(extras=list(self.config['extras'])),
+                bleach.Cleaner(
+                    tags=self.config['tags'],
+                    attributes=self.config['attributes'],
+                    strip=self.config['strip'],
+                ),
+            )
+        return tools
+
+    def render(self, content_md):
+        """تحويل Markdown إلى HTML ثم تعقيمه للحماية من XSS"""
+        markdown, cleaner = self._tools()
+        with span('markdown'):
+            html = markdown.convert(content_md)
+        with span('bleach'):
+            return cleaner.clean(str(html))
+
+
+engine = RenderEngine(RENDER_CONFIG)
+
+
+class RenderCache:
+    """ذاكرة LRU محدودة بعدد العناصر وبالحجم الكلي لنتائج HTML"""
+
+    def __init__(self, max_entries, max_chars):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._entries = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def __contains__(self, key):
+        """وجود المفتاح دون تغيير ترتيب LRU أو عدّاد الإصابات"""
+        with self._lock:
+            return key in self._entries
+
+    def set(self, key, html):
+        if self.max_entries <= 0 or len(html) > self.max_chars:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._chars -= len(previous)
+            self._entries[key] = html
+            self._chars += len(html)
+            while len(self._entries) > self.max_entries or self._chars > self.max_chars:
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'chars': self._chars,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+render_cache = RenderCache(
+    max_entries=settings.RENDER_CACHE_MAX_ENTRIES,
+    max_chars=settings.RENDER_CACHE_MAX_CHARS,
+)
+
+block_cache = RenderCache(
+    max_entries=settings.RENDER_BLOCK_CACHE_MAX_ENTRIES,
+    max_chars=settings.RENDER_BLOCK_CACHE_MAX_CHARS,
+)
+
+HEADER_ID_RE = re.compile(r'<h[1-6] id="([^"]*)"')
+
+
+def content_key(content_md):
+    """مفتاح الذاكرة المؤقتة لنص Markdown مع الإعدادات الحالية"""
+    digest = hashlib.sha256(CONFIG_FINGERPRINT.encode('ascii'))
+    digest.update(content_md.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_uncached(content_md):
+    """تحويل Markdown إلى HTML ثم تعقيمه للحماية من XSS"""
+    return engine.render(content_md)
+
+
+def rendered_blocks(content_md, min_blocks=0):
+    """
+    ``[(key, html), ...]`` لكتل المستند من ذاكرتها أو بتحويلها
+
+    يعيد None إذا احتاج المستند تحويلاً كاملاً (أو كانت كتله أقل من
+    ``min_blocks``). وصل نتائج الكتل بـ ``\\n`` يطابق التحويل الكامل.
+    """
+    blocks = split_blocks(content_md)
+    if blocks is None or len(blocks) < min_blocks:
+        return None
+    rendered = []
+    header_ids = set()
+    for block in blocks:
+        key = content_key(block)
+        html = block_cache.get(key)
+        if html is None:
+            html = engine.render(block)
+            block_cache.set(key, html)
+        # معرفات العناوين المكررة يرقمها markdown2 على مستوى المستند كله
+        ids = set(HEADER_ID_RE.findall(html))
+        if ids & header_ids:
+            return None
+        header_ids |= ids
+        rendered.append((key, html))
+    return rendered
+
+
+def render_incremental(content_md):
+    """تحويل كامل مطابق لـ ``render_uncached`` يعيد استخدام الكتل غير المتغيرة"""
+    rendered = rendered_blocks(content_md, min_blocks=settings.RENDER_INCREMENTAL_MIN_BLOCKS)
+    if rendered is None:
+        return render_uncached(content_md)
+    return '\n'.join(html for _, html in rendered)
+
+
+def render_markdown(content_md):
+    """تحويل Markdown إلى HTML معقم مع استخدام الذاكرة المؤقتة"""
+    if not content_md:
+        return ''
+    key = content_key(content_md)
+    html = render_cache.get(key)
+    if html is None:
+        html = render_incremental(content_md)
+        render_cache.set(key, html)
+    return html
+
+
+def preview_blocks(content_md):
+    """كتل المعاينة: كتل المستند، أو كتلة واحدة بالتحويل الكامل إن تعذر تقسيمه"""
+    rendered = rendered_blocks(content_md)
+    if rendered is None:
+        return [(content_key(content_md), render_markdown(content_md))]
+    return rendered
+
+
+def render_document(content_md):
+    """
+    تحويل المحتوى وحساب ملخصه معاً: ``(html, excerpt, word_count, reading_time)``
+
+    لا تستخدم قاعدة البيانات ولا الذاكرة المؤقتة، لذا يمكن تشغيلها في عمليات منفصلة.
+    """
+    html = engine.render(content_md) if content_md else ''
+    return (html, *summarize(html))
+
+
+def render_many(contents):
+    """
+    ``render_document`` لقائمة نصوص دفعة واحدة
+
+    مع مجموعة عمليات تُرسل كل دفعة في رسالة واحدة بدل رسالة لكل ملاحظة.
+    """
+    return [render_document(content_md) for content_md in contents]
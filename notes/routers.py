@@ -0,0 +1,205 @@
+"""
+توجيه القراءة إلى نسخة قاعدة البيانات المتماثلة (``DATABASE_REPLICA_URL``)
+
+الكتابة دائماً على القاعدة الرئيسية، ومعها القراءات داخل معاملاتها. القراءة تذهب إلى النسخة فقط داخل العروض
+المعلَّمة بـ ``@read_from_replica`` (صفحات القراءة: القائمة، التفاصيل، الصفحة
+العامة، الإحصاءات، التصدير)، وما عداها يقرأ من الرئيسية كالسابق. الجلسات
+تُقرأ دائماً من الرئيسية لأن تسجيل الدخول يكتبها قبل وصولها إلى النسخة.
+
+قراءة ما كتبه المستخدم: بعد أي طلب كتابة (POST وما شابه) يضع
+``ReplicaStickinessMiddleware`` كوكي لمدة ``DATABASE_REPLICA_STICKY_SECONDS``
+تبقى خلالها قراءات هذا المتصفح على الرئيسية، فلا يرى نسخة متأخرة عما حفظه للتو.
+
+إذا تعذر الاتصال بالنسخة تُستخدم الرئيسية لمدة ``DATABASE_REPLICA_RETRY_SECONDS``
+ثم يُعاد المحاولة، و ``DATABASE_REPLICA_READS=False`` يعيد كل القراءات إلى الرئيسية
+دون إزالة النسخة.
+"""
+
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.http import FileResponse
+
+
+logger = logging.getLogger(__name__)
+
+REPLICA = 'replica'
+
+# وجود الكوكي يعني أن المتصفح كتب مؤخراً (القيمة غير مهمة)
+STICKY_COOKIE = 'notes_primary'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = ContextVar('notes_read_alias', default=None)
+
+
+def replica_enabled():
+    return settings.DATABASE_REPLICA_READS and REPLICA in settings.DATABASES
+
+
+class _ReplicaHealth:
+    """حالة الاتصال بالنسخة، مع تجنبها مؤقتاً بعد فشل الاتصال"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+
+    def available(self):
+        if time.monotonic() < self._down_until:
+            return False
+        try:
+            connections[REPLICA].ensure_connection()
+        except DatabaseError as error:
+            with self._lock:
+                self._down_until = time.monotonic() + settings.DATABASE_REPLICA_RETRY_SECONDS
+            logger.warning('Read replica unavailable, reading from primary: %s', error)
+            return False
+        return True
+
+    def reset(self):
+        with self._lock:
+            self._down_until = 0.0
+
+
+replica_health = _ReplicaHealth()
+
+
+class ReplicaRouter:
+    """القراءة من ``_read_alias`` (النسخة داخل ``read_from_replica``)، والكتابة على الرئيسية"""
+
+    def db_for_read(self, model, **hints):
+        # القراءة داخل معاملة كتابة تخص الكتابة نفسها (مثل أصحاب الملاحظات في عدّاد المشاهدات)
+        if model._meta.app_label == 'sessions' or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # صراحة: بدونها يكتب Django على قاعدة الكائن المقروء (أي النسخة)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, REPLICA}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # النسخة تأخذ الجداول من الرئيسية عبر التماثل
+        return db != REPLICA
+
+
+def _wants_replica(request):
+    """الفحوص التي لا تحتاج قاعدة البيانات"""
+    return (
+        replica_enabled()
+        and request.method in SAFE_METHODS
+        and STICKY_COOKIE not in request.COOKIES
+    )
+
+
+def _pinned(alias, chunks):
+    """أجزاء رد متدفق مع بقاء القراءة على ``alias`` أثناء توليدها"""
+    chunks = iter(chunks)
+    while True:
+        token = _read_alias.set(alias)
+        try:
+            chunk = next(chunks, None)
+        finally:
+            _read_alias.reset(token)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def _apinned(alias, chunks):
+    chunks = aiter(chunks)
+    while True:
+        token = _read_alias.set(alias)
+        try:
+            chunk = await anext(chunks, None)
+        finally:
+            _read_alias.reset(token)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _pin_streaming(response, alias):
+    # التصدير يقرأ الملاحظات أثناء الإرسال بعد عودة العرض (PDF ملف جاهز فلا يحتاج)
+    if alias is not None and response.streaming and not isinstance(response, FileResponse):
+        if response.is_async:
+            response.streaming_content = _apinned(alias, response.streaming_content)
+        else:
+            response.streaming_content = _pinned(alias, response.streaming_content)
+    return response
+
+
+def read_from_replica(view):
+    """قراءة استعلامات العرض من النسخة المتماثلة إن وُجدت (لعروض القراءة فقط)"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            alias = None
+            if _wants_replica(request) and await sync_to_async(replica_health.available)():
+                alias = REPLICA
+            token = _read_alias.set(alias)
+            try:
+                response = await view(request, *args, **kwargs)
+            finally:
+                _read_alias.reset(token)
+            return _pin_streaming(response, alias)
+
+        return wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        alias = REPLICA if _wants_replica(request) and replica_health.available() else None
+        token = _read_alias.set(alias)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+        return _pin_streaming(response, alias)
+
+    return wrapper
+
+
+class ReplicaStickinessMiddleware:
+    """إبقاء قراءات المتصفح على الرئيسية لفترة قصيرة بعد كل طلب كتابة"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_enabled() or settings.DATABASE_REPLICA_STICKY_SECONDS <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.stick(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.stick(request, await self.get_response(request))
+
+    def stick(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                STICKY_COOKIE, '1',
+                max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -0,0 +1,209 @@
+"""
+البحث النصي الكامل في الملاحظات
+
+يُحفظ نص مُطبَّع (normalized) لكل ملاحظة في الحقل ``search_document`` عند الحفظ،
+ثم يُفهرس حسب قاعدة البيانات:
+
+- PostgreSQL: فهرس GIN على ``to_tsvector('simple', search_document)``
+- SQLite: جدول FTS5 باسم ``notes_note_fts`` يُحدَّث من ``Note.save`` والحذف
+- غير ذلك: بحث ``icontains`` على النص المُطبَّع
+"""
+
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+
+FTS_TABLE = 'notes_note_fts'
+SEARCH_CONFIG = 'simple'
+
+# علامات مؤقتة لتحديد موضع التمييز قبل الهروب من HTML
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+_SNIPPET_TOKENS = 16
+
+# التشكيل (الحركات والتنوين والشدة والسكون والألف الخنجرية) والتطويل
+_ARABIC_MARKS = re.compile('[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]')
+_ARABIC_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي',
+    'ة': 'ه',
+})
+_TERMS = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    """تطبيع النص للبحث: إزالة التشكيل والتطويل وتوحيد الألف والياء والتاء المربوطة"""
+    if not text:
+        return ''
+    text = _ARABIC_MARKS.sub('', text)
+    return text.translate(_ARABIC_LETTERS).casefold()
+
+
+def build_search_document(title, content_md):
+    """بناء النص المُطبَّع الذي يُفهرس للملاحظة"""
+    return normalize_text(f'{title or ""}\n{content_md or ""}')
+
+
+def search_terms(query):
+    """استخراج كلمات البحث المُطبَّعة من نص الاستعلام"""
+    return _TERMS.findall(normalize_text(query))
+
+
+def _vendor(using=DEFAULT_DB_ALIAS):
+    return connections[using].vendor
+
+
+# ===== Indexing =====
+
+def index_note(note):
+    """تحديث فهرس FTS5 لملاحظة واحدة (SQLite فقط)"""
+    index_notes([note])
+
+
+def index_notes(notes):
+    """تحديث فهرس FTS5 لمجموعة ملاحظات دفعة واحدة (SQLite فقط)"""
+    if not notes:
+        return
+    # الفهرس في نفس قاعدة كتابة الملاحظات
+    using = router.db_for_write(type(notes[0]), instance=notes[0])
+    if _vendor(using) != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [[note.pk] for note in notes])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, search_document) VALUES (%s, %s)',
+            [[note.pk, note.search_document] for note in notes],
+        )
+
+
+def unindex_note(note_id, using=DEFAULT_DB_ALIAS):
+    """حذف ملاحظة من فهرس FTS5 في قاعدة ``using`` (SQLite فقط)"""
+    if _vendor(using) != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [note_id])
+
+
+def rebuild_index(using=DEFAULT_DB_ALIAS):
+    """إعادة بناء فهرس FTS5 بالكامل من جدول الملاحظات (SQLite فقط)"""
+    if _vendor(using) != 'sqlite':
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, search_document) '
+            f'SELECT id, search_document FROM notes_note'
+        )
+
+
+# ===== Querying =====
+
+def _fts5_query(terms):
+    # كل كلمة بين علامتي تنصيص مع بحث بالبادئة، والكلمات مربوطة بـ AND ضمنياً
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _tsquery(terms):
+    return ' & '.join(f"'{term}':*" for term in terms)
+
+
+def search_notes(queryset, query):
+    """
+    تصفية الملاحظات حسب نص البحث مع إضافة ``search_rank`` (الأعلى أكثر صلة)
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none().annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    vendor = _vendor(queryset.db)
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        vector = SearchVector('search_document', config=SEARCH_CONFIG)
+        ts_query = SearchQuery(_tsquery(terms), config=SEARCH_CONFIG, search_type='raw')
+        return queryset.annotate(search_vector=vector).filter(
+            search_vector=ts_query
+        ).annotate(search_rank=SearchRank(F('search_vector'), ts_query))
+
+    if vendor == 'sqlite':
+        match = _fts5_query(terms)
+        matching_ids = RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+        )
+        # bm25 يعيد قيمة سالبة كلما زادت الصلة، لذا نعكس الإشارة
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = notes_note.id',
+            [match],
+            output_field=FloatField(),
+        )
+        return queryset.filter(id__in=matching_ids).annotate(search_rank=rank)
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(search_document__icontains=term)
+    return queryset.filter(condition).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    )
+
+
+def _highlight(raw):
+    html = escape(raw).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+def attach_snippets(notes, query):
+    """
+    إضافة مقتطف مُميَّز ``search_snippet`` لكل ملاحظة في الصفحة الحالية فقط
+
+    المقتطفات تُقرأ من نفس قاعدة البيانات التي قُرئت منها الملاحظات.
+    """
+    notes = list(notes)
+    terms = search_terms(query)
+    if not notes or not terms:
+        return notes
+
+    ids = [note.pk for note in notes]
+    snippets = {}
+    using = notes[0]._state.db or DEFAULT_DB_ALIAS
+    vendor = _vendor(using)
+
+    if vendor == 'sqlite':
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connections[using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({placeholders})',
+                [_MARK_START, _MARK_END, '…', _SNIPPET_TOKENS, _fts5_query(terms), *ids],
+            )
+            snippets = dict(cursor.fetchall())
+
+    elif vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchHeadline, SearchQuery
+        from .models import Note
+
+        ts_query = SearchQuery(_tsquery(terms), config=SEARCH_CONFIG, search_type='raw')
+        rows = Note.objects.using(using).filter(pk__in=ids).annotate(
+            snippet=SearchHeadline(
+                'search_document',
+                ts_query,
+                config=SEARCH_CONFIG,
+                start_sel=_MARK_START,
+                stop_sel=_MARK_END,
+                max_words=_SNIPPET_TOKENS * 2,
+                min_words=_SNIPPET_TOKENS // 2,
+            )
+        ).values_list('pk', 'snippet')
+        snippets = dict(rows)
+
+    for note in notes:
+        raw = snippets.get(note.pk)
+        note.search_snippet = _highlight(raw) if raw else ''
+    return notes
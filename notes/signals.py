@@ -0,0 +1,100 @@
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .fragments import fragment_cache
+from .models import Note, NoteVersion, UserStats, content_bytes
+from .pdf import remove_cached_pdfs
+from .public_cache import invalidate_page
+from .search import unindex_note
+
+
+@receiver(post_delete, sender=Note)
+def remove_note_from_search_index(sender, instance, using, **kwargs):
+    """حذف الملاحظة من فهرس البحث بعد حذفها"""
+    unindex_note(instance.pk, using)
+
+
+@receiver(post_delete, sender=Note)
+def remove_cached_pdfs_on_delete(sender, instance, **kwargs):
+    """حذف ملفات PDF المخزنة للملاحظة المحذوفة"""
+    remove_cached_pdfs(instance.pk)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_public_page(sender, instance, **kwargs):
+    """حذف الصفحة العامة المخزنة بعد تعديل الملاحظة أو حذفها"""
+    invalidate_page(instance.public_uuid)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_delete, sender=Note)
+def invalidate_fragments(sender, instance, **kwargs):
+    """حذف أجزاء القوالب المخزنة للملاحظة بعد تعديلها أو حذفها"""
+    fragment_cache.invalidate(instance.pk)
+
+
+@receiver(m2m_changed, sender=Note.tags.through)
+def invalidate_tags_on_change(sender, instance, action, **kwargs):
+    """
+    تحديث الصفحة العامة والأجزاء المخزنة وعدد الوسوم عند إضافة وسوم الملاحظة أو حذفها
+
+    تحديث ``UserStats`` يغيّر أيضاً مفتاح إحصاءات الوسوم المخزنة (``notes.facets``).
+    """
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Note):
+        invalidate_page(instance.public_uuid)
+        fragment_cache.invalidate(instance.pk)
+        UserStats.objects.refresh_tag_count(instance.owner_id)
+
+
+# ===== User statistics =====
+
+def _stat_value(field, value):
+    return content_bytes(value) if field == 'content_md' else int(value)
+
+
+@receiver(post_save, sender=Note)
+def update_stats_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """
+    إضافة فرق الملاحظة المحفوظة إلى إحصاءات مالكها
+
+    القيم السابقة من قراءة ``Note.save`` للصف قبل الحفظ (``_stats_before``).
+    """
+    before = getattr(instance, '_stats_before', None)
+    if not created and before is None:
+        return
+    fields = Note.STATS_FIELDS
+    saved = fields.keys() if update_fields is None else fields.keys() & set(update_fields)
+    deltas = {
+        fields[field]: _stat_value(field, getattr(instance, field)) - (before[field] if before else 0)
+        for field in saved
+    }
+    UserStats.objects.apply_delta(instance.owner_id, total_notes=int(created), **deltas)
+
+
+@receiver(post_delete, sender=Note)
+def update_stats_on_delete(sender, instance, origin=None, **kwargs):
+    """
+    طرح الملاحظة المحذوفة من إحصاءات مالكها (مع نسخها ووسومها)
+
+    لا شيء عند حذف المستخدم نفسه، لأن سجل إحصاءاته يُحذف أيضاً. الملاحظة
+    المحمّلة بدون بعض حقول الإحصاءات لا يمكن قراءتها بعد الحذف، فيُعاد حساب
+    إحصاءات المالك بالكامل.
+    """
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    if model is not Note:
+        return
+    if instance.get_deferred_fields() & Note.STATS_FIELDS.keys():
+        UserStats.objects.refresh(instance.owner_id)
+        return
+    UserStats.objects.remove_note(instance.owner_id, total_notes=1, **{
+        stat: _stat_value(field, getattr(instance, field)) for field, stat in Note.STATS_FIELDS.items()
+    })
+
+
+@receiver(post_save, sender=NoteVersion)
+def update_stats_on_version(sender, instance, created, **kwargs):
+    """زيادة عدد النسخ عند حفظ نسخة جديدة"""
+    if created:
+        UserStats.objects.apply_delta(instance.note.owner_id, version_count=1)
@@ -0,0 +1,83 @@
+"""
+تقديم الملفات الثابتة بـ WhiteNoise في وضعي WSGI و ASGI
+
+``WhiteNoiseMiddleware`` يعمل بشكل متزامن فقط، ووجوده في سلسلة ASGI يجعل
+Django يشغّل بقية السلسلة (والعرض غير المتزامن) من خيط محجوز طوال الطلب.
+هذا الوسيط يدعم الوضعين: يبحث عن الملف بنفس الطريقة، وفي ASGI يُقرأ الملف
+على دفعات في مجموعة الخيوط بدلاً من أن يجمعه Django كاملاً في الذاكرة.
+
+``ManifestStaticFilesStorage`` يضيف البصمة كالمعتاد، لكن الملف الغائب عن
+البصمات (لم يُرفع أو لم يُشغَّل collectstatic بعده) يُعرض رابطه بدون بصمة
+ويُسجَّل تحذير، بدلاً من ``ValueError`` يجعل كل صفحة تعيد 500.
+"""
+
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+logger = logging.getLogger(__name__)
+
+# حجم كل دفعة تُقرأ من الملف في وضع ASGI
+ASYNC_CHUNK_SIZE = 64 * 1024
+
+
+async def aiter_file(file, chunk_size=ASYNC_CHUNK_SIZE):
+    """قراءة ملف مفتوح على دفعات في مجموعة الخيوط (للردود المتدفقة في ASGI)"""
+    try:
+        while chunk := await sync_to_async(file.read, thread_sensitive=False)(chunk_size):
+            yield chunk
+    finally:
+        file.close()
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """``WhiteNoiseMiddleware`` مع دعم السلاسل غير المتزامنة"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    def find_static_file(self, request):
+        if self.autorefresh:
+            return self.find_file(request.path_info)
+        return self.files.get(request.path_info)
+
+    async def __acall__(self, request):
+        static_file = self.find_static_file(request)
+        if static_file is None:
+            return await self.get_response(request)
+        response = self.serve(static_file, request)
+        if response.file_to_stream is not None:
+            response.streaming_content = aiter_file(response.file_to_stream)
+        return response
+
+
+class ManifestStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """تخزين WhiteNoise المضغوط بالبصمات، مع روابط بدون بصمة للملفات الغائبة"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._missing = set()
+
+    def stored_name(self, name):
+        # collectstatic لا يمر من هنا، فتبقى الإشارات المفقودة داخل CSS خطأً عند الجمع
+        try:
+            return super().stored_name(name)
+        except ValueError as error:
+            if name not in self._missing:
+                self._missing.add(name)
+                logger.warning('Static file without a manifest entry: %s', error)
+            return name
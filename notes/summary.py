@@ -0,0 +1,31 @@
+"""
+ملخص الملاحظة المخزن لعرض القوائم: مقتطف نصي وعدد الكلمات ومدة القراءة
+"""
+
+import html
+import math
+import re
+
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+EXCERPT_LENGTH = 200
+WORDS_PER_MINUTE = 200
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def plain_text(content_html):
+    """تحويل HTML المعقم إلى نص عادي في سطر واحد"""
+    text = html.unescape(strip_tags(content_html or ''))
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def summarize(content_html):
+    """إرجاع (المقتطف، عدد الكلمات، مدة القراءة بالدقائق)"""
+    text = plain_text(content_html)
+    word_count = len(text.split())
+    reading_time = math.ceil(word_count / WORDS_PER_MINUTE)
+    excerpt = Truncator(text).chars(EXCERPT_LENGTH)
+    return excerpt, word_count, reading_time
@@ -0,0 +1,17 @@
+from django import template
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from notes.vendor import BUNDLES, bundle_available, bundle_path
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def vendor_bundle(name):
+    """وسم الحزمة المحلية ``static/vendor/<name>``، أو وسوم مصادرها من CDN إن لم توجد"""
+    urls = [static(bundle_path(name))] if bundle_available(name) else BUNDLES[name]
+    if name.endswith('.css'):
+        return format_html_join('\n', '<link rel="stylesheet" href="{}">', ((url,) for url in urls))
+    return format_html_join('\n', '<script src="{}"></script>', ((url,) for url in urls))
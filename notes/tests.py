@@ -1,3 +1,1918 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
+from urllib.parse import quote
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.http import Http404
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+
+from . import async_views, facets, importer, pdf, public_cache, summary, versioning, views
+from .autosave import PatchError, apply_patch
+from .blocks import split_blocks
+from .fragments import BODY, CARD, fragment_cache
+from .importer import NoteImporter
+from .management.commands.benchmark import make_markdown
+from .management.commands.benchmark_render import render_per_call
+from .models import ImportJob, Note, NoteQuerySet, NoteVersion, NoteVersionQuerySet, UserStats
+from .pagination import (
+    KEYSET_FIELDS, SORTS, InvalidCursor, decode_cursor, encode_cursor, paginate, resolve_ordering,
+)
+from .rendering import (
+    RENDER_CONFIG, RenderCache, RenderEngine, block_cache, content_key, render_cache, render_document,
+    render_incremental, render_many, render_markdown, render_uncached,
+)
+from .render_queue import RenderQueue
+from .routers import REPLICA, STICKY_COOKIE
+from .search import (
+    FTS_TABLE, attach_snippets, build_search_document, normalize_text, search_notes, search_terms,
+)
+from .summary import summarize
+from .vendor import BOOTSTRAP_CSS
+from .view_counter import ViewCounter, view_counter
+
+
+# الصفحات تُعرض بدون collectstatic (لا يوجد ملف البصمات): أسماء الملفات الثابتة كما هي
+PLAIN_STATIC_STORAGES = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+# ===== الملفات الثابتة =====
+
+@override_settings(DEBUG=False, DATABASE_REPLICA_READS=False)
+class ManifestStaticFilesTests(TestCase):
+    """الصفحات مع تخزين البصمات الفعلي بعد ``collectstatic``"""
+
+    def collect(self, files):
+        """جمع ملفات ``{path: content}`` (بدون ملفات admin) في مجلد مؤقت"""
+        source, root = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        for path, content in files.items():
+            target = Path(source.name) / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_text(content)
+        settings_override = override_settings(STATICFILES_DIRS=[source.name], STATIC_ROOT=root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('collectstatic', interactive=False, verbosity=0, ignore_patterns=['admin'])
+
+    def test_pages_render_before_vendor_bundles_exist(self):
+        self.collect({'css/style.css': 'body { color: black; }'})
+        with self.assertLogs('notes.static_files', 'WARNING'):
+            response = self.client.get(reverse('login'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        content = response.content.decode()
+        self.assertIn(BOOTSTRAP_CSS, content)
+        self.assertRegex(content, r'/static/css/style\.[0-9a-f]{12}\.css')
+        # ملف غير مجموع (enhanced.css): رابط بدون بصمة بدلاً من 500
+        self.assertIn('/static/css/enhanced.css', content)
+
+    def test_collected_bundles_replace_the_cdn(self):
+        self.collect({'vendor/base.css': 'body { margin: 0; }', 'vendor/base.js': 'var x = 1;'})
+        with self.assertLogs('notes.static_files', 'WARNING'):
+            content = self.client.get(reverse('login'), secure=True).content.decode()
+        self.assertRegex(content, r'/static/vendor/base\.[0-9a-f]{12}\.css')
+        self.assertRegex(content, r'/static/vendor/base\.[0-9a-f]{12}\.js')
+        self.assertNotIn(BOOTSTRAP_CSS, content)
+
+
+# ===== خطط الاستعلامات =====
+
+# المشاهدات تُكتب مباشرة حتى لا يبقى شيء معلق بعد حذف قاعدة الاختبار. النسخة
+# المتماثلة (إن حُددت) اتصال منفصل لا يرى بيانات معاملة TestCase
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=0, STORAGES=PLAIN_STATIC_STORAGES, DATABASE_REPLICA_READS=False)
+class QueryPlanTests(TestCase):
+    """
+    التأكد من أن استعلامات الصفحات الأكثر استخداماً تمر عبر الفهارس
+
+    تُلتقط الاستعلامات الفعلية للصفحات ثم يُطلب مخططها من قاعدة البيانات
+    (``EXPLAIN QUERY PLAN`` في SQLite و ``EXPLAIN`` في PostgreSQL مع تعطيل
+    المسح التسلسلي، فيظهر ``Seq Scan`` فقط عند غياب فهرس مناسب).
+    """
+
+    NOTE_TABLES = ('notes_note', 'notes_noteversion')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('reader', password='secret')
+        other = User.objects.create_user('other', password='secret')
+        Note.objects.bulk_create([
+            Note(
+                owner=cls.user if i % 3 else other,
+                title=f'ملاحظة {i}',
+                content_md=f'# عنوان {i}\n\nنص',
+                views=i % 17,
+                is_favorite=i % 7 == 0,
+                is_public=i % 11 == 0,
+            )
+            for i in range(600)
+        ])
+        cls.note = cls.user.notes.order_by('pk').first()
+        cls.public_note = cls.user.notes.filter(is_public=True).first()
+        NoteVersion.objects.bulk_create([
+            NoteVersion(note=note, content_md='نسخة')
+            for note in cls.user.notes.order_by('pk')[:20]
+            for _ in range(10)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def explain(self, sql):
+        """أسطر مخطط الاستعلام كنصوص"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                return [row[3] for row in cursor.fetchall()]
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+            return [row[0] for row in cursor.fetchall()]
+
+    def note_plans(self, url):
+        """مخططات استعلامات الصفحة التي تقرأ جداول الملاحظات"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if sql.startswith('SELECT') and any(f'FROM "{table}"' in sql for table in self.NOTE_TABLES):
+                plans.append((sql, self.explain(sql)))
+        self.assertTrue(plans, f'لا استعلامات ملاحظات في {url}')
+        return plans
+
+    def assertNoSequentialScan(self, url):
+        for sql, plan in self.note_plans(url):
+            for line in plan:
+                if connection.vendor == 'sqlite':
+                    self.assertFalse(
+                        line.startswith('SCAN notes_note') and 'INDEX' not in line,
+                        f'{line}\n{sql}',
+                    )
+                else:
+                    self.assertNotIn('Seq Scan on notes_note', line, sql)
+
+    def assertUsesIndex(self, url, index_name, sorted_by_index=True):
+        plans = self.note_plans(url)
+        plan = next((plan for sql, plan in plans if any(index_name in line for line in plan)), None)
+        self.assertIsNotNone(plan, f'{index_name} غير مستخدم في {url}:\n{plans}')
+        if sorted_by_index and connection.vendor == 'sqlite':
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+        elif sorted_by_index:
+            self.assertFalse(any(line.lstrip(' ->').startswith('Sort') for line in plan), plan)
+
+    def test_notes_list_sorts_use_owner_indexes(self):
+        url = reverse('notes_list')
+        sorts = {
+            'notes_note_owner_updated_idx': ['-updated_at', 'updated_at'],
+            'notes_note_owner_created_idx': ['-created_at', 'created_at'],
+            'notes_note_owner_title_idx': ['title', '-title'],
+            'notes_note_owner_views_idx': ['-views', 'views'],
+        }
+        for index_name, orderings in sorts.items():
+            for ordering in orderings:
+                with self.subTest(sort=ordering):
+                    self.assertUsesIndex(f'{url}?sort={ordering}', index_name)
+                    self.assertNoSequentialScan(f'{url}?sort={ordering}')
+
+    def test_notes_list_next_page_uses_index(self):
+        url = reverse('notes_list')
+        response = self.client.get(url, secure=True)
+        cursor = response.context['page_obj'].next_cursor
+        self.assertIsNotNone(cursor)
+        self.assertUsesIndex(f'{url}?cursor={cursor}', 'notes_note_owner_updated_idx')
+
+    def test_favorites_use_partial_index(self):
+        url = f'{reverse("notes_list")}?favorites=1'
+        self.assertUsesIndex(url, 'notes_note_favorite_idx')
+        # باقي الترتيبات تفرز مجموعة المفضلة الصغيرة فقط
+        self.assertUsesIndex(f'{url}&sort=title', 'notes_note_favorite_idx', sorted_by_index=False)
+
+    def test_note_detail_versions_use_index(self):
+        url = reverse('note_detail', args=[self.note.pk])
+        self.assertUsesIndex(url, 'notes_version_note_created_idx')
+        self.assertNoSequentialScan(url)
+
+    def test_public_note_has_no_sequential_scan(self):
+        self.client.logout()
+        self.assertNoSequentialScan(reverse('public_note', args=[self.public_note.public_uuid]))
+
+
+# ===== ملخص القوائم =====
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=0, STORAGES=PLAIN_STATIC_STORAGES, DATABASE_REPLICA_READS=False)
+class SummaryTests(TestCase):
+    """المقتطف وعدد الكلمات ومدة القراءة (``notes.summary``) وقوائم بدون المحتوى الكامل"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('summarizer', password='secret')
+
+    def test_markdown_is_stripped(self):
+        html = render_uncached('# عنوان\n\nنص **عريض** و [رابط](https://example.com)\n\n- عنصر\n\n`a < b`')
+        self.assertEqual(summarize(html), ('عنوان نص عريض و رابط عنصر a < b', 9, 1))
+
+    def test_long_text(self):
+        excerpt, word_count, reading_time = summarize(render_uncached('كلمة عربية ' * 250))
+        self.assertEqual((word_count, reading_time), (500, 3))
+        self.assertEqual(len(excerpt), summary.EXCERPT_LENGTH)
+        self.assertTrue(excerpt.endswith('…'))
+
+    def test_empty(self):
+        self.assertEqual(summarize(''), ('', 0, 0))
+        self.assertEqual(summarize(None), ('', 0, 0))
+
+    def test_stored_on_save(self):
+        note = Note.objects.create(owner=self.user, title='ملخص', content_md='مرحباً *بالعالم*')
+        self.assertEqual(
+            Note.objects.values_list('excerpt', 'word_count', 'reading_time').get(pk=note.pk),
+            ('مرحباً بالعالم', 2, 1),
+        )
+
+    def test_for_list_defers_content(self):
+        Note.objects.create(owner=self.user, title='قائمة', content_md='نص كامل لا يُقرأ في القائمة')
+        note = self.user.notes.for_list().get()
+        self.assertLessEqual({'content_md', 'content_html', 'search_document'}, note.get_deferred_fields())
+        self.assertEqual(note.excerpt, 'نص كامل لا يُقرأ في القائمة')
+
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('notes_list'), secure=True)
+        self.assertContains(response, 'نص كامل لا يُقرأ في القائمة')
+        for column in ('content_md', 'content_html', 'search_document'):
+            self.assertFalse(any(f'"notes_note"."{column}"' in query['sql'] for query in queries), column)
+
+
+# ===== محرك التحويل =====
+
+class RenderEngineTests(SimpleTestCase):
+    """
+    ``RenderEngine`` يعيد استخدام المحوّل والمعقِّم في كل خيط، ونتائجه و
+    ``render_many`` تطابق التحويل بمحوّل جديد لكل استدعاء
+    """
+
+    def test_tools_are_reused_per_thread(self):
+        engine = RenderEngine(RENDER_CONFIG)
+        tools = engine._tools()
+        engine.render('نص')
+        self.assertIs(engine._tools(), tools)
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(engine._tools()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0][0], tools[0])
+        self.assertIsNot(other[0][1], tools[1])
+
+    def test_reused_tools_keep_no_state_between_documents(self):
+        engine = RenderEngine(RENDER_CONFIG)
+        rng = random.Random(30)
+        for content_md in ['# Title\n\nنص', '# Title\n\nنص'] + [random_markdown(rng) for _ in range(200)]:
+            self.assertEqual(engine.render(content_md), render_per_call(content_md), repr(content_md))
+
+    def test_render_many_matches_render_document(self):
+        rng = random.Random(31)
+        contents = ['', 'نص **قصير**'] + [random_markdown(rng) for _ in range(50)]
+        expected = [render_document(content_md) for content_md in contents]
+        self.assertEqual(render_many(contents), expected)
+        self.assertEqual([html for html, *_ in expected[1:]], [render_per_call(content_md) for content_md in contents[1:]])
+
+        # دفعات متوازية في خيوط كما يفعل الاستيراد
+        chunks = [contents[i:i + 10] for i in range(0, len(contents), 10)]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            self.assertEqual([row for chunk in executor.map(render_many, chunks) for row in chunk], expected)
+
+
+# ===== ذاكرة التحويل =====
+
+class RenderCacheTests(SimpleTestCase):
+    """عدّادات ``RenderCache`` وإخراج الأقدم حسب عدد العناصر والحجم"""
+
+    def test_hits_and_misses(self):
+        render_cache = RenderCache(max_entries=2, max_chars=100)
+        self.assertIsNone(render_cache.get('a'))
+        render_cache.set('a', '<p>a</p>')
+        self.assertEqual(render_cache.get('a'), '<p>a</p>')
+        self.assertEqual(render_cache.get('a'), '<p>a</p>')
+        stats = render_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries'], stats['chars']), (2, 1, 1, 8))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+    def test_least_recently_used_is_evicted(self):
+        render_cache = RenderCache(max_entries=2, max_chars=100)
+        render_cache.set('a', 'A')
+        render_cache.set('b', 'B')
+        render_cache.get('a')
+        render_cache.set('c', 'C')
+        self.assertNotIn('b', render_cache)
+        self.assertEqual((render_cache.get('a'), render_cache.get('c')), ('A', 'C'))
+        self.assertEqual(render_cache.stats()['evictions'], 1)
+
+    def test_size_limit(self):
+        render_cache = RenderCache(max_entries=10, max_chars=10)
+        render_cache.set('a', 'x' * 6)
+        render_cache.set('b', 'y' * 6)
+        self.assertEqual((render_cache.get('a'), render_cache.get('b')), (None, 'y' * 6))
+        # نتيجة أكبر من الحد كله لا تُخزن ولا تُخرج غيرها
+        render_cache.set('c', 'z' * 11)
+        self.assertNotIn('c', render_cache)
+        self.assertIn('b', render_cache)
+        self.assertEqual(render_cache.stats()['chars'], 6)
+
+    def test_contains_does_not_count_or_reorder(self):
+        render_cache = RenderCache(max_entries=2, max_chars=100)
+        render_cache.set('a', 'A')
+        render_cache.set('b', 'B')
+        self.assertIn('a', render_cache)
+        self.assertNotIn('x', render_cache)
+        render_cache.set('c', 'C')
+        self.assertNotIn('a', render_cache)
+        stats = render_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 0))
+
+    @override_settings(RENDER_ASYNC=True, RENDER_ASYNC_THRESHOLD=10)
+    def test_deferred_check_is_not_a_miss(self):
+        fresh = RenderCache(max_entries=10, max_chars=10_000)
+        note = Note(title='كبيرة', content_md='نص طويل بما يكفي للتأجيل')
+        with mock.patch('notes.models.render_cache', fresh), mock.patch('notes.rendering.render_cache', fresh):
+            self.assertTrue(note.render_content(allow_deferred=True))
+            self.assertEqual(fresh.stats()['misses'], 0)
+            # النتيجة الموجودة في الذاكرة تُستخدم مباشرة بدل التأجيل
+            fresh.set(content_key(note.content_md), '<p>جاهز</p>')
+            self.assertFalse(note.render_content(allow_deferred=True))
+        self.assertEqual(note.content_html, '<p>جاهز</p>')
+        self.assertEqual(fresh.stats()['hits'], 1)
+
+
+# ===== التحويل التدريجي =====
+
+# أجزاء تُركَّب منها مستندات عشوائية: كل تركيب يغطي حالة حدّية في markdown2
+MARKDOWN_PIECES = [
+    '# عنوان', '## Title', 'Setext\n===', 'Setext\n---', 'para one\nline two', 'line  \nhard break',
+    '- a\n- b', '- a\n\n- b', '1. x\n2. y', '* star', '+ plus', '1) paren', '   - three spaces',
+    '- a\n  - nested\n    - deeper', '2. two\n\n   para in item', '- [ ] task\n- [x] done', '\t- tab item',
+    '- item\n\n  ```py\n  x = 1\n  ```', '- a\n\n\n\n  far para', '  two spaces',
+    '    indented code', '    code\n\n\n    more code', '```py\nx = 1\n\n\ny = 2\n```', '```\nunclosed',
+    '```js\nconsole.log(1)\n``` trailing', 'code ``` in middle', '```\n# not heading\n\n- not list\n```',
+    '~~~\ntilde\n~~~', '| a | b |\n|---|---|\n| 1 | 2 |', 'a | b\n--|--\n1 | 2',
+    '> quote\n> more', '> q', '> > nested quote', '> quote\n\n    code after quote',
+    '---', '***', '* * *', '[text][ref]', '[ref]: http://example.com', '<https://example.com>',
+    '[link](http://example.com)', '![img](a.png)', 'text with `<b>code</b>` span', '<div>raw</div>', '<!-- c -->',
+    '**bold** _u_ *em*', '***bold-it***', '\\*escaped\\*', '&amp; &copy; <', 'x < y > z', 'مرحبا بالعالم',
+]
+SEPARATORS = ['\n\n', '\n', '\n\n\n', '\r\n\r\n', '\n \n', '\n\t\n']
+
+
+def random_markdown(rng):
+    return ''.join(
+        rng.choice(MARKDOWN_PIECES) + rng.choice(SEPARATORS)
+        for _ in range(rng.randint(1, 12))
+    )
+
+
+@override_settings(RENDER_INCREMENTAL_MIN_BLOCKS=1)
+class IncrementalRenderTests(SimpleTestCase):
+    """
+    اختبارات فرقية: التحويل كتلة كتلة يجب أن يطابق التحويل الكامل حرفياً
+
+    المستندات التي يرفض ``split_blocks`` تقسيمها تُحوَّل كاملة فتطابق دائماً،
+    لذا يُتأكد أيضاً من أن معظم المجموعة تمر فعلاً بالتحويل التدريجي.
+    """
+
+    def setUp(self):
+        block_cache.clear()
+
+    def assertSameAsFullRender(self, content_md):
+        self.assertEqual(render_incremental(content_md), render_uncached(content_md), repr(content_md))
+
+    def test_random_documents(self):
+        rng = random.Random(20)
+        documents = [random_markdown(rng) for _ in range(800)]
+        for content_md in documents:
+            self.assertSameAsFullRender(content_md)
+        split = sum(split_blocks(content_md) is not None for content_md in documents)
+        self.assertGreater(split, len(documents) // 2)
+
+    def test_long_notes_and_edits(self):
+        rng = random.Random(21)
+        for blocks in (5, 40, 120):
+            content_md = make_markdown(rng, blocks)
+            self.assertIsNotNone(split_blocks(content_md))
+            self.assertSameAsFullRender(content_md)
+            # تعديلات صغيرة مع ذاكرة كتل دافئة: حرف، سطر فارغ، حذف كتلة، سور كود مفتوح
+            middle = len(content_md) // 2
+            for edited in (
+                content_md[:middle] + 'x' + content_md[middle:],
+                content_md[:middle] + '\n\n' + content_md[middle:],
+                content_md[:middle] + '\n\n```\n' + content_md[middle:],
+                '\n\n'.join(content_md.split('\n\n')[1:]),
+            ):
+                self.assertSameAsFullRender(edited)
+
+    def test_fenced_code_with_blank_lines_is_one_block(self):
+        content_md = 'قبل\n\n```py\nx = 1\n\n\ny = 2\n```\n\nبعد'
+        self.assertEqual(split_blocks(content_md), ['قبل', '```py\nx = 1\n\n\ny = 2\n```', 'بعد'])
+        self.assertSameAsFullRender(content_md)
+
+    def test_list_continuations_stay_with_their_list(self):
+        content_md = '- a\n\n  continued\n\n- b\n\nafter'
+        self.assertEqual(split_blocks(content_md), ['- a\n\n  continued\n\n- b', 'after'])
+        self.assertSameAsFullRender(content_md)
+
+    def test_document_wide_constructs_fall_back_to_full_render(self):
+        for content_md in (
+            'see [docs][1]\n\n[1]: https://example.com',
+            '<div>\n\nraw\n\n</div>',
+            '---\n\n- a\n  - nested\n\n  para',
+            '> q\n\n    code\n\nafter',
+        ):
+            self.assertIsNone(split_blocks(content_md))
+            self.assertSameAsFullRender(content_md)
+
+    def test_duplicate_headings_across_blocks(self):
+        # المعرّف الثاني يصبح title-2 في التحويل الكامل
+        content_md = '# Title\n\ntext\n\n# Title'
+        self.assertIsNotNone(split_blocks(content_md))
+        self.assertIn('id="title-2"', render_incremental(content_md))
+        self.assertSameAsFullRender(content_md)
+
+    def test_edit_renders_only_changed_blocks(self):
+        paragraphs = [f'فقرة رقم {i} مع **نص** و `code`.' for i in range(200)]
+        render_incremental('\n\n'.join(paragraphs))
+        misses = block_cache.stats()['misses']
+
+        paragraphs[100] += ' تعديل'
+        edited = '\n\n'.join(paragraphs)
+        self.assertEqual(render_incremental(edited), render_uncached(edited))
+        self.assertEqual(block_cache.stats()['misses'] - misses, 1)
+
+    @override_settings(RENDER_INCREMENTAL_MIN_BLOCKS=10)
+    def test_short_notes_render_whole(self):
+        render_incremental('one\n\ntwo')
+        self.assertEqual(block_cache.stats()['entries'], 0)
+
+
+# ===== التحويل في الخلفية =====
+
+@override_settings(RENDER_ASYNC=True, RENDER_ASYNC_THRESHOLD=1000, RENDER_WORKERS=1)
+class RenderQueueTests(TransactionTestCase):
+    """
+    تأجيل تحويل الملاحظات الكبيرة (``notes.render_queue``)
+
+    المهام تعمل في خيط بدل عملية منفصلة، وتنتظر ``release`` قبل التحويل
+    ليمكن فحص الحالة أثناءه.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('renderer', password='secret')
+        render_cache.clear()
+        self.queue = RenderQueue()
+        self.release = threading.Event()
+        patches = (
+            mock.patch('notes.models.render_queue', self.queue),
+            mock.patch(
+                'notes.render_queue.ProcessPoolExecutor',
+                lambda max_workers, mp_context: ThreadPoolExecutor(max_workers),
+            ),
+            mock.patch('notes.render_queue.render_incremental', self.blocked_render),
+        )
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.release.set)
+
+    def blocked_render(self, content_md):
+        self.release.wait(timeout=10)
+        return render_incremental(content_md)
+
+    def finish(self):
+        self.release.set()
+        self.queue._executor.shutdown(wait=True)
+
+    def test_large_save_is_deferred(self):
+        note = Note.objects.create(owner=self.user, title='كبيرة', content_md='نص قصير')
+        large = '\n\n'.join(f'فقرة {i} طويلة بما يكفي.' for i in range(100))
+        note.content_md = large
+        note.save()
+
+        saved = Note.objects.get(pk=note.pk)
+        self.assertTrue(saved.html_stale)
+        self.assertEqual(saved.content_html, render_uncached('نص قصير'))
+        self.assertTrue(self.queue.is_pending(note.pk))
+
+        self.finish()
+        saved = Note.objects.get(pk=note.pk)
+        self.assertFalse(saved.html_stale)
+        self.assertEqual(saved.content_html, render_uncached(large))
+        self.assertEqual(saved.word_count, summarize(saved.content_html)[1])
+        self.assertFalse(self.queue.is_pending(note.pk))
+        self.assertEqual((self.queue.stats()['completed'], self.queue.stats()['failed']), (1, 0))
+
+    def test_stale_result_is_dropped(self):
+        large = '\n\n'.join(f'فقرة {i} طويلة بما يكفي.' for i in range(100))
+        note = Note.objects.create(owner=self.user, title='كبيرة', content_md=large)
+        self.assertTrue(self.queue.is_pending(note.pk))
+        # تعديل أثناء التحويل: يُحوَّل فوراً لأنه صغير ويزيد المراجعة
+        note.content_md = 'نص جديد'
+        note.save()
+
+        self.finish()
+        saved = Note.objects.get(pk=note.pk)
+        self.assertEqual(saved.content_html, render_uncached('نص جديد'))
+        self.assertFalse(saved.html_stale)
+        self.assertEqual(saved.revision, note.revision)
+        self.assertFalse(self.queue.is_pending(note.pk))
+
+
+# ===== المعاينة من الخادم =====
+
+@override_settings(RENDER_INCREMENTAL_MIN_BLOCKS=1)
+class PreviewTests(TestCase):
+    """بروتوكول المعاينة (``notes.preview``): نص الجلسة، التعديلات، والكتل الناقصة فقط"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('writer', password='secret')
+
+    def setUp(self):
+        cache.clear()
+        block_cache.clear()
+        self.client.force_login(self.user)
+
+    def preview(self, **data):
+        return self.client.post(
+            reverse('note_preview'), json.dumps(data), content_type='application/json', secure=True,
+        )
+
+    def test_joined_blocks_match_full_render(self):
+        content_md = make_markdown(random.Random(3), 25)
+        data = self.preview(note=1, content_md=content_md).json()
+        self.assertEqual(data['seq'], 1)
+        self.assertEqual(set(data['html']), set(data['blocks']))
+        joined = '\n'.join(data['html'][block_id] for block_id in data['blocks'])
+        self.assertEqual(joined, render_markdown(content_md))
+
+    def test_only_unseen_blocks_are_returned(self):
+        content_md = '# عنوان\n\nفقرة أولى\n\nفقرة ثانية\n'
+        first = self.preview(note=1, content_md=content_md).json()
+        position = len(content_md.encode('utf-16-le')) // 2
+        second = self.preview(
+            note=1, seq=first['seq'], patch=[[position, position, '\nفقرة ثالثة\n']], have=first['blocks'],
+        ).json()
+        self.assertEqual(second['seq'], 2)
+        self.assertEqual(second['blocks'][:3], first['blocks'])
+        new_blocks = [block_id for block_id in second['blocks'] if block_id not in first['blocks']]
+        self.assertEqual(list(second['html']), new_blocks)
+        self.assertIn('فقرة ثالثة', second['html'][new_blocks[0]])
+
+    def test_out_of_sync_patch_asks_for_resync(self):
+        response = self.preview(note=1, seq=1, patch=[[0, 0, 'x']])
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(response.json()['resync'])
+
+        self.preview(note=1, content_md='نص')
+        self.assertEqual(self.preview(note=1, seq=5, patch=[[0, 0, 'x']]).status_code, 409)
+
+    def test_each_note_has_its_own_state(self):
+        self.preview(note=1, content_md='الأولى')
+        self.preview(note=2, content_md='الثانية')
+        self.preview(note=2, seq=1, patch=[[0, 0, 'x']])
+
+        first = self.preview(note=1, seq=1, patch=[[0, 0, 'تعديل ']]).json()
+        self.assertEqual(first['seq'], 2)
+        self.assertIn('تعديل الأولى', ''.join(first['html'].values()))
+        self.assertEqual(self.preview(content_md='جديدة').json()['seq'], 1)
+
+    def test_invalid_patch_is_a_bad_request(self):
+        self.preview(note=1, content_md='نص')
+        for patch in (5, 'نص', [[0, 9, 'x']], [[0, 'a', 'x']]):
+            with self.subTest(patch=patch):
+                response = self.preview(note=1, seq=1, patch=patch)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+
+
+# ===== وضع ASGI =====
+
+# رمز CSRF عشوائي لكل طلب، وعدد المشاهدات يزيد مع كل طلب
+VOLATILE_RE = re.compile(r'name="csrfmiddlewaretoken" value="[^"]*"|\d+ مشاهدة')
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=0, STORAGES=PLAIN_STATIC_STORAGES, DATABASE_REPLICA_READS=False)
+class AsyncViewTests(TestCase):
+    """النسخ غير المتزامنة (``async_views``) تعيد نفس ردود النسخ المتزامنة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('writer', password='secret')
+        for i in range(15):
+            note = Note.objects.create(
+                owner=cls.user, title=f'ملاحظة {i}', content_md=f'# عنوان {i}\n\nنص **مهم**',
+                is_public=i == 0,
+            )
+            note.tags.set(['async', f'tag-{i % 3}'])
+        cls.note = cls.user.notes.order_by('pk').first()
+
+    def setUp(self):
+        pdf_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(pdf_dir.cleanup)
+        settings_override = override_settings(PDF_CACHE_DIR=pdf_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def sync_request(self, path, method='get', user=None, **kwargs):
+        request = getattr(RequestFactory(), method)(path, **kwargs)
+        request.user = user or self.user
+        return request
+
+    def async_request(self, path, method='get', user=None, **kwargs):
+        request = getattr(AsyncRequestFactory(), method)(path, **kwargs)
+        user = user or self.user
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        return request
+
+    async def content(self, response):
+        if not response.streaming:
+            return response.content
+        return b''.join([chunk async for chunk in response])
+
+    async def assertSameResponse(self, name, path, *args, **kwargs):
+        sync_response = await sync_to_async(getattr(views, name))(self.sync_request(path, **kwargs), *args)
+        async_response = await getattr(async_views, name)(self.async_request(path, **kwargs), *args)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        sync_content = await sync_to_async(lambda: b''.join(sync_response))()
+        async_content = await self.content(async_response)
+        self.assertEqual(
+            VOLATILE_RE.sub('', async_content.decode('utf-8', 'replace')),
+            VOLATILE_RE.sub('', sync_content.decode('utf-8', 'replace')),
+        )
+        for header in ('Content-Type', 'Content-Disposition'):
+            self.assertEqual(async_response.get(header), sync_response.get(header))
+        return async_response
+
+    async def test_read_views_match_sync_views(self):
+        pk = self.note.pk
+        await self.assertSameResponse('notes_list_view', '/notes/')
+        await self.assertSameResponse('notes_list_view', '/notes/', data={'tag': 'tag-1', 'sort': 'title'})
+        await self.assertSameResponse('notes_list_view', '/notes/', data={'search': 'ملاحظة'})
+        await self.assertSameResponse('note_detail_view', f'/note/{pk}/', pk)
+        await self.assertSameResponse('export_markdown_view', f'/note/{pk}/export/markdown/', pk)
+        await self.assertSameResponse('export_pdf_view', f'/note/{pk}/export/pdf/', pk)
+        await self.assertSameResponse('export_all_view', '/notes/export/', data={'versions': '1'})
+
+    async def test_export_filenames_are_encoded(self):
+        user = await User.objects.acreate(username='مستخدم')
+        note = await Note.objects.acreate(owner=user, title='خطة "الربع" الأول', content_md='نص')
+        response = await self.assertSameResponse(
+            'export_markdown_view', f'/note/{note.pk}/export/markdown/', note.pk, user=user,
+        )
+        self.assertEqual(response['Content-Disposition'], content_disposition_header(True, f'{note.title}.md'))
+        self.assertIn("filename*=utf-8''", response['Content-Disposition'])
+
+        response = await self.assertSameResponse('export_all_view', '/notes/export/', user=user)
+        filename = f'notes-مستخدم-{timezone.localdate():%Y-%m-%d}.zip'
+        self.assertEqual(
+            response['Content-Disposition'],
+            f"attachment; filename*=utf-8''{quote(filename)}",
+        )
+
+    async def test_other_users_notes_are_not_found(self):
+        stranger = await User.objects.acreate(username='stranger')
+        request = self.async_request(f'/note/{self.note.pk}/', user=stranger)
+        with self.assertRaises(Http404):
+            await async_views.note_detail_view(request, self.note.pk)
+
+    async def test_public_note_is_cached_and_conditional(self):
+        path = f'/share/{self.note.public_uuid}/'
+        response = await async_views.public_note_view(self.async_request(path), self.note.public_uuid)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('<strong>مهم</strong>', response.content.decode())
+
+        request = self.async_request(path, headers={'If-None-Match': response['ETag']})
+        cached = await async_views.public_note_view(request, self.note.public_uuid)
+        self.assertEqual(cached.status_code, 304)
+        await self.note.arefresh_from_db()
+        self.assertEqual(self.note.views, 2)
+
+    async def test_autosave(self):
+        path = f'/note/{self.note.pk}/autosave/'
+        payload = {'revision': self.note.revision, 'patch': [[0, 0, 'بداية ']]}
+        request = self.async_request(path, 'post', data=json.dumps(payload), content_type='application/json')
+        response = await async_views.autosave_view(request, self.note.pk)
+        data = json.loads(response.content)
+        self.assertTrue(data['success'])
+
+        await self.note.arefresh_from_db()
+        self.assertEqual(self.note.revision, data['revision'])
+        self.assertTrue(self.note.content_md.startswith('بداية # عنوان'))
+
+        # نفس الرقم القديم مرة أخرى: تعارض
+        request = self.async_request(path, 'post', data=json.dumps(payload), content_type='application/json')
+        response = await async_views.autosave_view(request, self.note.pk)
+        self.assertEqual(response.status_code, 409)
+
+
+# ===== الصفحات العامة =====
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=0, STORAGES=PLAIN_STATIC_STORAGES, DATABASE_REPLICA_READS=False)
+class PublicPageCacheTests(TestCase):
+    """
+    ذاكرة الصفحات العامة في ``notes.public_cache``
+
+    العامل الآخر (ذاكرة locmem لكل عملية) يُحاكى بإعادة الصفحة المخزنة إلى
+    الذاكرة بعد أن حذفها التعديل.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sharer', password='secret')
+        cls.note = Note.objects.create(owner=cls.user, title='عامة', content_md='نص **منشور**', is_public=True)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('public_note', args=[self.note.public_uuid])
+        self.key = f'notes:public-page:{self.note.public_uuid}'
+
+    def get(self):
+        return self.client.get(self.url, secure=True)
+
+    def cache_page(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        page = cache.get(self.key)
+        self.assertEqual(page['revision'], self.note.revision)
+        return page
+
+    def test_cached_page_is_served_without_rendering(self):
+        self.cache_page()
+        with self.assertTemplateNotUsed('notes/public_note.html'):
+            response = self.get()
+        self.assertContains(response, '<strong>منشور</strong>')
+
+    def test_unshared_note_is_not_served_from_another_worker(self):
+        page = self.cache_page()
+        self.note.is_public = False
+        self.note.save(update_fields=['is_public'])
+        self.assertIsNone(cache.get(self.key))
+        cache.set(self.key, page)
+        self.assertEqual(self.get().status_code, 404)
+        self.assertIsNone(cache.get(self.key))
+
+    def test_deleted_note_is_not_served_from_another_worker(self):
+        page = self.cache_page()
+        Note.objects.get(pk=self.note.pk).delete()
+        cache.set(self.key, page)
+        self.assertEqual(self.get().status_code, 404)
+
+    def test_new_revision_rebuilds_the_page(self):
+        page = self.cache_page()
+        note = Note.objects.get(pk=self.note.pk)
+        note.content_md = 'نص **معدّل**'
+        note.save()
+        cache.set(self.key, page)
+        response = self.get()
+        self.assertContains(response, '<strong>معدّل</strong>')
+        self.assertNotEqual(response['ETag'], page['etag'])
+        self.assertEqual(cache.get(self.key)['revision'], note.revision)
+
+
+# ===== ذاكرة الأجزاء =====
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=0, STORAGES=PLAIN_STATIC_STORAGES, DATABASE_REPLICA_READS=False)
+class FragmentCacheTests(TestCase):
+    """بطاقات القائمة ومحتوى التفاصيل من ``notes.fragments`` مع إبطال دقيق"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('writer', password='secret')
+        for i in range(5):
+            note = Note.objects.create(owner=cls.user, title=f'ملاحظة {i}', content_md=f'نص **{i}**')
+            note.tags.set([f'tag-{i}'])
+        cls.notes = list(cls.user.notes.order_by('pk'))
+
+    def setUp(self):
+        fragment_cache.clear()
+        self.client.force_login(self.user)
+
+    def get(self, url, **kwargs):
+        response = self.client.get(url, secure=True, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def lookups(self, kind):
+        stats = fragment_cache.stats()[kind]
+        return stats['hits'], stats['misses']
+
+    def cached_ids(self, kind):
+        keys = {f'notes:fragment:{kind}:{note.pk}': note.pk for note in self.notes}
+        return {keys[key] for key in fragment_cache.cache.get_many(list(keys))}
+
+    def test_list_cards_are_rendered_once(self):
+        hits, misses = self.lookups(CARD)
+        first = self.get(reverse('notes_list'))
+        second = self.get(reverse('notes_list'))
+        self.assertEqual(VOLATILE_RE.sub('', first), VOLATILE_RE.sub('', second))
+        self.assertEqual(self.lookups(CARD), (hits + 5, misses + 5))
+        self.assertEqual(self.cached_ids(CARD), {note.pk for note in self.notes})
+
+    def test_save_tags_and_delete_invalidate_only_their_note(self):
+        self.get(reverse('notes_list'))
+        edited, retagged, deleted, *untouched = self.notes
+
+        edited.title = 'عنوان جديد'
+        edited.save()
+        retagged.tags.add('وسم-جديد')
+        Note.objects.get(pk=deleted.pk).delete()
+        self.assertEqual(self.cached_ids(CARD), {note.pk for note in untouched})
+
+        content = self.get(reverse('notes_list'))
+        self.assertIn('عنوان جديد', content)
+        self.assertIn('وسم-جديد', content)
+        self.assertNotIn(f'data-note-id="{deleted.pk}"', content)
+
+    def test_changes_without_signals_are_not_served_stale(self):
+        note = self.notes[0]
+        self.get(reverse('notes_list'))
+        # تحديثات QuerySet.update لا ترسل إشارات: نسخة الجزء تتغير فيُعاد بناؤه
+        Note.objects.filter(pk=note.pk).update(is_favorite=True, views=42)
+        content = self.get(reverse('notes_list'))
+        card = content[content.index(f'data-note-id="{note.pk}"'):]
+        self.assertIn('favorite-star active', card[:card.index('card-footer')])
+        self.assertIn('</i> 42', card[:card.index('card-footer')])
+
+    def test_search_cards_are_not_cached(self):
+        hits, misses = self.lookups(CARD)
+        self.assertIn('<mark>', self.get(reverse('notes_list'), data={'search': 'ملاحظة'}))
+        self.assertEqual(self.lookups(CARD), (hits, misses))
+        self.assertEqual(self.cached_ids(CARD), set())
+
+    def test_detail_body_is_cached_outside_the_view_count(self):
+        note = self.notes[0]
+        url = reverse('note_detail', args=[note.pk])
+        hits, misses = self.lookups(BODY)
+        self.assertIn('1 مشاهدة', self.get(url))
+        content = self.get(url)
+        self.assertIn('2 مشاهدة', content)
+        self.assertIn('<strong>0</strong>', content)
+        self.assertEqual(self.lookups(BODY), (hits + 1, misses + 1))
+
+        note.tags.add('تفاصيل')
+        self.assertIn('تفاصيل', self.get(url))
+        self.assertEqual(self.lookups(BODY), (hits + 1, misses + 2))
+
+
+# ===== البحث =====
+
+class SearchTests(TestCase):
+    """التطبيع العربي وفهرس FTS5 والترتيب والمقتطفات في ``notes.search``"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('searcher', password='secret')
+
+    def note(self, title, content_md=''):
+        return Note.objects.create(owner=self.user, title=title, content_md=content_md)
+
+    def search(self, query):
+        results = search_notes(self.user.notes.all(), query).order_by('-search_rank', 'pk')
+        return list(results)
+
+    def fts_rows(self, note_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT search_document FROM {FTS_TABLE} WHERE rowid = %s', [note_id])
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_normalize_text(self):
+        self.assertEqual(normalize_text('مُحَمَّدٌ'), 'محمد')
+        self.assertEqual(normalize_text('مـــكـتـبـة'), 'مكتبه')
+        self.assertEqual(normalize_text('أحمد إسلام آمال ٱلكتاب'), 'احمد اسلام امال الكتاب')
+        self.assertEqual(normalize_text('مستشفى مدرسة'), 'مستشفي مدرسه')
+        self.assertEqual(normalize_text('Straße HELLO'), 'strasse hello')
+        self.assertEqual(search_terms('  القُرْآن، والـسنة! '), ['القران', 'والسنه'])
+
+    def test_matches_ignore_arabic_variants(self):
+        note = self.note('مكتبة الإسكندرية', 'زيارة إلى المَكْتَبَةِ')
+        for query in ('مكتبه', 'المكتبة', 'الاسكندريه', 'الإسكَندريّة', 'زياره مكتب'):
+            self.assertEqual(self.search(query), [note], query)
+        self.assertEqual(self.search('القاهرة'), [])
+        self.assertEqual(self.search('!!'), [])
+
+    @skipUnless(connection.vendor == 'sqlite', 'ترتيب bm25 في FTS5')
+    def test_ranking_prefers_more_relevant_notes(self):
+        once = self.note('ملاحظة', 'بايثون مرة واحدة بين كلام كثير عن أشياء أخرى مختلفة تماماً')
+        often = self.note('بايثون', 'بايثون بايثون بايثون')
+        self.note('جافا', 'لا علاقة')
+        results = self.search('بايثون')
+        self.assertEqual(results, [often, once])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    @skipUnless(connection.vendor == 'sqlite', 'مقتطفات FTS5')
+    def test_snippets_highlight_terms_and_escape_html(self):
+        note = self.note('أمان', 'نص <script>alert(1)</script> عن الحماية من الهجمات')
+        [result] = attach_snippets(self.search('الحمايه'), 'الحمايه')
+        self.assertIn('<mark>الحمايه</mark>', result.search_snippet)
+        self.assertIn('&lt;script&gt;', result.search_snippet)
+        self.assertNotIn('<script>', result.search_snippet)
+        self.assertEqual(result.pk, note.pk)
+
+    @skipUnless(connection.vendor == 'sqlite', 'فهرس FTS5')
+    def test_index_follows_save_and_delete(self):
+        note = self.note('قديم', 'محتوى أول')
+        self.assertEqual(self.fts_rows(note.pk), [note.search_document])
+
+        note.content_md = 'محتوى ثانٍ مختلف'
+        note.save()
+        self.assertEqual(self.fts_rows(note.pk), [build_search_document('قديم', 'محتوى ثانٍ مختلف')])
+        self.assertEqual(self.search('اول'), [])
+        self.assertEqual(self.search('مختلف'), [note])
+
+        note.autosave('جديد', 'نص الحفظ التلقائي')
+        self.assertEqual(self.search('التلقائي'), [note])
+
+        note_id = note.pk
+        note.delete()
+        self.assertEqual(self.fts_rows(note_id), [])
+        self.assertEqual(self.search('جديد'), [])
+
+
+# ===== الحفظ التلقائي =====
+
+class ApplyPatchTests(SimpleTestCase):
+    """مواضع التعديلات بوحدات UTF-16 كما في JavaScript"""
+
+    def test_offsets_count_emoji_as_two_units(self):
+        text = 'أ😀ب'
+        self.assertEqual(apply_patch(text, [[3, 4, 'ج']]), 'أ😀ج')
+        self.assertEqual(apply_patch(text, [[1, 3, '']]), 'أب')
+        self.assertEqual(apply_patch(text, [[3, 3, '👍🏽'], [7, 7, '!']]), 'أ😀👍🏽!ب')
+        self.assertEqual(apply_patch('', [[0, 0, 'نص']]), 'نص')
+
+    def test_patch_cannot_split_a_surrogate_pair(self):
+        for ops in ([[2, 2, 'x']], [[1, 2, '']], [[2, 4, 'x']]):
+            with self.assertRaises(PatchError, msg=ops):
+                apply_patch('أ😀ب', ops)
+
+    def test_invalid_patches(self):
+        for ops in (5, 'patch', {'0': 1}, [[0, 1]], [[0, '1', 'x']], [[1, 0, '']], [[0, 9, '']], [[-1, 0, '']], [None]):
+            with self.assertRaises(PatchError, msg=ops):
+                apply_patch('نص', ops)
+
+
+@override_settings(AUTOSAVE_RENDER_INTERVAL=3600)
+class AutosaveTests(TestCase):
+    """الحفظ التلقائي بالمراجعة والتعديلات في ``views.save_autosave``"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('autosaver', password='secret')
+
+    def setUp(self):
+        self.note = Note.objects.create(owner=self.user, title='مسودة', content_md='مرحبا 😀 بالعالم')
+        self.client.force_login(self.user)
+
+    def post(self, data):
+        return self.client.post(
+            reverse('autosave', args=[self.note.pk]), json.dumps(data),
+            content_type='application/json', secure=True,
+        )
+
+    def test_patch_against_current_revision(self):
+        revision = self.note.revision
+        response = self.post({'revision': revision, 'patch': [[9, 9, 'الجميل ']]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['revision'], revision + 1)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content_md, 'مرحبا 😀 الجميل بالعالم')
+        self.assertTrue(self.note.html_stale)
+
+    def test_stale_revision_conflicts(self):
+        revision = self.note.revision
+        self.note.content_md = 'تعديل من نافذة أخرى'
+        self.note.save()
+        response = self.post({'revision': revision, 'patch': [[0, 5, 'أهلاً']]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {
+            'success': False,
+            'conflict': True,
+            'error': 'تم تعديل الملاحظة من مكان آخر',
+            'revision': revision + 1,
+            'title': 'مسودة',
+            'content_md': 'تعديل من نافذة أخرى',
+        })
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content_md, 'تعديل من نافذة أخرى')
+
+    def test_split_surrogate_is_rejected(self):
+        response = self.post({'revision': self.note.revision, 'patch': [[7, 7, 'x']]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Note.objects.get(pk=self.note.pk).content_md, 'مرحبا 😀 بالعالم')
+
+    def test_unchanged_requests(self):
+        with self.assertNumQueries(0):
+            data, response = views.parse_autosave(json.dumps({'revision': 7}).encode())
+        self.assertIsNone(data)
+        self.assertEqual(json.loads(response.content), {'success': True, 'unchanged': True, 'revision': 7})
+
+        # تعديل لا يغير المحتوى: لا حفظ ولا مراجعة جديدة
+        revision = self.note.revision
+        response = self.post({'revision': revision, 'patch': [[0, 5, 'مرحبا']]})
+        self.assertEqual(response.json(), {'success': True, 'unchanged': True, 'revision': revision})
+        self.assertEqual(Note.objects.get(pk=self.note.pk).revision, revision)
+
+    def test_full_content_without_revision(self):
+        response = self.post({'title': 'عنوان', 'content_md': 'محتوى كامل'})
+        self.assertEqual(response.status_code, 200)
+        self.note.refresh_from_db()
+        self.assertEqual((self.note.title, self.note.content_md), ('عنوان', 'محتوى كامل'))
+
+
+# ===== سجل النسخ =====
+
+@override_settings(NOTE_VERSION_KEYFRAME_INTERVAL=3)
+class VersioningTests(TestCase):
+    """سلاسل الإطارات المفتاحية والفروقات في ``notes.versioning``"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('historian', password='secret')
+
+    def contents(self, count):
+        lines = [f'سطر {i}: نص عربي طويل بما يكفي ليكون الفرق أصغر من النص الكامل 📝\n' for i in range(40)]
+        contents = []
+        for i in range(count):
+            lines[i % len(lines)] = f'سطر معدّل في النسخة {i}\n'
+            contents.append(''.join(lines))
+        return contents
+
+    def make_history(self, contents):
+        note = Note.objects.create(owner=self.user, title='تاريخ', content_md=contents[0])
+        for content in contents[1:]:
+            note.content_md = content
+            note.save()
+        return note, list(note.versions.order_by('pk'))
+
+    def test_chain_round_trip_across_keyframes(self):
+        contents = self.contents(9)
+        note, versions = self.make_history(contents)
+        self.assertEqual(len(versions), 8)
+        self.assertEqual(
+            [version.encoding for version in versions],
+            ['full', 'delta', 'delta', 'full', 'delta', 'delta', 'full', 'delta'],
+        )
+        for version, content in zip(versions, contents):
+            chain = list(NoteVersion.objects.chain_for(version))
+            self.assertIn(chain[0].encoding, versioning.KEYFRAME_ENCODINGS)
+            self.assertEqual(versioning.decode_chain(chain), content)
+            self.assertEqual(NoteVersion.objects.get(pk=version.pk).get_content(), content)
+        restored = [content for _, content in versioning.iter_contents(note.versions.order_by('pk'))]
+        self.assertEqual(restored, contents[:-1])
+
+    def test_corrupt_delta_fails_hash_check(self):
+        _, versions = self.make_history(self.contents(3))
+        NoteVersion.objects.filter(pk=versions[1].pk).update(content_hash=versioning.content_hash('آخر'))
+        with self.assertRaises(ValueError):
+            NoteVersion.objects.get(pk=versions[1].pk).get_content()
+        # التصدير يستعيد النسخ بـ ``iter_contents`` ويتحقق من البصمة أيضاً
+        with self.assertRaises(ValueError):
+            list(versioning.iter_contents(NoteVersion.objects.filter(note_id=versions[1].note_id).order_by('pk')))
+
+    def test_snapshot_locks_note_before_reading_chain(self):
+        note, _ = self.make_history(self.contents(2))
+        calls = []
+        select_for_update = NoteQuerySet.select_for_update
+        chain_for = NoteVersionQuerySet.chain_for
+
+        def lock(queryset, *args, **kwargs):
+            calls.append('lock')
+            return select_for_update(queryset, *args, **kwargs)
+
+        def read_chain(queryset, version):
+            calls.append('chain')
+            return chain_for(queryset, version)
+
+        with mock.patch.object(NoteQuerySet, 'select_for_update', lock), \
+                mock.patch.object(NoteVersionQuerySet, 'chain_for', read_chain):
+            note.content_md = self.contents(3)[-1]
+            note.save()
+        self.assertEqual(calls, ['lock', 'chain'])
+
+    def test_compact_versions_keeps_every_content(self):
+        contents = self.contents(8)
+        note = Note.objects.create(owner=self.user, title='قديمة', content_md=contents[-1])
+        # نسخ بالصيغة القديمة (نص كامل) كما كانت قبل الضغط
+        for content in contents[:-1]:
+            NoteVersion.objects.create(note=note, content_md=content, **NoteVersion.metadata_for(content))
+
+        call_command('compact_versions', stdout=StringIO())
+        versions = list(note.versions.order_by('pk'))
+        self.assertNotIn(versioning.ENCODING_RAW, {version.encoding for version in versions})
+        self.assertIn(versioning.ENCODING_DELTA, {version.encoding for version in versions})
+        self.assertEqual([version.content_md for version in versions], [''] * len(versions))
+        self.assertEqual([version.get_content() for version in versions], contents[:-1])
+
+        # الضغط مرة ثانية لا يغير المحتوى
+        call_command('compact_versions', note=[note.pk], stdout=StringIO())
+        self.assertEqual([version.get_content() for version in note.versions.order_by('pk')], contents[:-1])
+
+    def test_migration_backfills_metadata(self):
+        migration = import_module('notes.migrations.0005_noteversion_delta_storage')
+        note = Note.objects.create(owner=self.user, title='ترحيل')
+        content = 'نص قديم 😀 ' * 20
+        version = NoteVersion.objects.create(note=note, content_md=content)
+        self.assertEqual((version.size, version.content_hash), (0, ''))
+
+        migration.populate_metadata(django_apps, None)
+        version.refresh_from_db()
+        self.assertEqual(
+            {field: getattr(version, field) for field in ('size', 'content_hash', 'summary')},
+            NoteVersion.metadata_for(content),
+        )
+        self.assertEqual(version.get_content(), content)
+
+
+# ===== تصدير PDF =====
+
+class PdfCacheTests(TestCase):
+    """ذاكرة PDF على القرص (``notes.pdf``): بصمة العنوان والمحتوى وحذف النسخ القديمة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('printer', password='secret')
+
+    def setUp(self):
+        pdf_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(pdf_dir.cleanup)
+        settings_override = override_settings(PDF_CACHE_DIR=pdf_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.note = Note.objects.create(owner=self.user, title='للطباعة', content_md='سطر أول\n\nسطر ثان')
+
+    def read_pdf(self, note):
+        with pdf.open_pdf(note) as pdf_file:
+            return Path(pdf_file.name).name, pdf_file.read()
+
+    def cached_files(self):
+        return sorted(os.listdir(pdf._note_dir(self.note.pk)))
+
+    def test_cache_hit_skips_reportlab(self):
+        name, content = self.read_pdf(self.note)
+        self.assertTrue(content.startswith(b'%PDF'))
+        with mock.patch.object(pdf, 'SimpleDocTemplate', side_effect=AssertionError('rebuilt')) as template:
+            self.assertEqual(self.read_pdf(Note.objects.get(pk=self.note.pk)), (name, content))
+        template.assert_not_called()
+
+    def test_key_follows_title_and_content(self):
+        first, _ = self.read_pdf(self.note)
+        # حفظ بدون تغيير النص لا يعيد البناء رغم زيادة المراجعة
+        self.note.save()
+        self.assertEqual(self.read_pdf(self.note)[0], first)
+
+        names = {first}
+        for field, value in (('content_md', 'محتوى جديد'), ('title', 'عنوان جديد')):
+            setattr(self.note, field, value)
+            self.note.save()
+            with mock.patch.object(pdf, 'build_pdf', wraps=pdf.build_pdf) as build:
+                name, _ = self.read_pdf(self.note)
+            build.assert_called_once()
+            self.assertNotIn(name, names)
+            names.add(name)
+            # تُحذف النسخة السابقة عند بناء الجديدة
+            self.assertEqual(self.cached_files(), [name])
+
+    def test_delete_removes_cached_files(self):
+        self.read_pdf(self.note)
+        directory = pdf._note_dir(self.note.pk)
+        self.note.delete()
+        self.assertFalse(os.path.exists(directory))
+
+
+# ===== الاستيراد =====
+
+IMPORT_FILES = {
+    'مذكرات/يوم.md': (
+        '---\ntitle: يوم في المكتبة\ntags: [قراءة, يوميات]\ncreated: 2024-03-01T10:00:00\n'
+        'public: true\nfavorite: true\n---\n\n# عنوان\n\nنص **عريض**\n'
+    ),
+    'بدون-رأس.md': 'نص بدون front-matter\n',
+    'وسوم.markdown': '---\ntags: "أ, ب ,أ"\n---\nمحتوى\n',
+    '.obsidian/ملف.md': 'مخفي',
+    'صورة.png': 'ليس markdown',
+}
+
+
+def make_archive(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, text in files.items():
+            archive.writestr(name, text)
+    return buffer.getvalue()
+
+
+@override_settings(IMPORT_BATCH_SIZE=1, IMPORT_WORKERS=1)
+class ImporterTests(TestCase):
+    """استيراد ملفات Markdown مع front-matter والوسوم واستكمال ما توقف"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('importer', password='secret')
+
+    def run_import(self, files):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, text in files.items():
+                path = Path(directory, name)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(text, encoding='utf-8')
+            return NoteImporter(self.user).run(directory)
+
+    def test_front_matter_and_tags(self):
+        stats = self.run_import(IMPORT_FILES)
+        self.assertEqual(stats, {'total': 3, 'processed': 3, 'imported': 3, 'skipped': 0, 'failed': 0})
+
+        day = self.user.notes.get(title='يوم في المكتبة')
+        self.assertEqual(day.content_md, '# عنوان\n\nنص **عريض**\n')
+        self.assertIn('<strong>عريض</strong>', day.content_html)
+        self.assertTrue(day.is_public and day.is_favorite)
+        self.assertEqual(day.created_at.date().isoformat(), '2024-03-01')
+        self.assertEqual(sorted(day.tags.names()), ['قراءة', 'يوميات'])
+        self.assertEqual(search_notes(self.user.notes.all(), 'المكتبه').get(), day)
+
+        plain = self.user.notes.get(title='بدون-رأس')
+        self.assertEqual(plain.content_md, 'نص بدون front-matter\n')
+        self.assertFalse(plain.is_public or plain.is_favorite)
+        self.assertEqual(sorted(self.user.notes.get(title='وسوم').tags.names()), ['أ', 'ب'])
+
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.total_notes, stats.public_notes, stats.tag_count), (3, 1, 4))
+
+    def test_resume_skips_imported_files(self):
+        first = dict(list(IMPORT_FILES.items())[:2])
+        self.assertEqual(self.run_import(first)['imported'], 2)
+
+        stats = self.run_import(IMPORT_FILES)
+        self.assertEqual((stats['imported'], stats['skipped']), (1, 2))
+        self.assertEqual(self.user.notes.count(), 3)
+
+        # تعديل الملف يجعله ملفاً جديداً
+        changed = {**IMPORT_FILES, 'بدون-رأس.md': 'نص معدّل\n'}
+        self.assertEqual(self.run_import(changed)['imported'], 1)
+        self.assertEqual(self.user.notes.count(), 4)
+
+
+@override_settings(IMPORT_ASYNC=True, IMPORT_BATCH_SIZE=1, IMPORT_WORKERS=1)
+class ImportViewTests(TransactionTestCase):
+    """رفع الأرشيف يبدأ الاستيراد في الخلفية ويرد فوراً بمفتاح التقدم"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('uploader', password='secret')
+        self.client.force_login(self.user)
+
+    def upload(self, content, **headers):
+        archive = SimpleUploadedFile('notes.zip', content, content_type='application/zip')
+        return self.client.post(reverse('import_notes'), {'archive': archive}, secure=True, **headers)
+
+    def wait_for_import(self):
+        # خيط الاستيراد واحد: مهمة فارغة بعده تنتهي بعد انتهائه
+        importer._import_executor().submit(int).result(timeout=30)
+
+    def test_upload_returns_import_id(self):
+        response = self.upload(make_archive(IMPORT_FILES), HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 202)
+        job = ImportJob.objects.get(user=self.user)
+        self.assertEqual(response.json()['import_id'], job.pk)
+        self.assertEqual(response.json()['status_url'], f'{reverse("import_status")}?id={job.pk}')
+
+        self.wait_for_import()
+        # الحالة من قاعدة البيانات، فيراها أي عامل وليس العامل الذي استورد فقط
+        status = self.client.get(response.json()['status_url'], secure=True).json()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual((status['id'], status['total'], status['imported']), (job.pk, 3, 3))
+        self.assertEqual(self.client.get(reverse('import_status'), secure=True).json(), status)
+        self.assertEqual(self.user.notes.count(), 3)
+
+    def test_status_of_other_users_imports(self):
+        other = User.objects.create_user('other', password='secret')
+        job = ImportJob.objects.create(user=other)
+        self.assertEqual(self.client.get(reverse('import_status'), secure=True).json(), {})
+        response = self.client.get(reverse('import_status'), {'id': job.pk}, secure=True)
+        self.assertEqual(response.json(), {})
+
+    def test_form_upload_redirects(self):
+        response = self.upload(make_archive(IMPORT_FILES))
+        self.assertRedirects(response, reverse('notes_list'), fetch_redirect_response=False)
+        self.wait_for_import()
+        self.assertEqual(self.user.notes.count(), 3)
+
+    @override_settings(IMPORT_ASYNC=False)
+    def test_import_in_request(self):
+        response = self.upload(make_archive(IMPORT_FILES))
+        self.assertRedirects(response, reverse('notes_list'), fetch_redirect_response=False)
+        self.assertEqual(self.user.notes.count(), 3)
+        self.assertEqual(self.client.get(reverse('import_status'), secure=True).json()['status'], 'done')
+
+    def test_invalid_archive_is_rejected_before_starting(self):
+        response = self.upload(b'not a zip', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ImportJob.objects.exists())
+
+
+# ===== ترقيم الصفحات =====
+
+class PaginationTests(TestCase):
+    """ترقيم المؤشر في ``notes.pagination`` مع القيم المتساوية والمؤشرات التالفة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('pager', password='secret')
+        for i in range(11):
+            Note.objects.create(owner=cls.user, title=f'ملاحظة {i % 3}', content_md=f'نص مشترك {"بحث " * (i % 4)}')
+        notes = cls.user.notes.order_by('pk')
+        tied = timezone.now().replace(microsecond=0)
+        # قيم متساوية في كل حقول الترتيب: المعرّف وحده يفصل بينها
+        notes.filter(pk__in=notes.values('pk')[:7]).update(updated_at=tied, created_at=tied, views=5)
+
+    def walk(self, queryset, ordering, per_page=3):
+        """كل الصفحات للأمام ثم للخلف من آخر صفحة"""
+        forward, cursor, pages = [], None, []
+        while True:
+            page = paginate(queryset, ordering, cursor, per_page=per_page)
+            pages.append(page)
+            forward.extend(note.pk for note in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        backward = [note.pk for note in pages[-1]]
+        page = pages[-1]
+        while page.has_previous():
+            page = paginate(queryset, ordering, page.previous_cursor, per_page=per_page)
+            backward[:0] = [note.pk for note in page]
+        return forward, backward
+
+    def expected(self, queryset, ordering):
+        if len(ordering) == 1 and ordering[0].lstrip('-') in KEYSET_FIELDS:
+            order = (*ordering, '-pk' if ordering[0].startswith('-') else 'pk')
+        else:
+            order = (*ordering, 'pk')
+        return list(queryset.order_by(*order).values_list('pk', flat=True))
+
+    def test_every_sort_is_stable_across_pages(self):
+        queryset = self.user.notes.all()
+        for sort in SORTS:
+            with self.subTest(sort=sort):
+                sort_by, ordering = resolve_ordering(sort)
+                self.assertEqual(sort_by, sort)
+                forward, backward = self.walk(queryset, ordering)
+                expected = self.expected(queryset, ordering)
+                self.assertEqual(len(expected), 11)
+                self.assertEqual(forward, expected)
+                self.assertEqual(backward, expected)
+
+    def test_rank_sort_uses_offsets(self):
+        sort_by, ordering = resolve_ordering('', 'بحث')
+        self.assertEqual((sort_by, ordering), ('rank', ('-search_rank', '-updated_at')))
+        queryset = search_notes(self.user.notes.all(), 'بحث')
+        forward, backward = self.walk(queryset, ordering, per_page=2)
+        expected = self.expected(queryset, ordering)
+        self.assertEqual(len(expected), 8)
+        self.assertEqual(forward, expected)
+        self.assertEqual(backward, expected)
+        self.assertIn('"i":2', base64.urlsafe_b64decode(
+            paginate(queryset, ordering, per_page=2).next_cursor + '==').decode())
+
+    def test_resolve_ordering_fallbacks(self):
+        self.assertEqual(resolve_ordering(None), ('-updated_at', ('-updated_at',)))
+        self.assertEqual(resolve_ordering('rank'), ('-updated_at', ('-updated_at',)))
+        self.assertEqual(resolve_ordering('owner__password'), ('-updated_at', ('-updated_at',)))
+        self.assertEqual(resolve_ordering('title', 'بحث'), ('title', ('title',)))
+
+    def test_invalid_cursors_return_the_first_page(self):
+        queryset = self.user.notes.all()
+        ordering = ('-updated_at',)
+        first = [note.pk for note in paginate(queryset, ordering, per_page=3)]
+        cursors = [
+            'not-a-cursor!!',
+            encode_cursor(['list']),
+            encode_cursor({'o': ['title'], 'd': 'n', 'k': ['ملاحظة 1', 1]}),
+            encode_cursor({'o': list(ordering), 'd': 'n', 'k': 'broken'}),
+            encode_cursor({'o': list(ordering), 'd': 'n', 'k': ['yesterday', 1]}),
+            encode_cursor({'o': list(ordering), 'd': 'n'}),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                page = paginate(queryset, ordering, cursor, per_page=3)
+                self.assertEqual([note.pk for note in page], first)
+                self.assertFalse(page.has_previous())
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(encode_cursor({'o': ['title']}), ordering)
+
+        offset_ordering = ('-search_rank', '-updated_at')
+        queryset = search_notes(queryset, 'بحث')
+        first = [note.pk for note in paginate(queryset, offset_ordering, per_page=3)]
+        for index in (-3, '3', None):
+            cursor = encode_cursor({'o': list(offset_ordering), 'i': index})
+            self.assertEqual([note.pk for note in paginate(queryset, offset_ordering, cursor, per_page=3)], first)
+
+    @override_settings(STORAGES=PLAIN_STATIC_STORAGES, DATABASE_REPLICA_READS=False)
+    def test_list_view_ignores_tampered_cursor(self):
+        self.client.force_login(self.user)
+        for cursor in ('%%%', encode_cursor({'o': ['-updated_at'], 'd': 'p', 'k': [None, None]})):
+            response = self.client.get(reverse('notes_list'), {'cursor': cursor}, secure=True)
+            self.assertEqual(response.status_code, 200)
+
+
+# ===== إحصاءات الوسوم =====
+
+class FacetTests(TestCase):
+    """إحصاءات الوسوم المخزنة تتبع تغيير الوسوم دون حذف صريح من الذاكرة المؤقتة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('facets', password='secret')
+        other = User.objects.create_user('other', password='secret')
+        Note.objects.create(owner=other, title='أخرى', content_md='نص').tags.set(['عربي', 'خارجي'])
+        cls.first = Note.objects.create(owner=cls.user, title='أولى', content_md='نص')
+        cls.first.tags.set(['عربي', 'بايثون'])
+        cls.second = Note.objects.create(owner=cls.user, title='ثانية', content_md='نص')
+        cls.second.tags.set(['عربي'])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts(self):
+        self.assertEqual(facets.get_tag_facets(self.user.pk), [
+            {'name': 'عربي', 'count': 2},
+            {'name': 'بايثون', 'count': 1},
+        ])
+
+    def test_cached_until_tags_change(self):
+        facets.get_tag_facets(self.user.pk)
+        with mock.patch.object(facets, 'build_tag_facets', wraps=facets.build_tag_facets) as build:
+            facets.get_tag_facets(self.user.pk)
+            build.assert_not_called()
+            self.second.tags.add('بايثون')
+            self.assertEqual(facets.get_tag_facets(self.user.pk), [
+                {'name': 'بايثون', 'count': 2},
+                {'name': 'عربي', 'count': 2},
+            ])
+            build.assert_called_once()
+
+    def test_stale_entry_of_another_worker_is_ignored(self):
+        stamp = UserStats.objects.get(user=self.user).updated_at
+        facets.get_tag_facets(self.user.pk)
+        self.first.tags.remove('بايثون')
+        # ما زالت النسخة القديمة في الذاكرة المؤقتة كما في عامل آخر لم يستقبل الإشارة
+        self.assertIsNotNone(cache.get(facets._cache_key(self.user.pk, stamp)))
+        self.assertEqual(facets.get_tag_facets(self.user.pk), [{'name': 'عربي', 'count': 2}])
+
+    def test_note_delete(self):
+        facets.get_tag_facets(self.user.pk)
+        self.first.delete()
+        self.assertEqual(facets.get_tag_facets(self.user.pk), [{'name': 'عربي', 'count': 1}])
+
+
+# ===== إحصاءات المستخدم =====
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=0)
+class UserStatsTests(TestCase):
+    """الإحصاءات المحدثة تدريجياً من ``notes.signals`` تطابق إعادة الحساب الكاملة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('counter', password='secret')
+        cls.other = User.objects.create_user('other', password='secret')
+        Note.objects.create(owner=cls.other, title='أخرى', content_md='نص', is_public=True).tags.set(['مشترك'])
+
+    def assertMatchesReconcile(self):
+        stored = list(UserStats.objects.order_by('user_id').values('user_id', *UserStats.STAT_FIELDS))
+        computed = [
+            {'user_id': row.pop('pk'), **row}
+            for row in UserStats.objects.computed(User.objects.filter(note_stats__isnull=False))
+        ]
+        self.assertEqual(stored, computed)
+        output = StringIO()
+        call_command('reconcile_user_stats', stdout=output)
+        self.assertIn('وتصحيح 0 سجل', output.getvalue())
+
+    def make_notes(self):
+        first = Note.objects.create(owner=self.user, title='أولى', content_md='مرحباً بالعالم', is_favorite=True)
+        first.tags.set(['مشترك', 'عربي'])
+        second = Note.objects.create(owner=self.user, title='ثانية', content_md='# عنوان\n\nنص 😀', is_public=True)
+        second.tags.set(['عربي'])
+        for content in ('نسخة 1', 'نسخة 2', 'نسخة 3'):
+            second.content_md = content
+            second.save()
+        view_counter.record(first.pk, 3)
+        return first, second
+
+    def test_create_edit_and_views(self):
+        first, second = self.make_notes()
+        first.is_favorite = False
+        first.is_public = True
+        first.save(update_fields=['is_favorite', 'is_public'])
+        second.content_md = 'نص أطول بكثير من السابق'
+        second.save(update_fields=['content_md'])
+        self.assertMatchesReconcile()
+        self.assertEqual(UserStats.objects.get(user=self.user).version_count, 4)
+
+    def test_delete_instance(self):
+        first, second = self.make_notes()
+        Note.objects.get(pk=second.pk).delete()
+        self.assertMatchesReconcile()
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.total_notes, stats.version_count, stats.tag_count), (1, 0, 2))
+
+    def test_delete_queryset_and_deferred_instance(self):
+        self.make_notes()
+        third = Note.objects.create(owner=self.user, title='ثالثة', content_md='نص')
+        Note.objects.defer('content_md').get(pk=third.pk).delete()
+        self.assertMatchesReconcile()
+        self.user.notes.all().delete()
+        self.assertMatchesReconcile()
+        self.assertEqual(UserStats.objects.get(user=self.user).total_notes, 0)
+
+    def test_save_reads_the_row_once(self):
+        first, _ = self.make_notes()
+        first.content_md = 'محتوى جديد'
+        with CaptureQueriesContext(connection) as queries:
+            first.save()
+        selects = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "notes_note"' in q['sql']]
+        self.assertEqual(len(selects), 1)
+        self.assertMatchesReconcile()
+
+
+# ===== واجهة JSON =====
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=0, DATABASE_REPLICA_READS=False)
+class ApiTests(TestCase):
+    """واجهة ``/api/notes/``: الإنشاء والتعديل والحقول و ETag والترقيم"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('api', password='secret')
+        cls.note = Note.objects.create(owner=cls.user, title='أصلية', content_md='نص أول')
+        cls.note.tags.set(['قديم'])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def send(self, method, url, data):
+        return getattr(self.client, method)(url, json.dumps(data), content_type='application/json', secure=True)
+
+    def get(self, url, data=None, **headers):
+        return self.client.get(url, data, secure=True, **headers)
+
+    def detail_url(self, note=None):
+        return reverse('api_note', args=[(note or self.note).pk])
+
+    def test_create(self):
+        response = self.send('post', reverse('api_notes'), {
+            'title': 'جديدة', 'content_md': 'نص **عريض**', 'tags': ['أ', 'ب', 'أ'], 'is_favorite': True,
+        })
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertEqual(response['Location'], reverse('api_note', args=[data['id']]))
+        self.assertEqual(data['tags'], ['أ', 'ب'])
+        self.assertIn('<strong>عريض</strong>', data['content_html'])
+        self.assertTrue(data['is_favorite'])
+        self.assertEqual(data['revision'], 1)
+        self.assertEqual(Note.objects.get(pk=data['id']).owner, self.user)
+
+    def test_patch_bumps_updated_at_and_revision(self):
+        old = Note.objects.get(pk=self.note.pk)
+        response = self.send('patch', self.detail_url(), {'revision': old.revision, 'content_md': 'نص ثانٍ'})
+        self.assertEqual(response.status_code, 200)
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertEqual(note.content_md, 'نص ثانٍ')
+        self.assertEqual(note.revision, old.revision + 1)
+        self.assertGreater(note.updated_at, old.updated_at)
+        self.assertEqual(response.json()['updated_at'], note.updated_at.isoformat())
+        self.assertEqual(list(self.user.notes.order_by('-updated_at').values_list('pk', flat=True)[:1]), [note.pk])
+
+        # المفضلة وحدها لا تعيد التحويل ولا تغير المراجعة
+        response = self.send('patch', self.detail_url(), {'is_favorite': True, 'tags': 'قديم, جديد'})
+        note.refresh_from_db()
+        self.assertEqual(note.revision, old.revision + 1)
+        self.assertEqual(response.json()['tags'], ['جديد', 'قديم'])
+
+    def test_stale_revision_conflicts(self):
+        response = self.send('patch', self.detail_url(), {'revision': self.note.revision - 1, 'title': 'متأخر'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['revision'], self.note.revision)
+        self.assertEqual(Note.objects.get(pk=self.note.pk).title, 'أصلية')
+
+    def test_wrong_types_are_rejected(self):
+        for data in ({'content_md': None}, {'title': 123}, {'tags': [1, 2]}, {'tags': None}, {'is_public': 'yes'}):
+            with self.subTest(data=data):
+                self.assertEqual(self.send('patch', self.detail_url(), data).status_code, 400)
+                self.assertEqual(self.send('post', reverse('api_notes'), {'title': 'x', **data}).status_code, 400)
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertEqual((note.title, note.content_md), ('أصلية', 'نص أول'))
+        self.assertEqual(self.user.notes.count(), 1)
+        self.assertEqual(self.send('patch', self.detail_url(), {'owner': 2}).status_code, 400)
+
+    def test_fields_selection(self):
+        response = self.get(self.detail_url(), {'fields': 'title,tags,title'})
+        self.assertEqual(response.json(), {'title': 'أصلية', 'tags': ['قديم']})
+        response = self.get(self.detail_url(), {'fields': 'title,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_etag_and_not_modified(self):
+        response = self.get(self.detail_url())
+        etag = response['ETag']
+        self.assertEqual(self.get(self.detail_url(), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.note.tags.add('جديد')
+        response = self.get(self.detail_url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_streams_cursor_pages(self):
+        for i in range(4):
+            Note.objects.create(owner=self.user, title=f'ملاحظة {i}')
+        expected = list(self.user.notes.order_by('-updated_at', '-pk').values_list('pk', flat=True))
+
+        seen, cursor = [], None
+        while True:
+            response = self.get(reverse('api_notes'), {'limit': 2, 'fields': 'id,title', **({'cursor': cursor} if cursor else {})})
+            self.assertTrue(response.streaming)
+            data = json.loads(b''.join(response.streaming_content))
+            self.assertTrue(all(set(item) == {'id', 'title'} for item in data['results']))
+            seen.extend(item['id'] for item in data['results'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_api_reports_total_views(self):
+        Note.objects.filter(pk=self.note.pk).update(views=10)
+        with override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600):
+            view_counter.record(self.note.pk, 2)
+        self.addCleanup(view_counter.flush)
+        response = self.get(self.detail_url(), {'fields': 'views'})
+        self.assertEqual(response.json(), {'views': 12})
+
+
+# ===== عدّاد المشاهدات =====
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600, VIEW_COUNT_MAX_PENDING=1000)
+class ViewCounterTests(TestCase):
+    """تجميع المشاهدات في ``notes.view_counter`` وكتابتها دفعة واحدة"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('viewer', password='secret')
+        cls.notes = [Note.objects.create(owner=cls.user, title=f'ملاحظة {i}') for i in range(3)]
+        UserStats.objects.refresh(cls.user.pk)
+
+    def setUp(self):
+        self.counter = ViewCounter()
+        # بدون خيط الكتابة الدورية: الكتابة هنا صريحة فقط
+        self.counter._timer_pid = os.getpid()
+
+    def views(self):
+        return list(Note.objects.filter(pk__in=[note.pk for note in self.notes]).order_by('pk').values_list('views', flat=True))
+
+    def test_flush_groups_notes_by_increment(self):
+        first, second, third = self.notes
+        for note_id in (first.pk, first.pk, second.pk, second.pk, third.pk):
+            self.assertTrue(self.counter.record(note_id))
+        self.assertEqual(self.views(), [0, 0, 0])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.counter.flush(), 5)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "notes_note"')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(self.views(), [2, 2, 1])
+        self.assertEqual(UserStats.objects.get(user=self.user).total_views, 5)
+        self.assertEqual(self.counter.flush(), 0)
+
+    def test_failed_flush_requeues_counts(self):
+        note = self.notes[0]
+        self.counter.record(note.pk, 3)
+        with mock.patch.object(self.counter, '_write', side_effect=RuntimeError('db down')):
+            with self.assertRaises(RuntimeError):
+                self.counter.flush()
+        self.assertEqual(self.counter.pending(note.pk), 3)
+
+        self.counter.record(note.pk)
+        self.assertEqual(self.counter.flush(), 4)
+        self.assertEqual(self.counter.pending(note.pk), 0)
+        self.assertEqual(self.views()[0], 4)
+
+    @override_settings(VIEW_COUNT_MAX_PENDING=2)
+    def test_full_buffer_flushes(self):
+        first, second, _ = self.notes
+        self.counter.record(first.pk)
+        self.counter.record(second.pk)
+        self.assertEqual(self.views(), [1, 1, 0])
+
+    def test_total_views_includes_pending(self):
+        note = self.notes[0]
+        Note.objects.filter(pk=note.pk).update(views=10)
+        view_counter.record(note.pk, 2)
+        self.addCleanup(view_counter.flush)
+        self.assertEqual(Note.objects.get(pk=note.pk).total_views, 12)
+
+    @override_settings(VIEW_COUNT_FLUSH_INTERVAL=1)
+    def test_timer_flushes_without_further_views(self):
+        counter = ViewCounter()
+        written = threading.Event()
+        with mock.patch.object(counter, '_write', side_effect=lambda counts: written.set()) as write:
+            counter.record(self.notes[0].pk)
+            self.assertTrue(written.wait(5))
+        write.assert_called_once_with({self.notes[0].pk: 1})
+        self.assertEqual(counter.pending(self.notes[0].pk), 0)
+
+
+# ===== قياس الأداء =====
+
+SERVER_TIMING_RE = re.compile(r'^(?P<name>\w+);dur=\d+\.\d(?:;desc="(?P<desc>[^"]*)")?$')
+
+
+@override_settings(
+    PERFORMANCE_INSTRUMENTATION=True, VIEW_COUNT_FLUSH_INTERVAL=0,
+    STORAGES=PLAIN_STATIC_STORAGES, DATABASE_REPLICA_READS=False,
+)
+class InstrumentationTests(TestCase):
+    """ترويسة ``Server-Timing`` وسجل ``notes.performance`` من ``PerformanceMiddleware``"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('timer', password='secret')
+        cls.note = Note.objects.create(owner=cls.user, title='مقاسة', content_md='# عنوان\n\nنص')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        # HTML قديم يُحوَّل أثناء الطلب لقياس مقاطع التحويل
+        Note.objects.filter(pk=self.note.pk).update(content_md=f'# عنوان\n\nنص {random.random()}', html_stale=True)
+        render_cache.clear()
+        block_cache.clear()
+
+    def server_timing(self, response):
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            match = SERVER_TIMING_RE.match(entry)
+            self.assertIsNotNone(match, entry)
+            entries[match['name']] = match['desc']
+        return entries
+
+    def test_server_timing_header(self):
+        with self.assertLogs('notes.performance', 'INFO'):
+            response = self.client.get(reverse('note_detail', args=[self.note.pk]), secure=True)
+        self.assertEqual(response.status_code, 200)
+        entries = self.server_timing(response)
+        self.assertLessEqual({'db', 'markdown', 'bleach', 'template', 'total'}, entries.keys())
+        self.assertGreater(int(re.match(r'(\d+) queries', entries['db'])[1]), 0)
+        self.assertEqual(list(entries)[-1], 'total')
+
+    def test_log_record(self):
+        with self.assertLogs('notes.performance', 'INFO') as logs:
+            self.client.get(reverse('notes_list'), secure=True)
+        record = logs.records[-1].performance
+        self.assertEqual(json.loads(logs.records[-1].getMessage()), record)
+        self.assertEqual((record['view'], record['status']), ('notes_list', 200))
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('template', record['spans'])
+
+    @override_settings(PERFORMANCE_INSTRUMENTATION=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('note_detail', args=[self.note.pk]), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+
+# ===== النسخة المتماثلة =====
+
+# المشاهدات مؤجلة (تُكتب في نهاية كل اختبار) حتى لا تظهر قراءات عدّادها على الرئيسية
+@skipUnless(REPLICA in settings.DATABASES, 'DATABASE_REPLICA_URL غير محدد')
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600, STORAGES=PLAIN_STATIC_STORAGES, DATABASE_REPLICA_READS=True)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    توجيه القراءة إلى النسخة المتماثلة (``notes.routers``)
+
+    تعمل مع نسخة محددة، مثلاً بملفي SQLite::
+
+        DATABASE_REPLICA_URL=sqlite:///replica.sqlite3 python manage.py test notes
+
+    النسخة في الاختبارات مرآة لقاعدة الاختبار الرئيسية، فيُفحص الاتصال الذي
+    مر عبره كل استعلام.
+    """
+
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', password='secret')
+        self.note = Note.objects.create(owner=self.user, title='عامة', content_md='نص', is_public=True)
+        self.note.tags.set(['replica'])
+        # علامة "عُدلت للتو" التي وضعها الإنشاء للصفحة العامة
+        cache.clear()
+        self.addCleanup(view_counter.flush)
+        self.client.force_login(self.user)
+        pdf_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(pdf_dir.cleanup)
+        settings_override = override_settings(PDF_CACHE_DIR=pdf_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def note_reads(self, url, method='get', **kwargs):
+        """عدد قراءات جداول notes على كل اتصال أثناء الطلب"""
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = getattr(self.client, method)(url, secure=True, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400)
+
+        def count(queries):
+            return sum(
+                1 for query in queries
+                if query['sql'].startswith('SELECT') and '"notes_' in query['sql']
+            )
+
+        return count(primary), count(replica), response
+
+    def test_read_views_use_replica(self):
+        pk = self.note.pk
+        for url in (
+            reverse('notes_list'),
+            reverse('note_detail', args=[pk]),
+            reverse('profile'),
+            reverse('public_note', args=[self.note.public_uuid]),
+            reverse('export_markdown', args=[pk]),
+            reverse('export_pdf', args=[pk]),
+            reverse('export_all') + '?versions=1',
+        ):
+            with self.subTest(url=url):
+                primary, replica, _ = self.note_reads(url)
+                self.assertEqual(primary, 0)
+                self.assertGreater(replica, 0)
+
+    def test_other_views_read_primary(self):
+        primary, replica, _ = self.note_reads(reverse('note_edit', args=[self.note.pk]))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        _, _, response = self.note_reads(reverse('toggle_favorite', args=[self.note.pk]), method='post')
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        primary, replica, _ = self.note_reads(reverse('notes_list'))
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_writes_go_to_primary(self):
+        note = Note.objects.using(REPLICA).get(pk=self.note.pk)
+        with CaptureQueriesContext(connections[REPLICA]) as replica:
+            note.title = 'معدلة'
+            note.save()
+            note.tags.add('new')
+        self.assertFalse([query for query in replica if not query['sql'].startswith('SELECT')])
+        self.assertEqual(Note.objects.get(pk=self.note.pk).title, 'معدلة')
+
+    def test_search_reads_index_from_replica(self):
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = self.client.get(reverse('notes_list'), {'search': 'نص'}, secure=True)
+        self.assertContains(response, '<mark>نص</mark>')
+        for queries, expected in ((primary, 0), (replica, 2)):
+            self.assertEqual(sum(FTS_TABLE in query['sql'] for query in queries), expected)
+
+    def test_changed_public_page_reads_primary(self):
+        url = reverse('public_note', args=[self.note.public_uuid])
+        self.note_reads(url)
+        public_cache.invalidate_page(self.note.public_uuid)
+        primary, replica, _ = self.note_reads(url)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
@@ -1,7 +1,11 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
 from .home_views import home_view
 
+# المسارات الأكثر طلباً بنسخها غير المتزامنة عند التشغيل عبر ASGI
+hot_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
     # Home
     path('', home_view, name='home'),
@@ -14,20 +18,31 @@ urlpatterns = [
     path('docs/', views.markdown_docs_view, name='markdown_docs'),
     
     # Notes CRUD URLs
-    path('notes/', views.notes_list_view, name='notes_list'),
-    path('note/<int:pk>/', views.note_detail_view, name='note_detail'),
+    path('notes/', hot_views.notes_list_view, name='notes_list'),
+    path('note/<int:pk>/', hot_views.note_detail_view, name='note_detail'),
     path('note/new/', views.note_create_view, name='note_create'),
     path('note/<int:pk>/edit/', views.note_edit_view, name='note_edit'),
     path('note/<int:pk>/delete/', views.note_delete_view, name='note_delete'),
     
     # AJAX URLs
     path('note/<int:pk>/toggle-favorite/', views.toggle_favorite_view, name='toggle_favorite'),
-    path('note/<int:pk>/autosave/', views.autosave_view, name='autosave'),
+    path('note/<int:pk>/autosave/', hot_views.autosave_view, name='autosave'),
+    path('notes/preview/', views.preview_view, name='note_preview'),
+    path('metrics/', views.metrics_view, name='metrics'),
     
     # Public sharing
-    path('share/<uuid:uuid>/', views.public_note_view, name='public_note'),
+    path('share/<uuid:uuid>/', hot_views.public_note_view, name='public_note'),
     
     # Export URLs
-    path('note/<int:pk>/export/markdown/', views.export_markdown_view, name='export_markdown'),
-    path('note/<int:pk>/export/pdf/', views.export_pdf_view, name='export_pdf'),
+    path('note/<int:pk>/export/markdown/', hot_views.export_markdown_view, name='export_markdown'),
+    path('note/<int:pk>/export/pdf/', hot_views.export_pdf_view, name='export_pdf'),
+    path('notes/export/', hot_views.export_all_view, name='export_all'),
+    
+    # Import URLs
+    path('notes/import/', views.import_notes_view, name='import_notes'),
+    path('notes/import/status/', views.import_status_view, name='import_status'),
+    
+    # JSON API
+    path('api/notes/', api.notes_view, name='api_notes'),
+    path('api/notes/<int:pk>/', api.note_view, name='api_note'),
 ]
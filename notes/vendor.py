@@ -0,0 +1,57 @@
+"""
+مكتبات الواجهة: حزم محلية في ``static/vendor/`` مع روابط CDN بديلة
+
+``manage.py vendor_assets`` ينزّل المصادر أدناه ويدمجها في الحزم. إلى أن تُنشأ
+الحزم (أو إذا لم تُرفع مع المشروع) يعرض ``{% vendor_bundle %}`` روابط CDN الأصلية
+بدلاً من رابط لملف غير موجود.
+"""
+
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+# نسخ مثبتة من مكتبات الواجهة (نفس الملفات المصغرة التي كانت تُحمَّل من CDN)
+INTER_CSS = 'https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700;800&display=swap'
+BOOTSTRAP_CSS = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.rtl.min.css'
+BOOTSTRAP_ICONS_CSS = 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/bootstrap-icons.min.css'
+BOOTSTRAP_JS = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js'
+HIGHLIGHT_CSS = 'https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/styles/github-dark.min.css'
+HIGHLIGHT_JS = 'https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.9.0/highlight.min.js'
+MARKED_JS = 'https://cdn.jsdelivr.net/npm/marked@12.0.2/marked.min.js'
+CODEMIRROR = 'https://cdnjs.cloudflare.com/ajax/libs/codemirror/6.65.7/'
+
+# الحزم في ``static/vendor/``: الأساسية في كل صفحة، والمحرر في صفحة التعديل فقط
+BUNDLES = {
+    'base.css': [INTER_CSS, BOOTSTRAP_CSS, BOOTSTRAP_ICONS_CSS, HIGHLIGHT_CSS],
+    'base.js': [BOOTSTRAP_JS, HIGHLIGHT_JS],
+    'editor.css': [CODEMIRROR + 'codemirror.min.css', CODEMIRROR + 'theme/dracula.min.css'],
+    'editor.js': [
+        MARKED_JS,
+        CODEMIRROR + 'codemirror.min.js',
+        CODEMIRROR + 'mode/markdown/markdown.min.js',
+        CODEMIRROR + 'addon/edit/continuelist.min.js',
+        CODEMIRROR + 'addon/display/placeholder.min.js',
+    ],
+}
+
+_available = {}
+
+
+def bundle_path(name):
+    return f'vendor/{name}'
+
+
+def bundle_available(name):
+    """هل الحزمة موجودة محلياً (بعد collectstatic أو في مجلدات المصادر)؟"""
+    if name not in _available:
+        path = bundle_path(name)
+        _available[name] = staticfiles_storage.exists(path) or finders.find(path) is not None
+    return _available[name]
+
+
+@receiver(setting_changed)
+def _reset_available(setting, **kwargs):
+    if setting in ('STATIC_ROOT', 'STATICFILES_DIRS', 'STORAGES'):
+        _available.clear()
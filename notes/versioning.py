@@ -0,0 +1,124 @@
+"""
+ترميز نسخ الملاحظات كسلسلة من الإطارات المفتاحية والفروقات المضغوطة
+
+كل نسخة تُخزَّن بإحدى الصيغ:
+
+- ``raw``: النص الكامل في ``content_md`` (النسخ القديمة قبل الضغط)
+- ``full``: إطار مفتاحي، النص الكامل مضغوطاً بـ zlib في ``payload``
+- ``delta``: فرق سطري مضغوط مقارنة بالنسخة السابقة في نفس السلسلة
+
+لاستعادة نسخة نبدأ من أقرب إطار مفتاحي قبلها ثم نطبق الفروقات بالترتيب.
+"""
+
+import difflib
+import hashlib
+import json
+import zlib
+
+
+ENCODING_RAW = 'raw'
+ENCODING_FULL = 'full'
+ENCODING_DELTA = 'delta'
+
+KEYFRAME_ENCODINGS = (ENCODING_RAW, ENCODING_FULL)
+
+_COMPRESSION_LEVEL = 6
+
+
+def content_hash(text):
+    """بصمة SHA-256 لنص النسخة للتحقق من صحة الاستعادة"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compress_text(text):
+    return zlib.compress(text.encode('utf-8'), _COMPRESSION_LEVEL)
+
+
+def decompress_text(payload):
+    return zlib.decompress(bytes(payload)).decode('utf-8')
+
+
+def make_delta(base, target):
+    """
+    فرق سطري مضغوط يحوّل ``base`` إلى ``target``
+
+    الفرق قائمة عمليات: ``[start, end]`` لنسخ أسطر من الأصل،
+    أو نص لإدراجه كما هو.
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j1 != j2:
+            ops.append(''.join(target_lines[j1:j2]))
+    encoded = json.dumps(ops, ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(encoded.encode('utf-8'), _COMPRESSION_LEVEL)
+
+
+def apply_delta(base, payload):
+    """تطبيق فرق ناتج عن ``make_delta`` على النص الأصلي"""
+    base_lines = base.splitlines(keepends=True)
+    ops = json.loads(zlib.decompress(bytes(payload)).decode('utf-8'))
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            start, end = op
+            parts.extend(base_lines[start:end])
+    return ''.join(parts)
+
+
+def encode(content, base=None):
+    """
+    ترميز نص نسخة وإرجاع ``(encoding, payload)``
+
+    إذا أُعطي ``base`` (نص النسخة السابقة) يُستخدم الفرق عندما يكون أصغر
+    من الإطار المفتاحي الكامل.
+    """
+    payload = compress_text(content)
+    if base is not None:
+        delta = make_delta(base, content)
+        if len(delta) < len(payload):
+            return ENCODING_DELTA, delta
+    return ENCODING_FULL, payload
+
+
+def iter_contents(versions):
+    """
+    استعادة نصوص سلسلة أو أكثر من النسخ تدريجياً وإرجاع ``(version, content)``
+
+    ``versions`` مرتبة حسب الملاحظة ثم تصاعدياً، ويكفي الاحتفاظ بنص آخر
+    نسخة فقط لذا يمكن تمرير ``QuerySet.iterator()`` لسجل كامل. كل نص مستعاد
+    يُطابق مع ``content_hash`` للنسخة إن وُجد، ويُرفع ``ValueError`` عند الاختلاف.
+    """
+    note_id = content = None
+    for version in versions:
+        if version.note_id != note_id:
+            note_id, content = version.note_id, None
+        if version.encoding == ENCODING_RAW:
+            content = version.content_md
+        elif version.encoding == ENCODING_FULL:
+            content = decompress_text(version.payload)
+        else:
+            if content is None:
+                raise ValueError(f'سلسلة النسخ للنسخة #{version.pk} لا تبدأ بإطار مفتاحي')
+            content = apply_delta(content, version.payload)
+        if version.content_hash and content_hash(content) != version.content_hash:
+            raise ValueError(f'فشل التحقق من محتوى النسخة #{version.pk}')
+        yield version, content
+
+
+def decode_chain(versions):
+    """
+    استعادة نص آخر نسخة في سلسلة تبدأ بإطار مفتاحي
+
+    ``versions`` مرتبة تصاعدياً، وأولها إطار مفتاحي.
+    """
+    content = None
+    for _, content in iter_contents(versions):
+        pass
+    return content
@@ -0,0 +1,137 @@
+"""
+عدّاد المشاهدات المؤجل
+
+تُجمع الزيادات في ذاكرة العملية ثم تُكتب دفعة واحدة باستخدام
+``F('views') + n`` كل ``VIEW_COUNT_FLUSH_INTERVAL`` ثانية، أو عند امتلاء
+المخزن المؤقت، أو عند إنهاء العملية. الملاحظات التي لها نفس عدد الزيادات
+تُحدَّث في استعلام UPDATE واحد.
+
+الكتابة الدورية في خيط خلفي يبدأ مع أول مشاهدة مؤجلة في كل عملية (ومن جديد
+بعد fork)، فلا تنتظر طلباً لاحقاً حتى في عامل خامل. إنهاء العملية قسراً
+(SIGKILL أو انتهاء مهلة العامل) يفقد مشاهدات آخر فترة فقط.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """مخزن مؤقت آمن بين الخيوط لزيادات المشاهدات"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._last_flush = time.monotonic()
+        self._timer_pid = None
+
+    def record(self, note_id, count=1):
+        """
+        تسجيل مشاهدة، مع الكتابة المباشرة إذا كان التأجيل معطلاً
+
+        يعيد False إذا كُتبت الزيادة مباشرة في قاعدة البيانات.
+        """
+        interval = settings.VIEW_COUNT_FLUSH_INTERVAL
+        if interval <= 0:
+            self._write({note_id: count})
+            return False
+
+        with self._lock:
+            self._pending[note_id] += count
+            due = (
+                time.monotonic() - self._last_flush >= interval
+                or len(self._pending) >= settings.VIEW_COUNT_MAX_PENDING
+            )
+        self._start_timer()
+        if due:
+            self.flush()
+        return True
+
+    def pending(self, note_id):
+        """عدد المشاهدات غير المكتوبة بعد لملاحظة"""
+        with self._lock:
+            return self._pending.get(note_id, 0)
+
+    def flush(self):
+        """كتابة كل الزيادات المعلقة إلى قاعدة البيانات وإرجاع عددها"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+
+        try:
+            self._write(pending)
+        except Exception:
+            # إعادة الزيادات إلى المخزن حتى لا تضيع
+            with self._lock:
+                for note_id, count in pending.items():
+                    self._pending[note_id] += count
+            raise
+        return sum(pending.values())
+
+    def _start_timer(self):
+        """تشغيل خيط الكتابة الدورية مرة واحدة لكل عملية"""
+        pid = os.getpid()
+        if self._timer_pid == pid:
+            return
+        with self._lock:
+            if self._timer_pid == pid:
+                return
+            self._timer_pid = pid
+        threading.Thread(target=self._run_timer, name='view-counter-flush', daemon=True).start()
+
+    def _run_timer(self):
+        while True:
+            interval = max(settings.VIEW_COUNT_FLUSH_INTERVAL, 1)
+            with self._lock:
+                wait = self._last_flush + interval - time.monotonic()
+                idle = not self._pending
+            if wait > 0 or idle:
+                time.sleep(wait if wait > 0 else interval)
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('تعذر كتابة المشاهدات المعلقة')
+                # المحاولة التالية بعد فترة كاملة بدلاً من تكرارها فوراً
+                with self._lock:
+                    self._last_flush = time.monotonic()
+            finally:
+                # اتصالات هذا الخيط لا يغلقها request_finished
+                connections.close_all()
+
+    def _write(self, counts):
+        from .models import Note, UserStats
+
+        by_increment = defaultdict(list)
+        for note_id, count in counts.items():
+            by_increment[count].append(note_id)
+        # المشاهدات وإحصاءات المالكين معاً حتى لا تُطبق مرتين عند إعادة المحاولة
+        with transaction.atomic():
+            for count, note_ids in by_increment.items():
+                Note.objects.filter(pk__in=note_ids).update(views=F('views') + count)
+            UserStats.objects.add_views(counts)
+
+
+view_counter = ViewCounter()
+
+
+def _flush_at_exit():
+    try:
+        view_counter.flush()
+    except Exception:
+        logger.exception('تعذر كتابة المشاهدات المعلقة عند الإغلاق')
+
+
+atexit.register(_flush_at_exit)
@@ -1,22 +1,34 @@
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth import login, logout, authenticate
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, FileResponse
-from django.db.models import Q
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404, StreamingHttpResponse
+from django.db import DEFAULT_DB_ALIAS, transaction
 from django.views.decorators.http import require_POST
-from django.core.paginator import Paginator
-from io import BytesIO
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.enums import TA_RIGHT
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from django.utils import timezone
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header
 import json
 
-from .models import Note, NoteVersion
-from .forms import RegisterForm, LoginForm, NoteForm
+from .models import ImportJob, Note, NoteVersion, UserStats
+from .forms import RegisterForm, LoginForm, NoteForm, ImportForm
+from .search import search_notes, attach_snippets
+from .facets import get_tag_facets
+from .fragments import attach_body, attach_cards, fragment_cache
+from .pagination import paginate, resolve_ordering
+from .rendering import block_cache, render_cache
+from .render_queue import render_queue
+from .routers import read_from_replica
+from .view_counter import view_counter
+from . import public_cache
+from .autosave import apply_patch
+from .preview import PreviewOutOfSync, build_preview
+from .pdf import open_pdf
+from .archive import ArchiveError, iter_export
+from .importer import run_import, start_import
 
 
 # ===== Authentication Views =====
@@ -68,15 +80,10 @@ def logout_view(request):
 
 
 @login_required
+@read_from_replica
 def profile_view(request):
-    """صفحة الملف الشخصي"""
-    notes = request.user.notes.all()
-    stats = {
-        'total_notes': notes.count(),
-        'favorite_notes': notes.filter(is_favorite=True).count(),
-        'public_notes': notes.filter(is_public=True).count(),
-        'total_views': sum(note.views for note in notes),
-    }
+    """صفحة الملف الشخصي (من الإحصاءات المحفوظة بدون المرور على الملاحظات)"""
+    stats = UserStats.objects.for_user(request.user)
     return render(request, 'notes/profile.html', {'stats': stats})
 
 
@@ -87,18 +94,30 @@ def markdown_docs_view(request):
 
 # ===== Notes CRUD Views =====
 
+def _approximate_total(user, search_query, tag, favorites_only):
+    """
+    عدد تقريبي لنتائج القائمة من الإحصاءات المحفوظة بدلاً من COUNT
+
+    يعيد None عندما لا يوجد مصدر محفوظ (البحث أو جمع الفلاتر).
+    """
+    if search_query or (tag and favorites_only):
+        return None
+    if tag:
+        return next((facet['count'] for facet in get_tag_facets(user.id) if facet['name'] == tag), 0)
+    stats = UserStats.objects.for_user(user)
+    return stats.favorite_notes if favorites_only else stats.total_notes
+
+
 @login_required
+@read_from_replica
 def notes_list_view(request):
     """قائمة الملاحظات"""
-    notes = request.user.notes.all()
+    notes = request.user.notes.for_list()
     
-    # البحث
+    # البحث (فهرس نصي كامل مع ترتيب حسب الصلة)
     search_query = request.GET.get('search', '')
     if search_query:
-        notes = notes.filter(
-            Q(title__icontains=search_query) | 
-            Q(content_md__icontains=search_query)
-        )
+        notes = search_notes(notes, search_query)
     
     # فلترة حسب الوسم
     tag = request.GET.get('tag', '')
@@ -111,26 +130,29 @@ def notes_list_view(request):
         notes = notes.filter(is_favorite=True)
     
     # الترتيب
-    sort_by = request.GET.get('sort', '-updated_at')
-    valid_sorts = ['-updated_at', 'updated_at', '-created_at', 'created_at', 'title', '-title', '-views']
-    if sort_by in valid_sorts:
-        notes = notes.order_by(sort_by)
+    sort_by, ordering = resolve_ordering(request.GET.get('sort'), search_query)
+    
+    # ترقيم بالمؤشر: بدون COUNT ولا OFFSET
+    page_obj = paginate(notes, ordering, request.GET.get('cursor'))
     
-    # Pagination
-    paginator = Paginator(notes, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # مقتطفات البحث المُميَّزة لملاحظات الصفحة الحالية فقط
+    if search_query:
+        page_obj.object_list = attach_snippets(page_obj.object_list, search_query)
     
-    # جمع كل الوسوم
-    all_tags = set()
-    for note in request.user.notes.all():
-        all_tags.update(note.tags.names())
+    # بطاقات الملاحظات من ذاكرة الأجزاء (تُبنى الناقصة والقديمة فقط)
+    page_obj.object_list = attach_cards(page_obj.object_list)
+    
+    # باقي معاملات الرابط لروابط الصفحات
+    page_query = request.GET.copy()
+    page_query.pop('cursor', None)
     
     context = {
         'page_obj': page_obj,
+        'page_query': page_query.urlencode(),
+        'approximate_total': _approximate_total(request.user, search_query, tag, favorites_only),
         'search_query': search_query,
         'current_tag': tag,
-        'all_tags': sorted(all_tags),
+        'all_tags': get_tag_facets(request.user.id),
         'favorites_only': favorites_only,
         'sort_by': sort_by,
     }
@@ -139,13 +161,16 @@ def notes_list_view(request):
 
 
 @login_required
+@read_from_replica
 def note_detail_view(request, pk):
     """عرض تفاصيل الملاحظة"""
-    note = get_object_or_404(Note, pk=pk, owner=request.user)
+    note = get_object_or_404(Note.objects.prefetch_related('tags'), pk=pk, owner=request.user)
     note.increment_views()
+    note.ensure_rendered()
+    attach_body(note, request)
     
-    # جلب النسخ السابقة
-    versions = note.versions.all()[:5]
+    # جلب بيانات النسخ السابقة فقط (بدون المحتوى)
+    versions = note.versions.metadata()[:5]
     
     context = {
         'note': note,
@@ -169,7 +194,7 @@ def note_create_view(request):
             tags_field = form.cleaned_data.get('tags_field', '')
             if tags_field:
                 tags_list = [tag.strip() for tag in tags_field.split(',') if tag.strip()]
-                note.tags.set(*tags_list)
+                note.tags.set(tags_list)
             
             messages.success(request, 'تم إنشاء الملاحظة بنجاح!')
             return redirect('note_detail', pk=note.pk)
@@ -196,7 +221,7 @@ def note_edit_view(request, pk):
             tags_field = form.cleaned_data.get('tags_field', '')
             if tags_field:
                 tags_list = [tag.strip() for tag in tags_field.split(',') if tag.strip()]
-                note.tags.set(*tags_list)
+                note.tags.set(tags_list)
             else:
                 note.tags.clear()
             
@@ -241,105 +266,243 @@ def toggle_favorite_view(request, pk):
     })
 
 
+def parse_autosave(body):
+    """
+    قراءة طلب الحفظ التلقائي، أو رد ``unchanged`` إن لم يحمل تغييرات
+
+    يعيد ``(data, response)`` وأحدهما None.
+    """
+    data = json.loads(body)
+    if not isinstance(data, dict):
+        raise ValueError('صيغة الطلب غير صحيحة')
+    
+    # لا تغييرات: لا داعي للوصول إلى قاعدة البيانات
+    if 'title' not in data and 'content_md' not in data and not data.get('patch'):
+        return None, JsonResponse({
+            'success': True,
+            'unchanged': True,
+            'revision': data.get('revision'),
+        })
+    return data, None
+
+
+def save_autosave(user, pk, data):
+    """تطبيق الحفظ التلقائي داخل معاملة (مشترك مع ``async_views.autosave_view``)"""
+    with transaction.atomic():
+        note = get_object_or_404(Note.objects.select_for_update(), pk=pk, owner=user)
+        
+        base_revision = data.get('revision')
+        if base_revision is not None and base_revision != note.revision:
+            return JsonResponse({
+                'success': False,
+                'conflict': True,
+                'error': 'تم تعديل الملاحظة من مكان آخر',
+                'revision': note.revision,
+                'title': note.title,
+                'content_md': note.content_md,
+            }, status=409)
+        
+        title = data.get('title', note.title)
+        if 'patch' in data:
+            content_md = apply_patch(note.content_md, data['patch'])
+        else:
+            content_md = data.get('content_md', note.content_md)
+        
+        if title == note.title and content_md == note.content_md:
+            return JsonResponse({
+                'success': True,
+                'unchanged': True,
+                'revision': note.revision,
+            })
+        
+        rendered = note.autosave(title, content_md)
+    
+    return JsonResponse({
+        'success': True,
+        'message': 'تم الحفظ تلقائياً',
+        'revision': note.revision,
+        'rendered': rendered,
+        'timestamp': note.updated_at.isoformat()
+    })
+
+
 @login_required
 @require_POST
 def autosave_view(request, pk):
-    """حفظ تلقائي للملاحظة"""
-    note = get_object_or_404(Note, pk=pk, owner=request.user)
-    
+    """
+    حفظ تلقائي للملاحظة (انظر ``notes.autosave`` لصيغة الطلب)
+    """
+    try:
+        data, response = parse_autosave(request.body)
+        if response is not None:
+            return response
+        return save_autosave(request.user, pk, data)
+    except Http404:
+        raise
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
+@login_required
+@require_POST
+def preview_view(request):
+    """
+    معاينة المحتوى بنفس تحويل الحفظ (انظر ``notes.preview`` لصيغة الطلب)
+    """
     try:
         data = json.loads(request.body)
-        note.title = data.get('title', note.title)
-        note.content_md = data.get('content_md', note.content_md)
-        note.save()
-        
+        if not isinstance(data, dict):
+            raise ValueError('صيغة الطلب غير صحيحة')
+        seq, blocks, html = build_preview(request.session.session_key, data)
+    except PreviewOutOfSync:
         return JsonResponse({
-            'success': True,
-            'message': 'تم الحفظ تلقائياً',
-            'timestamp': note.updated_at.isoformat()
-        })
-    except Exception as e:
+            'success': False,
+            'resync': True,
+            'error': 'أعد إرسال المحتوى كاملاً',
+        }, status=409)
+    except ValueError as e:
         return JsonResponse({
             'success': False,
             'error': str(e)
         }, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'seq': seq,
+        'blocks': blocks,
+        'html': html,
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+@user_passes_test(lambda user: user.is_staff)
+def metrics_view(request):
+    """مؤشرات الأداء الداخلية لهذه العملية (للمشرفين فقط)"""
+    return JsonResponse({
+        'render_cache': render_cache.stats(),
+        'block_cache': block_cache.stats(),
+        'render_queue': render_queue.stats(),
+        'fragment_cache': fragment_cache.stats(),
+    })
 
 
 # ===== Public Note View =====
 
+@read_from_replica
 def public_note_view(request, uuid):
-    """عرض الملاحظة العامة"""
-    note = get_object_or_404(Note, public_uuid=uuid, is_public=True)
-    note.increment_views()
+    """عرض الملاحظة العامة (من ذاكرة الصفحات إن وُجدت، مع دعم الطلبات الشرطية)"""
+    page = public_cache.get_page(uuid)
+    if page is None or public_cache.is_changed(page):
+        notes = Note.objects.select_related('owner').prefetch_related('tags')
+        if page is not None:
+            # عُدلت للتو: من القاعدة الرئيسية حتى تصل التعديلات إلى النسخة المتماثلة
+            notes = notes.using(DEFAULT_DB_ALIAS)
+        note = get_object_or_404(notes, public_uuid=uuid, is_public=True)
+        note.increment_views()
+        note.ensure_rendered()
+        content = render_to_string('notes/public_note.html', {'note': note}, request)
+        page = public_cache.store_page(note, content)
+    else:
+        view_counter.record(page['note_id'])
     
-    return render(request, 'notes/public_note.html', {'note': note})
+    response = get_conditional_response(request, etag=page['etag'], last_modified=page['last_modified'])
+    if response is None:
+        response = HttpResponse(page['content'])
+    return public_cache.patch_page_headers(response, page)
 
 
 # ===== Export Views =====
 
 @login_required
+@read_from_replica
 def export_markdown_view(request, pk):
     """تصدير الملاحظة كـ Markdown"""
     note = get_object_or_404(Note, pk=pk, owner=request.user)
     
     response = HttpResponse(note.content_md, content_type='text/markdown')
-    response['Content-Disposition'] = f'attachment; filename="{note.title or "note"}.md"'
+    response['Content-Disposition'] = content_disposition_header(True, f'{note.title or "note"}.md')
     
     return response
 
 
 @login_required
+@read_from_replica
 def export_pdf_view(request, pk):
-    """تصدير الملاحظة كـ PDF"""
-    note = get_object_or_404(Note, pk=pk, owner=request.user)
+    """تصدير الملاحظة كـ PDF (من الذاكرة المؤقتة إن وُجد)"""
+    note = get_object_or_404(Note.objects.only('id', 'title', 'content_md'), pk=pk, owner=request.user)
     
-    # إنشاء buffer للـ PDF
-    buffer = BytesIO()
-    
-    # إنشاء المستند
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
-    
-    # الحاوية للعناصر
-    story = []
-    
-    # الأنماط
-    styles = getSampleStyleSheet()
-    
-    # نمط للعنوان (RTL)
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        alignment=TA_RIGHT,
-        fontSize=18,
-        spaceAfter=30,
-    )
-    
-    # نمط للمحتوى (RTL)
-    content_style = ParagraphStyle(
-        'CustomContent',
-        parent=styles['BodyText'],
-        alignment=TA_RIGHT,
-        fontSize=12,
-        leading=20,
-    )
-    
-    # إضافة العنوان
-    title = Paragraph(note.title or 'ملاحظة بدون عنوان', title_style)
-    story.append(title)
-    story.append(Spacer(1, 12))
-    
-    # إضافة المحتوى (تحويل HTML إلى نص بسيط)
-    # ملاحظة: reportlab لا يدعم HTML المعقد، لذا سنستخدم النص الأصلي
-    content_lines = note.content_md.split('\n')
-    for line in content_lines:
-        if line.strip():
-            p = Paragraph(line, content_style)
-            story.append(p)
-            story.append(Spacer(1, 6))
-    
-    # بناء PDF
-    doc.build(story)
-    
-    # إرجاع الملف
-    buffer.seek(0)
-    return FileResponse(buffer, as_attachment=True, filename=f'{note.title or "note"}.pdf')
+    # يُرسل الملف على دفعات بدلاً من تحميله كاملاً في الذاكرة
+    return FileResponse(open_pdf(note), as_attachment=True, filename=f'{note.title or "note"}.pdf')
+
+
+@login_required
+@read_from_replica
+def export_all_view(request):
+    """تصدير كل الملاحظات كأرشيف ZIP (مع سجل النسخ عند طلب ?versions=1)"""
+    include_versions = request.GET.get('versions') == '1'
+    
+    response = StreamingHttpResponse(iter_export(request.user, include_versions), content_type='application/zip')
+    filename = f'notes-{request.user.username}-{timezone.localdate():%Y-%m-%d}.zip'
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+# ===== Import =====
+
+@login_required
+@require_POST
+def import_notes_view(request):
+    """
+    استيراد ملاحظات من أرشيف ZIP مرفوع (مع تخطي الملفات المستوردة سابقاً)
+
+    مع ``IMPORT_ASYNC`` يبدأ الاستيراد في الخلفية ويُرد فوراً: طلبات JSON تحصل
+    على 202 مع رقم العملية ورابط ``import_status``.
+    """
+    form = ImportForm(request.POST, request.FILES)
+    if not form.is_valid():
+        messages.error(request, 'يرجى اختيار ملف ZIP صالح')
+        return redirect('notes_list')
+    
+    archive = form.cleaned_data['archive']
+    if not settings.IMPORT_ASYNC:
+        try:
+            stats = run_import(ImportJob.objects.create(user=request.user), archive)
+        except ArchiveError as error:
+            messages.error(request, str(error))
+            return redirect('notes_list')
+        messages.success(
+            request,
+            f'تم استيراد {stats["imported"]} ملاحظة (تخطي {stats["skipped"]}، فشل {stats["failed"]})'
+        )
+        return redirect('notes_list')
+    
+    wants_json = request.get_preferred_type(['text/html', 'application/json']) == 'application/json'
+    try:
+        job = start_import(request.user, archive)
+    except ArchiveError as error:
+        if wants_json:
+            return JsonResponse({'success': False, 'error': str(error)}, status=400)
+        messages.error(request, str(error))
+        return redirect('notes_list')
+    
+    # الاستيراد مستمر في الخلفية: الرد فوراً برقم العملية ورابط متابعتها
+    status_url = f'{reverse("import_status")}?id={job.pk}'
+    if wants_json:
+        return JsonResponse({'success': True, 'import_id': job.pk, 'status_url': status_url}, status=202)
+    messages.info(request, 'بدأ الاستيراد في الخلفية، وستظهر الملاحظات عند اكتماله')
+    return redirect('notes_list')
+
+
+@login_required
+def import_status_view(request):
+    """حالة عملية استيراد (``?id=``) أو آخر عملية للمستخدم (تُحدَّث بعد كل دفعة)"""
+    jobs = request.user.import_jobs.all()
+    job_id = request.GET.get('id', '')
+    if job_id:
+        if not job_id.isdigit():
+            raise Http404
+        jobs = jobs.filter(pk=job_id)
+    job = jobs.first()
+    return JsonResponse(job.as_json() if job else {})